@@ -2,6 +2,7 @@ from pkg_resources import require
 require("cothread==2.18.2")
 from cothread.catools import camonitor, FORMAT_TIME
 import cothread
+import numpy as np
 
 class Accumulator:
     """Uses camonitor to accumulate a set number of data points from a PV 
@@ -33,3 +34,136 @@ class Accumulator:
         for nd in range(len(raw_time_series)):
             time_series.append(raw_time_series[nd][0] + raw_time_series[nd][1] * 1e-9)
         return time_series, data[1]
+
+
+class ArrayAccumulator:
+    """Uses camonitor to accumulate a set number of data points from a PV into preallocated arrays
+
+        The values and timestamps are written straight into float64 arrays so no per sample
+        lists or tuples are built. In rolling mode the monitor is left running and the arrays
+        act as a ring buffer holding the most recent count samples.
+
+        Args:
+            pv (str): The process variable requested.
+            count (int): the number of sample to acquire (or the ring buffer length when rolling).
+            rolling (bool): Keep monitoring and overwrite the oldest samples once the buffer is full.
+
+        Returns:
+            Numpy arrays of timestamps and values
+            """
+    def __init__(self, pv, count, rolling=False):
+        if count < 1:
+            raise ValueError('At least one sample must be accumulated')
+        self.count = count
+        self.rolling = rolling
+        self.values = np.zeros(count, dtype=np.float64)
+        self.seconds = np.zeros(count, dtype=np.float64)
+        self.nanoseconds = np.zeros(count, dtype=np.float64)
+        self.index = 0  # Total number of updates received
+        self.done = cothread.Event()
+        self.monitor = camonitor(pv, self.add_value, format=FORMAT_TIME, all_updates=True)
+
+    def add_value(self, val):
+        if self.index >= self.count and not self.rolling:
+            return  # Updates already queued when the monitor was closed
+        position = self.index % self.count
+        self.values[position] = val
+        self.seconds[position], self.nanoseconds[position] = val.raw_stamp
+        self.index += 1
+        if self.index == self.count:
+            if not self.rolling:
+                self.monitor.close()
+            self.done.Signal()
+
+    def _ordered(self):
+        # Unrolls the ring buffer so that the oldest sample is first.
+        filled = min(self.index, self.count)
+        order = np.arange(self.index - filled, self.index) % self.count
+        time_series = self.seconds[order] + self.nanoseconds[order] * 1e-9
+        return time_series, self.values[order]
+
+    def wait(self):
+        self.done.Wait()
+        return self._ordered()
+
+    def snapshot(self):
+        """Returns the samples currently held in the buffer without waiting for it to fill."""
+        return self._ordered()
+
+    def close(self):
+        """Stops a rolling accumulator."""
+        self.monitor.close()
+
+
+class MultiAccumulator:
+    """Uses camonitor to accumulate a set number of time aligned data points from several PVs
+
+        All of the PVs are monitored at the same time. Updates are matched on their raw timestamp
+        so that only samples which have arrived on every PV are returned. Each PV is expected to send
+        its updates in time order, so once a stamp has arrived on every PV, older stamps that some PV
+        missed are discarded. Updates wait in a small dictionary per PV until they are matched, and
+        are then written straight into preallocated float64 arrays, as in ArrayAccumulator.
+
+        Args:
+            pvs (list): The process variables requested.
+            count (int): the number of aligned samples to acquire.
+
+        Returns:
+            Numpy arrays of timestamps and of values, one row per PV
+            """
+    def __init__(self, pvs, count):
+        if count < 1:
+            raise ValueError('At least one sample must be accumulated')
+        self.count = count
+        self.num_pvs = len(pvs)
+        self.pending = [{} for _ in range(self.num_pvs)]  # raw_stamp: value of the updates not yet matched
+        self.seen = {}  # raw_stamp: number of PVs which have reported that stamp, until it is matched
+        self.values = np.zeros((self.num_pvs, count), dtype=np.float64)
+        self.seconds = np.zeros(count, dtype=np.float64)
+        self.nanoseconds = np.zeros(count, dtype=np.float64)
+        self.matched = 0  # Number of aligned samples in the arrays
+        self.newest_match = None  # Every PV has passed this stamp, so nothing older can be matched
+        self.finished = False
+        self.done = cothread.Event()
+        self.monitors = camonitor(pvs, self.add_value, format=FORMAT_TIME, all_updates=True)
+
+    def add_value(self, val, index):
+        if self.finished:
+            return  # Updates already queued when the monitors were closed
+        stamp = val.raw_stamp
+        if self.newest_match is not None and stamp <= self.newest_match:
+            return  # A repeat, or an update which can no longer be matched
+        repeat = stamp in self.pending[index]
+        self.pending[index][stamp] = val
+        if repeat:
+            return  # A stamp only counts once towards a match from each PV
+        reported = self.seen.get(stamp, 0) + 1
+        if reported < self.num_pvs:
+            self.seen[stamp] = reported
+            return
+        self.seen.pop(stamp, None)
+        # Matches are made in time order, as nothing older than the newest match is accepted.
+        for channel, pending in enumerate(self.pending):
+            self.values[channel, self.matched] = pending.pop(stamp)
+        self.seconds[self.matched], self.nanoseconds[self.matched] = stamp
+        self.matched += 1
+        self.newest_match = stamp
+        if self.seen:
+            self._drop_unmatched_before(stamp)
+        if self.matched >= self.count:
+            self.finished = True
+            for monitor in self.monitors:
+                monitor.close()
+            self.done.Signal()
+
+    def _drop_unmatched_before(self, stamp):
+        # Each PV sends its updates in time order, so a stamp older than one every PV has reached
+        # can no longer be matched. Dropping these stops the updates missed by one PV piling up.
+        for old_stamp in [seen_stamp for seen_stamp in self.seen if seen_stamp < stamp]:
+            del self.seen[old_stamp]
+            for pending in self.pending:
+                pending.pop(old_stamp, None)
+
+    def wait(self):
+        self.done.Wait()
+        return self.seconds + self.nanoseconds * 1e-9, self.values
@@ -0,0 +1,109 @@
+from framework_requires import BaseTestClass
+import unittest
+from mock import patch, Mock
+from BPMDevice.BPM_helper_functions import ArrayAccumulator, MultiAccumulator
+
+
+class Update(float):
+    # A camonitor update, a value carrying its raw timestamp of (seconds, nanoseconds).
+    def __new__(cls, value, stamp, seconds=1500000000):
+        update = float.__new__(cls, value)
+        update.raw_stamp = (seconds, stamp)
+        return update
+
+
+class MultiAccumulatorTest(BaseTestClass):
+
+    def setUp(self):
+        patcher = patch("BPMDevice.BPM_helper_functions.camonitor", side_effect=lambda pvs, *args, **kwargs:
+                        [Mock() for _ in pvs])
+        self.camonitor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_stamps_seen_on_every_pv_are_returned(self):
+        accumulator = MultiAccumulator(['SA:X', 'SA:Y'], 2)
+        accumulator.add_value(Update(1., 100), 0)
+        accumulator.add_value(Update(2., 200), 0)
+        accumulator.add_value(Update(-2., 200), 1)
+        accumulator.add_value(Update(3., 300), 0)
+        accumulator.add_value(Update(-3., 300), 1)
+        times, (x_data, y_data) = accumulator.wait()
+        self.assertEqual(times.tolist(), [1500000000 + 200e-9, 1500000000 + 300e-9])
+        self.assertEqual((x_data.tolist(), y_data.tolist()), ([2., 3.], [-2., -3.]))
+        for monitor in accumulator.monitors:
+            self.assertTrue(monitor.close.called)
+
+    def test_updates_arriving_late_on_one_pv_still_match(self):
+        accumulator = MultiAccumulator(['SA:X', 'SA:Y'], 2)
+        for stamp in (100, 200, 300):
+            accumulator.add_value(Update(stamp, stamp), 0)
+        accumulator.add_value(Update(-100, 100), 1)
+        accumulator.add_value(Update(-200, 200), 1)
+        self.assertEqual(accumulator.wait()[1].tolist(), [[100., 200.], [-100., -200.]])
+
+    def test_stamps_one_pv_missed_are_dropped(self):
+        accumulator = MultiAccumulator(['SA:X', 'SA:Y'], 1000)
+        for stamp in range(0, 1000, 2):
+            # Y misses every other update.
+            accumulator.add_value(Update(stamp, stamp), 0)
+            accumulator.add_value(Update(stamp + 1, stamp + 1), 0)
+            accumulator.add_value(Update(-stamp, stamp), 1)
+        self.assertEqual(accumulator.matched, 500)
+        self.assertEqual(accumulator.seen, {(1500000000, 999): 1})
+        # Only the update still waiting for a match is held outside the arrays.
+        self.assertEqual([len(pending) for pending in accumulator.pending], [1, 0])
+
+    def test_a_repeated_update_counts_once(self):
+        accumulator = MultiAccumulator(['SA:X', 'SA:Y'], 1)
+        accumulator.add_value(Update(1., 100), 0)
+        accumulator.add_value(Update(1., 100), 0)
+        self.assertEqual(accumulator.matched, 0)
+        accumulator.add_value(Update(-1., 100), 1)
+        accumulator.add_value(Update(-1., 100), 1)
+        self.assertEqual(accumulator.wait()[1].tolist(), [[1.], [-1.]])
+
+    def test_at_least_one_sample_is_needed(self):
+        self.assertRaises(ValueError, MultiAccumulator, ['SA:X', 'SA:Y'], 0)
+
+
+class ArrayAccumulatorTest(BaseTestClass):
+
+    def setUp(self):
+        patcher = patch("BPMDevice.BPM_helper_functions.camonitor")
+        self.camonitor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_at_least_one_sample_is_needed(self):
+        self.assertRaises(ValueError, ArrayAccumulator, 'SA:X', 0)
+        self.assertFalse(self.camonitor.called)
+
+    def test_stops_once_full(self):
+        accumulator = ArrayAccumulator('SA:X', 3)
+        for stamp in range(5):
+            accumulator.add_value(Update(stamp, 500000000, seconds=stamp))
+        times, values = accumulator.wait()
+        self.assertEqual(values.tolist(), [0., 1., 2.])
+        self.assertEqual(times.tolist(), [0.5, 1.5, 2.5])
+        self.assertTrue(self.camonitor.return_value.close.called)
+
+    def test_snapshot_before_full_holds_only_the_samples_received(self):
+        accumulator = ArrayAccumulator('SA:X', 4, rolling=True)
+        accumulator.add_value(Update(0., 0))
+        accumulator.add_value(Update(1., 1))
+        self.assertEqual(accumulator.snapshot()[1].tolist(), [0., 1.])
+
+    def test_rolling_buffer_wraps_and_keeps_the_newest_samples_oldest_first(self):
+        accumulator = ArrayAccumulator('SA:X', 4, rolling=True)
+        for stamp in range(10):
+            accumulator.add_value(Update(stamp, 0, seconds=stamp))
+        times, values = accumulator.snapshot()
+        self.assertEqual(values.tolist(), [6., 7., 8., 9.])
+        self.assertEqual(times.tolist(), [6., 7., 8., 9.])
+        self.assertEqual(accumulator.wait()[1].tolist(), [6., 7., 8., 9.])
+        self.assertFalse(self.camonitor.return_value.close.called)
+        accumulator.close()
+        self.assertTrue(self.camonitor.return_value.close.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
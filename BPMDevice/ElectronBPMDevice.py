@@ -189,6 +189,18 @@ class ElectronBPMDevice(Generic_BPMDevice):
         """
         return LiberaBPM_common.get_y_sa_data(self.epics_id, num_vals)
 
+    def get_xy_sa_data(self, num_vals):
+        """Gets the calculated X and Y position SA data from one acquisition.
+
+        Args:
+            num_vals (int): The number of samples to capture
+        Returns: 
+            timestamps (list): floats, shared by X and Y
+            x_data (list): floats
+            y_data (list): floats
+        """
+        return LiberaBPM_common.get_xy_sa_data(self.epics_id, num_vals)
+
     def get_sa_data(self, num_vals):
         """Gets the ABCD SA data.
 
@@ -205,8 +217,8 @@ class ElectronBPMDevice(Generic_BPMDevice):
 
         Args:
        Returns:
-            times (list): floats
-            data (list): floats
+            times (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
         return LiberaBPM_common.get_tt_data(self.epics_id)
 
@@ -214,11 +226,8 @@ class ElectronBPMDevice(Generic_BPMDevice):
         """ Gets the ABCD ADC data.
 
         Returns: 
-            timestamps (list): floats
-            adc1_data (list): floats
-            adc2_data (list): floats
-            adc3_data (list): floats
-            adc4_data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): int32 ADC counts, one row per ADC, shape (4, samples)
         """
         return LiberaBPM_common.get_adc_data(self.epics_id, num_bits)
 
@@ -227,8 +236,8 @@ class ElectronBPMDevice(Generic_BPMDevice):
 
         Args:
        Returns:
-            timestamps (list): floats
-            data (list): floats
+            times (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
         return LiberaBPM_common.get_ft_data(self.epics_id)
 
@@ -68,6 +68,19 @@ class Generic_BPMDevice():
         """
         pass
 
+    def get_xy_position(self):
+        """Gets the calculated X and Y positions of the beam.
+
+        Devices which can read both from one acquisition override this, so that a position
+        reading costs them one fetch rather than two.
+
+        Args:
+        Returns: 
+            float: X position in mm
+            float: Y position in mm
+        """
+        return self.get_x_position(), self.get_y_position()
+
     @abstractmethod
     def get_x_sa_data(self, num_vals):
         """Abstract method for override, gets the calculated X position SA data.
@@ -90,6 +103,19 @@ class Generic_BPMDevice():
         """
         pass
 
+    @abstractmethod
+    def get_xy_sa_data(self, num_vals):
+        """Abstract method for override, gets the X and Y position SA data from one acquisition.
+
+        Args:
+            num_vals (int): The number of samples to capture
+        Returns: 
+            timestamps (list): floats, shared by X and Y
+            x_data (list): X position
+            y_data (list): Y position
+        """
+        pass
+
     @abstractmethod
     def get_sa_data(self, num_vals):
         """Abstract method for override, gets the ABCD SA data.
@@ -103,12 +129,12 @@ class Generic_BPMDevice():
 
     @abstractmethod
     def get_tt_data(self):
-        """Abstract method for override, gets the calculated X position TT data.
+        """Abstract method for override, gets the ABCD TT data.
 
         Args:
-            num_vals (int): The number of samples to capture
         Returns: 
-            list: [raw_timestamp (tuple), X position in mm]
+            timestamps (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
         pass
 
@@ -119,7 +145,8 @@ class Generic_BPMDevice():
         Args:
             num_bits (int): The number of bits the ADC has
         Returns: 
-            list: [raw_timestamp (tuple), X position in mm]
+            timestamps (ndarray): floats
+            data (ndarray): int32 ADC counts, one row per ADC, shape (num_adcs, samples)
         """
         pass
 
@@ -128,9 +155,9 @@ class Generic_BPMDevice():
         """Abstract method for override, gets the ABCD first turn data.
 
         Args:
-            num_vals (int): The number of samples to capture
         Returns: 
-            list: [raw_timestamp (tuple), Y position in mm]
+            timestamps (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
         pass
 
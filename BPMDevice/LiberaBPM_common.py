@@ -1,9 +1,18 @@
 from pkg_resources import require
 require("cothread==2.18.2")
-from cothread.catools import caget, caput, connect
+from cothread.catools import caget, caput, connect, camonitor
+import cothread
 from subprocess import Popen, PIPE
 import numpy as np
-from BPM_helper_functions import Accumulator
+from BPM_helper_functions import ArrayAccumulator, MultiAccumulator
+
+# Time in seconds allowed for a waveform capture when no ready PV is watched.
+# A full 131072 turn TT capture takes about 0.25 s.
+CAPTURE_DELAY = 0.5
+# PVs which are 1 once a new capture can be read. These are not in the PV lists checked so far,
+# so they are off by default and can be set for an IOC known to provide them, e.g. 'TT:READY'.
+TT_READY_PV = None
+FT_READY_PV = None
 
 
 def read_epics_pv(epics_id, pv):
@@ -21,6 +30,78 @@ def read_epics_pv(epics_id, pv):
     return caget(':'.join((epics_id, pv)))  # Get PV data
 
 
+def read_epics_pvs(epics_id, pvs):
+    """Private method to read several Epics process variables in one go.
+
+    A single caget is issued on the list of PVs, so the reads overlap
+    rather than each waiting for the one before it.
+
+    Args:
+        epics_id (Str): The EPICS name of the device.
+        pvs (list): Names of the Epics process variables to read.
+    Returns:
+        list: Value of each requested process variable, in the order requested.
+    """
+    return caget([':'.join((epics_id, pv)) for pv in pvs])  # Get PV data
+
+
+def wait_for_epics_pv(epics_id, pv, val, timeout=5.):
+    """Private method which waits until an Epics process variable takes a value.
+
+    Args:
+        epics_id (Str): The EPICS name of the device.
+        pv (str): Name of the Epics process variable to watch.
+        val (str, int, float): Value to wait for.
+        timeout (float): Time in seconds to wait before giving up.
+    Returns:
+
+    Raises:
+        cothread.Timedout: If the value is not reached within the timeout.
+    """
+    reached = cothread.Event()
+
+    def check_value(value):
+        if value == val:
+            reached.Signal()
+
+    monitor = camonitor(':'.join((epics_id, pv)), check_value)
+    try:
+        reached.Wait(timeout)
+    finally:
+        monitor.close()
+
+
+def capture_waveforms(epics_id, arm_pv, ready_pv, waveform_pvs, timeout=5., capture_delay=CAPTURE_DELAY):
+    """Private method which arms a waveform capture and reads all of the channels together.
+
+    The arm is written with a completion callback. If a ready PV is given, this then waits for it
+    to be 1, which assumes the device clears it while processing the arm and sets it once the new
+    waveforms have been written. Without a ready PV it waits a fixed capture_delay instead.
+
+    Args:
+        epics_id (Str): The EPICS name of the device.
+        arm_pv (str): Process variable which starts the capture when set to 1.
+        ready_pv (str): Process variable which is 1 once the capture is available, or None to wait
+            a fixed time.
+        waveform_pvs (list): Process variables holding the waveform of each channel.
+        timeout (float): Time in seconds to wait for the ready PV.
+        capture_delay (float): Time in seconds to wait for the capture when there is no ready PV.
+    Returns:
+        ndarray: The waveforms as rows, shape (number of channels, samples).
+    """
+    caput(':'.join((epics_id, arm_pv)), 1, wait=True)
+    if ready_pv is None:
+        cothread.Sleep(capture_delay)
+    else:
+        wait_for_epics_pv(epics_id, ready_pv, 1, timeout=timeout)
+    waveforms = read_epics_pvs(epics_id, waveform_pvs)
+    if not all(len(waveform) for waveform in waveforms):
+        raise ValueError('Not all waveform data returned.')
+    # The channels are trimmed to a common length in case one updated mid read.
+    length = min(len(waveform) for waveform in waveforms)
+    return np.vstack([np.asarray(waveform)[:length] for waveform in waveforms])
+
+
 def write_epics_pv(epics_id, pv, val):
     """Private method to write to an Epics process variable.
 
@@ -104,13 +185,12 @@ def get_x_sa_data(epics_id, num_vals):
         epics_id (Str): The EPICS name of the device.
         num_vals (int): The number of samples to capture
     Returns:
-        timestamps (list): floats
-        data (list): floats
+        timestamps (ndarray): floats, relative to the first sample
+        data (ndarray): floats
     """
-    sa_x_accum = Accumulator(':'.join((epics_id, 'SA:X')), num_vals)
+    sa_x_accum = ArrayAccumulator(':'.join((epics_id, 'SA:X')), num_vals)
     times, data = sa_x_accum.wait()
-    times_rel = [x - times[0] for x in times]
-    return times_rel, data
+    return times - times[0], data
 
 
 def get_y_sa_data(epics_id, num_vals):
@@ -120,13 +200,29 @@ def get_y_sa_data(epics_id, num_vals):
         epics_id (Str): The EPICS name of the device.
         num_vals (int): The number of samples to capture
     Returns:
-        timestamps (list): floats
-        data (list): floats
+        timestamps (ndarray): floats, relative to the first sample
+        data (ndarray): floats
     """
-    sa_y_accum = Accumulator(':'.join((epics_id, 'SA:Y')), num_vals)
+    sa_y_accum = ArrayAccumulator(':'.join((epics_id, 'SA:Y')), num_vals)
     times, data = sa_y_accum.wait()
-    times_rel = [x - times[0] for x in times]
-    return times_rel, data
+    return times - times[0], data
+
+
+def get_xy_sa_data(epics_id, num_vals):
+    """Gets the calculated X and Y position SA data from one acquisition.
+
+    Args:
+        epics_id (Str): The EPICS name of the device.
+        num_vals (int): The number of samples to capture
+    Returns:
+        timestamps (ndarray): floats, shared by X and Y and relative to the first sample
+        x_data (ndarray): floats
+        y_data (ndarray): floats
+    """
+    # Both planes are captured at the same time and aligned on their timestamps.
+    sa_accum = MultiAccumulator([':'.join((epics_id, pv)) for pv in ('SA:X', 'SA:Y')], num_vals)
+    times, (x_data, y_data) = sa_accum.wait()
+    return times - times[0], x_data, y_data
 
 
 def get_sa_data(epics_id, num_vals):
@@ -136,40 +232,34 @@ def get_sa_data(epics_id, num_vals):
         epics_id (Str): The EPICS name of the device.
         num_vals (int): The number of samples to capture
     Returns:
-        timestamps (list): floats
-        data (list): floats
+        timestamps (ndarray): floats
+        data (ndarray): floats
     """
-    sa_a_accum = Accumulator(':'.join((epics_id, 'SA:A')), num_vals)
-    sa_a_times, sa_a_data = sa_a_accum.wait()
-    sa_b_accum = Accumulator(':'.join((epics_id, 'SA:B')), num_vals)
-    sa_b_times, sa_b_data = sa_b_accum.wait()
-    sa_c_accum = Accumulator(':'.join((epics_id, 'SA:C')), num_vals)
-    sa_c_times, sa_c_data = sa_c_accum.wait()
-    sa_d_accum = Accumulator(':'.join((epics_id, 'SA:D')), num_vals)
-    sa_d_times, sa_d_data = sa_d_accum.wait()
+    # All four channels are captured at the same time and aligned on their timestamps.
+    sa_accum = MultiAccumulator([':'.join((epics_id, pv)) for pv in ('SA:A', 'SA:B', 'SA:C', 'SA:D')], num_vals)
+    sa_times, (sa_a_data, sa_b_data, sa_c_data, sa_d_data) = sa_accum.wait()
+    sa_a_times = sa_b_times = sa_c_times = sa_d_times = sa_times
 
     return sa_a_times, sa_a_data, sa_b_times, sa_b_data, sa_c_times, sa_c_data, sa_d_times, sa_d_data
 
 
-def get_tt_data(epics_id):
+def get_tt_data(epics_id, ready_pv=None):
     """ Gets the calculated ABCD TT data.
 
     Args:
         epics_id (Str): The EPICS name of the device.
+        ready_pv (str): PV to wait on for the capture. Defaults to TT_READY_PV.
    Returns:
-        times (list): floats
-        data (list): floats
+        times (ndarray): floats
+        data (ndarray): ABCD waveforms as rows, shape (4, samples)
     """
     write_epics_pv(epics_id, 'TT:CAPLEN_S', 131072)
     write_epics_pv(epics_id, 'TT:DELAY_S', 0)
-    write_epics_pv(epics_id, 'TT:ARM', 1)
-    data1 = read_epics_pv(epics_id, "TT:WFA")
-    data2 = read_epics_pv(epics_id, "TT:WFA")
-    data3 = read_epics_pv(epics_id, "TT:WFA")
-    data4 = read_epics_pv(epics_id, "TT:WFA")
+    data = capture_waveforms(epics_id, 'TT:ARM', ready_pv or TT_READY_PV,
+                             ['TT:WFA', 'TT:WFB', 'TT:WFC', 'TT:WFD'])
 
-    times = np.arange(len(data1)) * 936. / 500e6  # Each tick is one turn
-    return times, data1, data2, data3, data4
+    times = np.arange(data.shape[1]) * 936. / 500e6  # Each tick is one turn
+    return times, data
 
 
 def get_adc_data(epics_id, num_bits):
@@ -179,46 +269,40 @@ def get_adc_data(epics_id, num_bits):
         epics_id (Str): The EPICS name of the device.
         num_bits (int): The number of bits the ADC has.
     Returns:
-        timestamps (list): floats
-        adc1_data (list): floats
-        adc2_data (list): floats
-        adc3_data (list): floats
-        adc4_data (list): floats
+        timestamps (ndarray): floats
+        data (ndarray): int32 ADC counts, one row per ADC, shape (4, samples)
     """
     # num_bits = 16  # The libera return the values centred around the centre bit of a 16 bit number
-    adc1_data = read_epics_pv(epics_id, 'FT:RAW1')
-    adc2_data = read_epics_pv(epics_id, 'FT:RAW2')
-    adc3_data = read_epics_pv(epics_id, 'FT:RAW3')
-    adc4_data = read_epics_pv(epics_id, 'FT:RAW4')
-    # The data is centred on the middle bits. Shift it so all values are positive.
-    half_range = np.power(2, num_bits) / 2
-    adc1_out = [int(x + half_range) for x in adc1_data]
-    adc2_out = [int(x + half_range) for x in adc2_data]
-    adc3_out = [int(x + half_range) for x in adc3_data]
-    adc4_out = [int(x + half_range) for x in adc4_data]
-    times = np.arange(len(adc1_out)) * 1 / 117E6  # Data rate is 117MHz
-    if not adc1_out or not adc2_out or not adc3_out or not adc4_out:
+    adc_waveforms = read_epics_pvs(epics_id, ['FT:RAW1', 'FT:RAW2', 'FT:RAW3', 'FT:RAW4'])
+    if not all(len(adc_waveform) for adc_waveform in adc_waveforms):
         raise ValueError('Not all ADC data returned.')
-    return list(times), [adc1_out, adc2_out, adc3_out, adc4_out]
+    length = min(len(adc_waveform) for adc_waveform in adc_waveforms)
+    data = np.empty((len(adc_waveforms), length), dtype=np.int32)
+    for num_adc, adc_waveform in enumerate(adc_waveforms):
+        data[num_adc] = adc_waveform[:length]
+    # The data is centred on the middle bits. Shift it so all values are positive.
+    data += np.power(2, num_bits) // 2
+    times = np.arange(length) * 1 / 117E6  # Data rate is 117MHz
+    return times, data
 
 
-def get_ft_data(epics_id):
+def get_ft_data(epics_id, ready_pv=None):
     """ Gets the ABCD first turn data.
 
     Args:
         epics_id (Str): The EPICS name of the device.
+        ready_pv (str): PV to wait on for the capture. Defaults to FT_READY_PV.
    Returns:
-        timestamps (list): floats
-        data (list): floats
+        timestamps (ndarray): floats
+        data (ndarray): ABCD waveforms as rows, shape (4, samples)
     """
-    write_epics_pv(epics_id, 'FT:ENABLE_S', 1)
-    fta_data = read_epics_pv(epics_id, ':WFA')
-    ftb_data = read_epics_pv(epics_id, ':WFB')
-    ftc_data = read_epics_pv(epics_id, ':WFC')
-    ftd_data = read_epics_pv(epics_id, ':WFD')
-    write_epics_pv(epics_id, 'FT:ENABLE_S', 0)
-    times = np.arange(len(fta_data)) * 1 / 30E6  # Data rate is 30MHz
-    return times, fta_data, ftb_data, ftc_data, ftd_data
+    try:
+        data = capture_waveforms(epics_id, 'FT:ENABLE_S', ready_pv or FT_READY_PV,
+                                 ['FT:WFA', 'FT:WFB', 'FT:WFC', 'FT:WFD'])
+    finally:
+        write_epics_pv(epics_id, 'FT:ENABLE_S', 0)
+    times = np.arange(data.shape[1]) * 1 / 30E6  # Data rate is 30MHz
+    return times, data
 
 
 def get_beam_current(epics_id):
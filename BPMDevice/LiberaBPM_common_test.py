@@ -0,0 +1,97 @@
+from framework_requires import BaseTestClass
+import unittest
+import numpy as np
+from mock import patch, Mock
+from BPMDevice import LiberaBPM_common
+
+
+class CaptureTimeout(Exception):
+    pass
+
+
+def monitor_reporting(*values):
+    # Returns a camonitor replacement which sends the values to the callback straight away.
+    monitor = Mock()
+
+    def camonitor(pv, callback, **kwargs):
+        for value in values:
+            callback(value)
+        return monitor
+    return camonitor, monitor
+
+
+class WaitForEpicsPvTest(BaseTestClass):
+
+    def test_returns_once_the_value_is_reached(self):
+        camonitor, monitor = monitor_reporting(0, 1)
+        with patch("BPMDevice.LiberaBPM_common.camonitor", side_effect=camonitor) as camonitor_mock:
+            LiberaBPM_common.wait_for_epics_pv('TS-DI-EBPM-01', 'TT:READY', 1)
+        self.assertEqual(camonitor_mock.call_args[0][0], 'TS-DI-EBPM-01:TT:READY')
+        self.assertTrue(monitor.close.called)
+
+    @patch("BPMDevice.LiberaBPM_common.cothread.Event")
+    def test_monitor_is_closed_on_timeout(self, event_mock):
+        event_mock.return_value.Wait.side_effect = CaptureTimeout
+        camonitor, monitor = monitor_reporting(0)
+        with patch("BPMDevice.LiberaBPM_common.camonitor", side_effect=camonitor):
+            self.assertRaises(CaptureTimeout, LiberaBPM_common.wait_for_epics_pv, 'TS-DI-EBPM-01', 'TT:READY', 1,
+                              timeout=0.1)
+        event_mock.return_value.Wait.assert_called_with(0.1)
+        self.assertFalse(event_mock.return_value.Signal.called)
+        self.assertTrue(monitor.close.called)
+
+
+class CaptureWaveformsTest(BaseTestClass):
+
+    @patch("BPMDevice.LiberaBPM_common.caget", return_value=[[1, 2, 3], [4, 5, 6, 7], [8, 9, 10], [11, 12, 13]])
+    @patch("BPMDevice.LiberaBPM_common.wait_for_epics_pv")
+    @patch("BPMDevice.LiberaBPM_common.caput")
+    def test_waits_on_the_ready_pv_and_reads_all_channels_together(self, caput_mock, wait_mock, caget_mock):
+        data = LiberaBPM_common.capture_waveforms('BPM', 'TT:ARM', 'TT:READY', ['TT:WFA', 'TT:WFB', 'TT:WFC',
+                                                                             'TT:WFD'])
+        caput_mock.assert_called_once_with('BPM:TT:ARM', 1, wait=True)
+        wait_mock.assert_called_once_with('BPM', 'TT:READY', 1, timeout=5.)
+        caget_mock.assert_called_once_with(['BPM:TT:WFA', 'BPM:TT:WFB', 'BPM:TT:WFC', 'BPM:TT:WFD'])
+        self.assertTrue(np.array_equal(data, [[1, 2, 3], [4, 5, 6], [8, 9, 10], [11, 12, 13]]))
+
+    @patch("BPMDevice.LiberaBPM_common.caget", return_value=[[1, 2], [3, 4]])
+    @patch("BPMDevice.LiberaBPM_common.cothread.Sleep")
+    @patch("BPMDevice.LiberaBPM_common.wait_for_epics_pv")
+    @patch("BPMDevice.LiberaBPM_common.caput")
+    def test_waits_a_fixed_time_without_a_ready_pv(self, caput_mock, wait_mock, sleep_mock, caget_mock):
+        data = LiberaBPM_common.capture_waveforms('BPM', 'FT:ENABLE_S', None, ['FT:WFA', 'FT:WFB'],
+                                                  capture_delay=0.2)
+        sleep_mock.assert_called_once_with(0.2)
+        self.assertFalse(wait_mock.called)
+        self.assertEqual(data.shape, (2, 2))
+
+    @patch("BPMDevice.LiberaBPM_common.caget", return_value=[[1, 2], []])
+    @patch("BPMDevice.LiberaBPM_common.wait_for_epics_pv")
+    @patch("BPMDevice.LiberaBPM_common.caput")
+    def test_missing_waveform_raises(self, caput_mock, wait_mock, caget_mock):
+        self.assertRaises(ValueError, LiberaBPM_common.capture_waveforms, 'BPM', 'TT:ARM', 'TT:READY',
+                          ['TT:WFA', 'TT:WFB'])
+
+    @patch("BPMDevice.LiberaBPM_common.capture_waveforms", return_value=np.zeros((4, 10)))
+    @patch("BPMDevice.LiberaBPM_common.caput")
+    def test_tt_capture_uses_the_configured_ready_pv(self, caput_mock, capture_mock):
+        LiberaBPM_common.get_tt_data('BPM')
+        self.assertIsNone(capture_mock.call_args[0][2])
+        times, data = LiberaBPM_common.get_tt_data('BPM', ready_pv='TT:READY')
+        self.assertEqual(capture_mock.call_args[0][2], 'TT:READY')
+        self.assertEqual(len(times), 10)
+
+
+class SaDataTest(BaseTestClass):
+
+    @patch("BPMDevice.LiberaBPM_common.ArrayAccumulator")
+    def test_sa_data_is_captured_into_arrays(self, accumulator_mock):
+        accumulator_mock.return_value.wait.return_value = (np.array([10., 10.1, 10.2]), np.array([1., 2., 3.]))
+        times, data = LiberaBPM_common.get_x_sa_data('BPM', 3)
+        accumulator_mock.assert_called_once_with('BPM:SA:X', 3)
+        np.testing.assert_allclose(times, [0., 0.1, 0.2])
+        self.assertEqual(data.tolist(), [1., 2., 3.])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,34 @@ from Generic_BPMDevice import *
 from pkg_resources import require
 require("numpy")
 import numpy as np
-import random
+
+
+def coloured_noise(rng, shape, exponent):
+    """Gaussian noise whose power spectrum falls as 1/f**exponent, along the last axis.
+
+    Random amplitudes and phases are shaped in the frequency domain and transformed back,
+    so a whole capture is made in one go. An exponent of 0 gives white noise, 1 pink noise
+    and 2 brown noise. Each row is scaled to zero mean and unit standard deviation.
+
+    Args:
+        rng (RandomState): Random number generator to draw from.
+        shape (tuple): Shape of the noise array. The spectrum is shaped along the last axis.
+        exponent (float): Slope of the power spectrum.
+    Returns:
+        ndarray: The noise samples.
+    """
+    num_samples = shape[-1]
+    if num_samples < 3:
+        return rng.standard_normal(shape)  # Too short to have a spectrum.
+    freqs = np.fft.rfftfreq(num_samples)
+    scaling = np.zeros_like(freqs)
+    scaling[1:] = freqs[1:] ** (-exponent / 2.)  # No DC component.
+    spectrum_shape = tuple(shape[:-1]) + (len(freqs),)
+    spectrum = (rng.standard_normal(spectrum_shape) + 1j * rng.standard_normal(spectrum_shape)) * scaling
+    noise = np.fft.irfft(spectrum, num_samples, axis=-1)
+    noise -= np.mean(noise, axis=-1, keepdims=True)
+    noise /= np.std(noise, axis=-1, keepdims=True)
+    return noise
 
 
 class SimulatedBPMDevice(Generic_BPMDevice):
@@ -18,9 +45,12 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         attenuation (float): Attenuation produced by the virtual splitter and cables
         RFSim (RF Simulator Obj) : Reference to an RF simulator 
         GateSim (Gate Source Simulator Obj) : Reference to a gate source simulator
+        rng (RandomState): Source of all the simulated noise
+        clock (Clock Obj): Test system clock, used to model the signals settling after a change
     """
 
-    def __init__(self, rf_sim, damage_level, gatesim=None, progatten=None, noise_mag=0.):
+    def __init__(self, rf_sim, damage_level, gatesim=None, progatten=None, noise_mag=0., seed=None,
+                 noise_colour=0., clock=None, settling_time_constant=0.05, settling_error=1.):
         """Initializes the Libera BPM device object and assigns it an ID. 
         
         Args:
@@ -34,6 +64,14 @@ class SimulatedBPMDevice(Generic_BPMDevice):
                 device. This will typically be a simulated GateSource, this is an input to this 
                 class so it know how much signals are being attenuated between the RF source and it. 
             noise_mag (float): The magnitude of the white noise to be added to the input signals
+            seed (int): Seed for the noise, so that a simulated run can be repeated exactly.
+                None gives different noise each time.
+            noise_colour (float): Slope of the noise power spectrum on the captured data, 0 for white noise,
+                1 for pink and 2 for brown. Coloured noise has the same rms as the white noise of noise_mag.
+            clock (Clock Obj): Test system clock which the simulated sources record their changes on.
+                If given, readings taken soon after a change are off by a transient error.
+            settling_time_constant (float): Time constant in seconds of the exponential settling.
+            settling_error (float): Size of the transient just after a change, in mm for positions and dB for power.
         Returns: 
             
         """
@@ -48,6 +86,12 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         self.adc_n_bits = 12
         self.num_adcs = 4
         self.noise_mag = noise_mag
+        self.noise_colour = noise_colour
+        # numpy.random.Generator needs numpy 1.17, so the seedable legacy RandomState is used.
+        self.rng = np.random.RandomState(seed)
+        self.clock = clock
+        self.settling_time_constant = settling_time_constant
+        self.settling_error = settling_error
         self.damage_level = damage_level
         self.agc = 1
         self.attn = 0
@@ -56,13 +100,17 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         self.ky = 10
         self.delta = 0
         self.attn_wfm = [1,1,1]
-        self.switches = 'Auto'
+        self.switches = 1  # Automatic switching, as the Libera CF:AUTOSW_S PV reports it
         self.switch_val = 3
         self.dsc = 2
+        self.spec = self.get_performance_spec()
 
     def set_internal_state(self, state_dict):
         pass
 
+    def get_internal_state(self):
+        return self.ft, self.agc, self.delta, self.attn_wfm, self.switches, self.switch_val, self.attn, self.dsc
+
     def get_attenuation(self):
         return 10
 
@@ -83,7 +131,7 @@ class SimulatedBPMDevice(Generic_BPMDevice):
             A_pwr, B_pwr, C_pwr, D_pwr = self.attenuate_inputs(self.RFSim.get_output_power()[0])
             total_power = A_pwr + B_pwr + C_pwr + D_pwr
             x_val = ((A_pwr + D_pwr) - (B_pwr + C_pwr)) / total_power
-        return x_val * 10 + (random.random() - 0.5) * self.noise_mag  # Scaling to mm and adding noise
+        return x_val * 10 + (self.rng.random_sample() - 0.5) * self.noise_mag + self._settling_offset()  # Scaling to mm and adding noise
 
     def get_y_position(self):
         """Override method, gets the calculated X position of the beam.
@@ -99,7 +147,7 @@ class SimulatedBPMDevice(Generic_BPMDevice):
             A_pwr, B_pwr, C_pwr, D_pwr = self.attenuate_inputs(self.RFSim.get_output_power()[0])
             total_power = A_pwr + B_pwr + C_pwr + D_pwr
             y_val = ((A_pwr + B_pwr) - (C_pwr + D_pwr)) / total_power
-        return y_val * 10 + (random.random() - 0.5) * self.noise_mag  # Scaling to mm and adding noise
+        return y_val * 10 + (self.rng.random_sample() - 0.5) * self.noise_mag + self._settling_offset()  # Scaling to mm and adding noise
 
     def get_x_sa_data(self, num_vals):
         """Override method, gets the calculated X position SA data.
@@ -107,15 +155,11 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): floats
         """
-        sa_x_data = []
-        sa_x_times = []
-        for m in range(num_vals):
-            sa_x_data.append((random.random() - 0.5) * self.noise_mag)
-            sa_x_times.append(m * 0.1)
-        return sa_x_times, sa_x_data
+        times = np.arange(num_vals) * 0.1
+        return times, self._noise(num_vals) + self._settling_offset(times)
 
     def get_y_sa_data(self, num_vals):
         """Override method, gets the calculated Y position SA data.
@@ -123,46 +167,50 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): floats
+        """
+        times = np.arange(num_vals) * 0.1
+        return times, self._noise(num_vals) + self._settling_offset(times)
+
+    def get_xy_sa_data(self, num_vals):
+        """Override method, gets the X and Y position SA data from one acquisition.
+
+        Args:
+            num_vals (int): The number of samples to capture
+        Returns: 
+            timestamps (ndarray): floats, shared by X and Y
+            x_data (ndarray): floats
+            y_data (ndarray): floats
         """
-        sa_y_data = []
-        sa_y_times = []
-        for m in range(num_vals):
-            sa_y_data.append((random.random() - 0.5) * self.noise_mag)
-            sa_y_times.append(m * 0.1)
-        return sa_y_times, sa_y_data
+        times = np.arange(num_vals) * 0.1
+        sa_x_data, sa_y_data = self._noise((2, num_vals)) + self._settling_offset(times)
+        return times, sa_x_data, sa_y_data
 
     def get_sa_data(self, num_vals):
-        """Override method, gets the calculated Y position SA data.
+        """Override method, gets the ABCD SA data.
 
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): floats
+            The timestamps and data are repeated for each of A, B, C and D.
         """
-        data = []
-        times = []
-        for m in range(num_vals):
-            data.append((random.random() - 0.5) * self.noise_mag)
-            times.append(m * 0.1)
-        return times, data, data, data, data
+        times = np.arange(num_vals) * 0.1
+        sa_a_data, sa_b_data, sa_c_data, sa_d_data = self._noise((4, num_vals)) + self._settling_offset(times)
+        return times, sa_a_data, times, sa_b_data, times, sa_c_data, times, sa_d_data
 
     def get_tt_data(self):
         """Override method, gets the ABCD TT data.
 
         Args:
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
-        tt_y_data = []
-        tt_y_times = []
-        for m in range(131072):
-            tt_y_data.append((random.random() - 0.5) * self.noise_mag)
-            tt_y_times.append(m * 936./500e6)
-        return tt_y_times, tt_y_data
+        tt_times = np.arange(131072) * 936. / 500e6
+        return tt_times, self._noise((4, 131072))
 
     def get_adc_data(self, adc_n_bits):
         """Override method, gets the ABCD ADC data.
@@ -170,29 +218,31 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         Args:
                 adc_n_bits (int): number of bit in the ADC
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): int32 ADC counts, one row per ADC, shape (4, samples)
         """
         adc_max_counts = np.power(2, adc_n_bits)
         times = np.arange(0, 1024. / 117E6, 1./117e6)
         excitation_f = 500e3
         angles = np.mod(times * excitation_f, 1) * 2 * np.pi
         data = (np.sin(angles) + 1) * adc_max_counts / 2   # ADD power sensitivity to sin amplitude?
-        return times, data, data, data, data
+        # Limited to the top count in place, as the real ADCs return whole numbers within their range.
+        np.minimum(data, adc_max_counts - 1, out=data)
+        return times, np.tile(data.astype(np.int32), (self.num_adcs, 1))
 
     def get_ft_data(self):
         """Override method, gets the ABCD first turn data.
 
         Args:
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): ABCD waveforms as rows, shape (4, samples)
         """
         adc_n_bits = 16
         adc_max_counts = np.power(2, adc_n_bits)
         times = np.arange(0, 250. / 30e6, 1./30e6)
         data = (np.sin(times) + 1) * adc_max_counts  # ADD power sensitivity to sin amplitude?
-        return times, data, data, data, data
+        return times, np.tile(data, (4, 1))
 
     def get_beam_current(self):
         """Override method, gets the beam current read by the BPMs. 
@@ -238,7 +288,8 @@ class SimulatedBPMDevice(Generic_BPMDevice):
             # Total power into the BPM after each signal is attenuated (dBm)
             power_total = 10 * np.log10(A_pwr + B_pwr + C_pwr + D_pwr)
 
-        return power_total - self.attenuation
+        # The power reads low until the signal has settled.
+        return power_total - self.attenuation - self._settling_offset()
 
     def get_raw_bpm_buttons(self):
         """Override method, gets the raw signal from each BPM.
@@ -324,6 +375,25 @@ class SimulatedBPMDevice(Generic_BPMDevice):
         """
         return -40  # Max tolerance of the simulated device, as low as the most susceptible real device
 
+    def _settling_offset(self, sample_times=0.):
+        """Private method giving the transient error on readings taken sample_times after now.
+
+        The error decays exponentially from the last change any simulated source recorded on the clock.
+        """
+        if self.clock is None:
+            return 0.
+        elapsed = self.clock.time_since_change() + np.asarray(sample_times)
+        return self.settling_error * np.exp(-elapsed / self.settling_time_constant)
+
+    def _noise(self, shape):
+        """Private method which makes the noise for a capture, all of the samples in one draw."""
+        if not self.noise_colour:
+            return (self.rng.random_sample(shape) - 0.5) * self.noise_mag
+        if isinstance(shape, int):
+            shape = (shape,)
+        # Uniform noise of width noise_mag has an rms of noise_mag / sqrt(12).
+        return coloured_noise(self.rng, shape, self.noise_colour) * self.noise_mag / np.sqrt(12.)
+
     def attenuate_inputs(self, power_total):
         A_atten, B_atten, C_atten, D_atten = self.ProgAtten.get_global_attenuation()
 
@@ -217,5 +217,74 @@ class ExpectedDataTestWithGateWithAttenuator(BaseTestClass):
     def test_get_input_tolerance(self):
         self.assertEqual(self.simbpm.get_input_tolerance(), -40)
 
+
+class NoiseGenerationTest(BaseTestClass):
+
+    @patch("RFSignalGenerators.Simulated_RFSigGen")
+    def setUp(self, mock_rf_dev):
+        self.mock_rf_dev = mock_rf_dev
+        unittest.TestCase.setUp(self)
+
+    def make_bpm(self, seed, noise_colour=0.):
+        return SimulatedBPMDevice(self.mock_rf_dev, damage_level=2, noise_mag=1, seed=seed,
+                                  noise_colour=noise_colour)
+
+    def test_seeded_captures_repeat(self):
+        first_times, first_data = self.make_bpm(seed=5).get_tt_data()
+        second_times, second_data = self.make_bpm(seed=5).get_tt_data()
+        self.assertEqual(first_data.shape, (4, 131072))
+        np.testing.assert_array_equal(first_data, second_data)
+        self.assertFalse(np.array_equal(first_data, self.make_bpm(seed=6).get_tt_data()[1]))
+
+    def test_sa_data_has_independent_channels(self):
+        sa_data = self.make_bpm(seed=1).get_sa_data(100)
+        self.assertEqual(len(sa_data), 8)
+        np.testing.assert_allclose(sa_data[0], np.arange(100) * 0.1)
+        self.assertFalse(np.array_equal(sa_data[1], sa_data[3]))
+        self.assertLessEqual(np.max(np.abs(sa_data[1])), 0.5)
+
+    def test_xy_sa_data_shares_the_sample_times(self):
+        times, x_data, y_data = self.make_bpm(seed=1).get_xy_sa_data(100)
+        np.testing.assert_allclose(times, np.arange(100) * 0.1)
+        self.assertEqual(x_data.shape, (100,))
+        self.assertFalse(np.array_equal(x_data, y_data))
+
+    def test_coloured_noise_has_falling_spectrum(self):
+        times, data = self.make_bpm(seed=2, noise_colour=2).get_x_sa_data(4096)
+        spectrum = np.abs(np.fft.rfft(data)) ** 2
+        # Brown noise carries far more power in the lowest frequencies than the highest.
+        self.assertGreater(np.mean(spectrum[1:20]), 100 * np.mean(spectrum[-200:]))
+        self.assertAlmostEqual(np.std(data), 1 / np.sqrt(12.))
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.
+        self.last_change = 0.
+
+    def time(self):
+        return self.now
+
+    def time_since_change(self):
+        return self.now - self.last_change
+
+
+class SettlingTest(BaseTestClass):
+
+    @patch("RFSignalGenerators.Simulated_RFSigGen")
+    def test_readings_settle_with_clock_time(self, mock_rf_dev):
+        mock_rf_dev.get_output_power.return_value = [-40]
+        clock = FakeClock()
+        simbpm = SimulatedBPMDevice(mock_rf_dev, damage_level=2, clock=clock, settling_time_constant=0.1,
+                                    settling_error=1.)
+        settled_power = -40 - 12
+        self.assertAlmostEqual(simbpm.get_input_power(), settled_power - 1.)
+        clock.now = 0.1
+        self.assertAlmostEqual(simbpm.get_input_power(), settled_power - np.exp(-1))
+        clock.now = 2.
+        self.assertAlmostEqual(simbpm.get_input_power(), settled_power, places=6)
+        # The SA samples are later in time, so each is further settled than the one before.
+        times, data = simbpm.get_x_sa_data(3)
+        np.testing.assert_allclose(data, np.exp(-(2. + times) / 0.1))
+
 if __name__ == "__main__":
         unittest.main()
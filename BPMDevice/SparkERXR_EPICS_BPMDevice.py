@@ -5,7 +5,7 @@ from cothread.catools import caget, caput, connect
 from Generic_BPMDevice import *
 from subprocess import Popen, PIPE
 import numpy as np
-from BPM_helper_functions import Accumulator
+from BPM_helper_functions import ArrayAccumulator, MultiAccumulator
 
 
 class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
@@ -118,10 +118,10 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): floats
         """
-        sa_x_accum = Accumulator(''.join((self.epicsID, ':SA:X')), num_vals)
+        sa_x_accum = ArrayAccumulator(''.join((self.epicsID, ':SA:X')), num_vals)
         sa_x_times, sa_x_data = sa_x_accum.wait()
         return sa_x_times, sa_x_data
 
@@ -131,13 +131,27 @@ class SparkERXR_EPICS_BPMDevice(Generic_BPMDevice):
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            timestamps (list): floats
-            data (list): floats
+            timestamps (ndarray): floats
+            data (ndarray): floats
         """
-        sa_y_accum = Accumulator(''.join((self.epicsID, ':SA:Y')), num_vals)
+        sa_y_accum = ArrayAccumulator(''.join((self.epicsID, ':SA:Y')), num_vals)
         sa_y_times, sa_y_data = sa_y_accum.wait()
         return sa_y_times, sa_y_data
 
+    def get_xy_sa_data(self, num_vals):
+        """Override method, gets the calculated X and Y position SA data from one acquisition.
+
+        Args:
+            num_vals (int): The number of samples to capture
+        Returns: 
+            timestamps (ndarray): floats, shared by X and Y
+            x_data (ndarray): floats
+            y_data (ndarray): floats
+        """
+        sa_accum = MultiAccumulator([''.join((self.epicsID, ':SA:X')), ''.join((self.epicsID, ':SA:Y'))], num_vals)
+        sa_times, (sa_x_data, sa_y_data) = sa_accum.wait()
+        return sa_times, sa_x_data, sa_y_data
+
     def get_sa_data(self, num_vals):
         """Gets the ABCD SA data.
 
@@ -1,10 +1,38 @@
 import telnetlib
+import socket
 from Generic_BPMDevice import *
 from subprocess import Popen, PIPE
 from pkg_resources import require
 require("numpy")
 import numpy as np
 
+MAX_TBT_SAMPLES = 100000  # Largest number of turns which can be requested in one TBT_XY query
+
+
+def parse_binary_block(reply):
+    """Extracts the data from an IEEE 488.2 definite length block.
+
+    The block is '#', one digit giving the number of length digits, the length in bytes and then the data.
+
+    Args:
+        reply (str): Reply holding the block. Anything before the '#' is ignored.
+    Returns:
+        str: The data bytes of the block, or None if the reply does not yet hold the whole block.
+    """
+    start = reply.find('#')
+    if start < 0 or len(reply) < start + 2:
+        return None
+    n_digits = int(reply[start + 1])
+    if n_digits == 0:
+        raise ValueError('Indefinite length blocks are not supported')
+    data_start = start + 2 + n_digits
+    if len(reply) < data_start:
+        return None
+    data_end = data_start + int(reply[start + 2:data_start])
+    if len(reply) < data_end:
+        return None
+    return reply[data_start:data_end]
+
 
 class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
     """BPM Device class that uses SCPI commands to communicate with Libera SparkER
@@ -52,6 +80,61 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         """
         return self.tn.read_until('\r\n',timeout).rstrip('\n') # Gets the reply, removes termination characters
 
+    def _read_binary_block(self, timeout=1.0):
+        """Private method that will read an IEEE 488.2 definite length block reply from the SparkER
+
+        telnetlib drops NUL and XON bytes and takes 0xFF as the start of a telnet command, and all of
+        these occur in float32 data. So the block, and the line termination after it, are read from
+        the socket under the telnet connection rather than through it.
+
+        Args:
+            timeout (float): Longest time in seconds to wait for each part of the reply
+        Returns:
+            str: The data bytes of the block
+        """
+        connection = self.tn.get_socket()
+        previous_timeout = connection.gettimeout()
+        connection.settimeout(timeout)
+        reply = ''
+        try:
+            while True:
+                block = parse_binary_block(reply)
+                if block is not None:
+                    start = reply.find('#')
+                    if '\n' in reply[start + 2 + int(reply[start + 1]) + len(block):]:
+                        return block
+                chunk = connection.recv(65536)
+                if not chunk:
+                    raise IOError('The SparkER closed the connection during a binary block')
+                reply += chunk
+        except socket.timeout:
+            raise IOError('Timed out reading a binary block from the SparkER')
+        finally:
+            connection.settimeout(previous_timeout)
+
+    def _get_tbt_xy(self, num_vals):
+        """Private method that fetches the X and Y turn by turn data in one query
+
+        In binary mode the reply is a block of little endian float32 values, otherwise whitespace
+        separated text. Either way the X and Y values are interleaved.
+
+        Args:
+            num_vals (int): The number of turns to capture, up to MAX_TBT_SAMPLES
+        Returns:
+            ndarray: X positions in um
+            ndarray: Y positions in um
+        """
+        if not 0 < num_vals <= MAX_TBT_SAMPLES:
+            raise ValueError('Between 1 and %d turns can be captured' % MAX_TBT_SAMPLES)
+        self._trigger_DAQ()
+        if self.binary_transfer:
+            self.tn.read_very_eager()  # Anything left in the telnet buffers would be taken as part of the block
+            self._telnet_write("TBT_XY %d" % num_vals)
+            replies = np.frombuffer(self._read_binary_block(), dtype='<f4').astype(float)
+        else:
+            replies = np.fromstring(self._telnet_query("TBT_XY %d" % num_vals), dtype=float, sep=' ')
+        return replies[0::2], replies[1::2]
+
     def _get_mac_address(self):
         node = self.IP  # Get the devices IP address
         host_info = Popen(["arp", "-n", node], stdout=PIPE).communicate()[0]  # arp with the device
@@ -75,21 +158,28 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         else:
             pass
 
-    def __init__(self, IPaddress, port, timeout, autoTrig = 1):
+    def __init__(self, IPaddress, port, timeout, autoTrig = 1, binary_transfer=False, tbt_samples=100):
         """Initializes the Libera BPM device object and assigns it an ID. 
 
         Args:
             dev_ID (str/int): The two digit ID number assigned to that specific BPM device. 
+            binary_transfer (bool): Fetch the TBT data as binary float32 blocks rather than text.
+            tbt_samples (int): The number of turns averaged for each position reading, up to MAX_TBT_SAMPLES.
         Returns:
 .
         """
         self.autoTrig = autoTrig
+        self.binary_transfer = binary_transfer
+        self.tbt_samples = tbt_samples
         self.IP = IPaddress
         self.timeout = timeout
         self.tn = telnetlib.Telnet(IPaddress, port, self.timeout) # Opens telnet connection
         self.mac_address = self._get_mac_address()
         self.DeviceID = self.get_device_id()
         self._telnet_query("START") # starts the device
+        if self.binary_transfer:
+            self._telnet_query("FORM:DATA REAL,32")  # Data as IEEE 488.2 blocks of float32
+            self._telnet_query("FORM:BORD SWAP")  # Little endian byte order
         self._trigger_DAQ()
         print("Opened connection to " + self.DeviceID)  # Informs the user the device is connected
 
@@ -105,14 +195,8 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: X position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query("TBT_XY 100")  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        x = replies[0::2]  # Grab the X data only
-        mean_x = np.mean(x)  # Calculate the average of the X data
-        mean_x = mean_x / 1000  # convert um to mm
-        return mean_x
+        x, y = self._get_tbt_xy(self.tbt_samples)  # Get tbt_samples samples of XY data
+        return np.mean(x) / 1000  # Average the X data, and convert um to mm
 
     def get_y_position(self):
         """Override method, gets the calculated Y position of the beam.
@@ -122,14 +206,20 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Returns: 
             float: Y position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query("TBT_XY 100")  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        y = replies[1::2]  # Grab the Y data only
-        mean_y = np.mean(y)  # Calculate the average of the Y data
-        mean_y = mean_y / 1000  # convert um to mm
-        return mean_y
+        x, y = self._get_tbt_xy(self.tbt_samples)  # Get tbt_samples samples of XY data
+        return np.mean(y) / 1000  # Average the Y data, and convert um to mm
+
+    def get_xy_position(self):
+        """Gets the calculated X and Y positions of the beam from one fetch of the TBT data.
+
+        Args:
+
+        Returns: 
+            float: X position in mm
+            float: Y position in mm
+        """
+        x, y = self._get_tbt_xy(self.tbt_samples)
+        return np.mean(x) / 1000, np.mean(y) / 1000
 
     def get_x_sa_data(self, num_vals):
         """Override method, gets the calculated X position SA data.
@@ -137,29 +227,38 @@ class SparkER_SCPI_BPMDevice(Generic_BPMDevice):
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            list: [raw_timestamp (tuple), X position in mm]
+            timestamps (ndarray): sample numbers, as the SCPI interface gives no timestamps
+            data (ndarray): X position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query(" ".join(("TBT_XY", num_vals)))  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        sa_x_data = replies[0::2]  # Grab the X data only
-        return sa_x_times, sa_x_data  #WHAT ABOUT THE TIMESTAMPS
+        sa_times, sa_x_data, sa_y_data = self.get_xy_sa_data(num_vals)
+        return sa_times, sa_x_data
 
     def get_y_sa_data(self, num_vals):
-        """Override method, gets the calculated X position SA data.
+        """Override method, gets the calculated Y position SA data.
 
         Args:
             num_vals (int): The number of samples to capture
         Returns: 
-            list: [raw_timestamp (tuple), X position in mm]
+            timestamps (ndarray): sample numbers, as the SCPI interface gives no timestamps
+            data (ndarray): Y position in mm
         """
-        self._trigger_DAQ()
-        replies = self._telnet_query(" ".join(("TBT_XY", num_vals)))  # Get 100 samples of XY data
-        replies = replies.rsplit()  # Split the data into lists
-        replies = np.array(map(float, replies))  # Convert the data into a float array
-        sa_y_data = replies[1::2]  # Grab the Y data only
-        return sa_y_times, sa_y_data  #WHAT ABOUT THE TIMESTAMPS
+        sa_times, sa_x_data, sa_y_data = self.get_xy_sa_data(num_vals)
+        return sa_times, sa_y_data
+
+    def get_xy_sa_data(self, num_vals):
+        """Override method, gets the calculated X and Y position SA data from one acquisition.
+
+        A single TBT_XY query returns the X and Y samples interleaved, so both come from the same turns.
+
+        Args:
+            num_vals (int): The number of samples to capture, up to MAX_TBT_SAMPLES
+        Returns: 
+            timestamps (ndarray): sample numbers, as the SCPI interface gives no timestamps
+            x_data (ndarray): X position in mm
+            y_data (ndarray): Y position in mm
+        """
+        sa_x_data, sa_y_data = self._get_tbt_xy(num_vals)
+        return np.arange(len(sa_x_data)), sa_x_data / 1000, sa_y_data / 1000  # convert um to mm
 
     def get_sa_data(self, num_vals):
         """Gets the ABCD SA data.
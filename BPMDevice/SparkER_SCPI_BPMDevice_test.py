@@ -1,7 +1,12 @@
 from framework_requires import BaseTestClass
 import unittest
+import struct
+import threading
+import SocketServer
+import numpy as np
 from mock import patch
 import BPMDevice
+from BPMDevice.SparkER_SCPI_BPMDevice import parse_binary_block, MAX_TBT_SAMPLES
 
 
 def mock_get_device_ID():
@@ -81,5 +86,85 @@ class ExpectedDataTest(BaseTestClass):
         self.assertEqual(self.Spark_test_inst.get_adc_sum(), 4000)
         self.assertTrue(mock_replies.called)
 
+
+class CompleteSparkER(BPMDevice.SparkER_SCPI_BPMDevice):
+    # The driver does not yet implement the BPM state methods, so they are filled in to allow an instance.
+    set_internal_state = get_internal_state = get_attenuation = set_attenuation = lambda self, *args: None
+
+
+class TextTransferTest(BaseTestClass):
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._get_mac_address", return_value='00:d0:50:31:03:b9')
+    @patch("telnetlib.Telnet")
+    def setUp(self, mock_telnet, mac_mock):
+        self.Spark_test_inst = CompleteSparkER("0", 0, 0)
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._telnet_query", side_effect=mock_BPM_replies)
+    def test_get_XY_SA_data_uses_one_query(self, mock_replies):
+        times, x_data, y_data = self.Spark_test_inst.get_xy_sa_data(100)
+        self.assertEqual(list(x_data), [0.001] * 9)
+        self.assertEqual(list(y_data), [0.002] * 9)
+        self.assertEqual(list(times), range(9))
+        self.assertEqual([args[0][0] for args in mock_replies.call_args_list].count("TBT_XY 100"), 1)
+
+
+class BinaryTransferTest(BaseTestClass):
+
+    @patch("BPMDevice.SparkER_SCPI_BPMDevice._get_mac_address", return_value='00:d0:50:31:03:b9')
+    @patch("telnetlib.Telnet")
+    def setUp(self, mock_telnet, mac_mock):
+        self.Spark_test_inst = CompleteSparkER("0", 0, 0, binary_transfer=True)
+
+    def test_parse_binary_block(self):
+        self.assertEqual(parse_binary_block("junk#15hello\r\n"), "hello")
+        self.assertEqual(parse_binary_block("#210\r\n34567890"), "\r\n34567890")
+        self.assertIsNone(parse_binary_block("#210\r\n"))
+        self.assertIsNone(parse_binary_block("#"))
+        self.assertRaises(ValueError, parse_binary_block, "#0abc")
+
+    def test_sample_count_is_limited(self):
+        self.assertRaises(ValueError, self.Spark_test_inst.get_xy_sa_data, 0)
+        self.assertRaises(ValueError, self.Spark_test_inst.get_xy_sa_data, MAX_TBT_SAMPLES + 1)
+
+# X and Y interleaved as little endian float32. The bytes include NUL, XON, 0xFF and a line ending,
+# all of which telnetlib would remove or act on.
+TBT_XY_BLOCK = struct.pack('<4f', 2000., 0., 2500., -1000.) + '\x00\x00\r\n' + '\x11\xff\x00\x3f'
+
+
+class BinaryScpiHandler(SocketServer.StreamRequestHandler):
+    # Replies to TBT_XY with a binary block, and to anything else with OK.
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            if line.startswith('TBT_XY'):
+                self.wfile.write('#2%02d' % len(TBT_XY_BLOCK) + TBT_XY_BLOCK + '\r\n')
+            else:
+                self.wfile.write('OK\r\n')
+            self.wfile.flush()
+
+
+class BinarySocketTest(BaseTestClass):
+
+    def setUp(self):
+        self.server = SocketServer.TCPServer(('127.0.0.1', 0), BinaryScpiHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        with patch("BPMDevice.SparkER_SCPI_BPMDevice._get_mac_address", return_value='00:d0:50:31:03:b9'):
+            self.Spark_test_inst = CompleteSparkER('127.0.0.1', self.server.server_address[1], 1,
+                                                   binary_transfer=True)
+        self.addCleanup(self.Spark_test_inst.tn.close)
+
+    def test_binary_TBT_XY_arrives_whole_over_telnet(self):
+        expected = np.frombuffer(TBT_XY_BLOCK, dtype='<f4').astype(float) / 1000.
+        for capture in range(2):
+            # The second capture shows the line ending after the first block was taken off the connection.
+            times, x_data, y_data = self.Spark_test_inst.get_xy_sa_data(3)
+            self.assertEqual(list(x_data), list(expected[0::2]))
+            self.assertEqual(list(y_data), list(expected[1::2]))
+        self.assertEqual(self.Spark_test_inst._telnet_query("TRIG"), 'OK\r')
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
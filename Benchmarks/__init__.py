@@ -0,0 +1,3 @@
+from benchmark_suite import BENCHMARKS, BASELINE_PATH, run_benchmarks, time_call, save_baseline, load_baseline, \
+    compare_with_baseline, comparison_table
+from fake_scpi_server import FakeScpiServer
@@ -0,0 +1,403 @@
+import os
+import glob
+import json
+import shutil
+import tempfile
+import platform
+import traceback
+from timeit import default_timer
+import numpy as np
+import BPMDevice
+import RFSignalGenerators
+import Tests
+import Latex_Report
+import helper_functions
+from helper_functions import array_calc_functions, helper_calc_functions, plotting_functions
+from helper_functions.figure_cache import HASH_EXTENSION
+from Test_system_common import TestSystem
+from fake_scpi_server import FakeScpiServer
+
+# Each benchmark times one call of the code under test, taking the best of several runs.
+# The times are compared with a baseline saved on the same machine, and any which are slower than
+# the baseline by more than the tolerance are flagged as regressions.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = 0.3
+RF_FREQUENCY = 499.68  # MHz
+ACCUMULATOR_SAMPLES = 10000
+SA_SAMPLES = 1000
+
+
+class _Update(float):
+    """Private class standing in for a camonitor update, a value carrying its raw timestamp."""
+
+    def __new__(cls, value, raw_stamp):
+        update = float.__new__(cls, value)
+        update.raw_stamp = raw_stamp
+        return update
+
+
+class Fixtures(object):
+    """The simulated hardware, results and scratch space the benchmarks run on.
+
+    Everything is made the first time it is needed and removed by close().
+
+    Attributes:
+        directory (str): Temporary directory holding the results and figures.
+    """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix='bpm_benchmarks_')
+        self._test_system = None
+        self._results = None
+        self._server = None
+        self._rigol = None
+        self.updates = [_Update(n * 1e-3, (1500000000 + n // 10000, (n % 10000) * 100000))
+                        for n in range(ACCUMULATOR_SAMPLES)]
+
+    def test_system(self):
+        """Returns a test system made of the simulated RF source, attenuator and BPM."""
+        if self._test_system is None:
+            self._test_system = TestSystem(bpm_epics_id='SIMULATED', rf_hw='Simulated', bpm_hw='Simulated',
+                                           atten_hw='Simulated')
+        return self._test_system
+
+    def results(self):
+        """Returns a results directory filled by running the tests on the simulated hardware."""
+        if self._results is None:
+            test_system = self.test_system()
+            self._results = Tests.tests_for_single_bpm(test_system, os.path.join(self.directory, 'results'),
+                                                       RF_FREQUENCY)
+            Tests.beam_position_equidistant_grid_raster_scan_test(test_system, -6, RF_FREQUENCY, 3, 3, 0.1, 10,
+                                                                  self._results)
+            Tests.noise_test(test_system, RF_FREQUENCY, samples=256, output_power_levels=range(-20, -40, -5),
+                             settling_time=0.1, sub_directory=self._results)
+        return self._results
+
+    def rigol(self):
+        """Returns a Rigol DSG3030 driver talking to a fake SCPI server over a local telnet connection."""
+        if self._rigol is None:
+            self._server = FakeScpiServer()
+            self._rigol = RFSignalGenerators.Rigol3030DSG_RFSigGen('127.0.0.1', self._server.port)
+        return self._rigol
+
+    def scratch(self, name):
+        """Returns an empty directory for the figures of one benchmark, with no cached figures."""
+        path = os.path.join(self.directory, 'scratch', name)
+        if os.path.exists(path):
+            for hash_path in glob.glob(os.path.join(path, '*' + HASH_EXTENSION)):
+                os.remove(hash_path)
+        else:
+            os.makedirs(path)
+        return path
+
+    def close(self):
+        """Closes the instruments and removes all the files made."""
+        self._rigol = None
+        if self._server is not None:
+            self._server.close()
+        self._test_system = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def time_call(function, before=None, repeat=5, min_time=0.1):
+    """Times a function, giving the best time of several runs.
+
+    Args:
+        function (function): Called with no arguments.
+        before (function): Called with no arguments before each timed call, outside the timing,
+            such as to clear a cache. With this each run is a single call.
+        repeat (int): Number of runs.
+        min_time (float): Without before, each run calls the function as many times as fit in this
+            many seconds, so fast functions are timed over many calls.
+
+    Returns:
+        float: Best time in seconds for one call.
+    """
+    number = 1
+    if before is None:
+        # Finds how many calls take at least min_time, so quick functions are not lost in timer noise.
+        while True:
+            elapsed = _time_calls(function, number)
+            if elapsed >= min_time:
+                break
+            number *= 10 if elapsed < min_time / 10. else 2
+    best = None
+    for run in range(repeat):
+        if before is not None:
+            before()
+        elapsed = _time_calls(function, number) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _time_calls(function, number):
+    """Private function timing a number of calls of a function."""
+    start = default_timer()
+    for call in range(number):
+        function()
+    return default_timer() - start
+
+
+def _accumulator_benchmark(fixtures):
+    # Feeds the updates straight to the callback, so no IOC is needed.
+    def accumulate():
+        accumulator = BPMDevice.Accumulator('BENCHMARK:SA:X', ACCUMULATOR_SAMPLES)
+        for update in fixtures.updates:
+            accumulator.add_value(update)
+        return accumulator.wait()
+    return {'function': accumulate}
+
+
+def _array_accumulator_benchmark(fixtures):
+    def accumulate():
+        accumulator = BPMDevice.ArrayAccumulator('BENCHMARK:SA:X', ACCUMULATOR_SAMPLES)
+        for update in fixtures.updates:
+            accumulator.add_value(update)
+        return accumulator.wait()
+    return {'function': accumulate}
+
+
+def _multi_accumulator_benchmark(fixtures):
+    def accumulate():
+        accumulator = BPMDevice.MultiAccumulator(['BENCHMARK:SA:X', 'BENCHMARK:SA:Y'], ACCUMULATOR_SAMPLES)
+        for update in fixtures.updates:
+            accumulator.add_value(update, 0)
+            accumulator.add_value(update, 1)
+        return accumulator.wait()
+    return {'function': accumulate}
+
+
+def _get_sa_data_benchmark(fixtures):
+    bpm = fixtures.test_system().BPM
+    return {'function': lambda: bpm.get_sa_data(SA_SAMPLES)}
+
+
+def _get_xy_sa_data_benchmark(fixtures):
+    bpm = fixtures.test_system().BPM
+    return {'function': lambda: bpm.get_xy_sa_data(SA_SAMPLES)}
+
+
+def _rigol_set_output_power_benchmark(fixtures):
+    # The driver sends two commands before its query, so this includes the TCP latency of that pattern.
+    rigol = fixtures.rigol()
+    return {'function': lambda: rigol.set_output_power(-50)}
+
+
+def _rigol_get_frequency_benchmark(fixtures):
+    rigol = fixtures.rigol()
+    return {'function': rigol.get_frequency}
+
+
+def _change_to_freq_domain_benchmark(fixtures):
+    times = list(np.arange(4096) * 1e-4)
+    data = list(np.sin(np.arange(4096) * 0.1))
+    return {'function': lambda: helper_calc_functions.change_to_freq_domain(times, data)}
+
+
+def _stat_dataset_benchmark(fixtures):
+    dataset = np.random.RandomState(0).normal(size=(20, SA_SAMPLES)).tolist()
+    return {'function': lambda: helper_calc_functions.stat_dataset(dataset)}
+
+
+def _get_stats_benchmark(fixtures):
+    data = np.random.RandomState(0).normal(size=SA_SAMPLES * 10).tolist()
+    return {'function': lambda: helper_calc_functions.get_stats(data)}
+
+
+def _subtract_mean_benchmark(fixtures):
+    data = np.random.RandomState(0).normal(size=SA_SAMPLES * 10).tolist()
+    return {'function': lambda: helper_calc_functions.subtract_mean(data, 0.5)}
+
+
+def _reconfigure_adc_data_benchmark(fixtures):
+    data = np.random.RandomState(0).randint(-2 ** 15, 2 ** 15, size=(10, 4, 1024)).tolist()
+    return {'function': lambda: helper_calc_functions.reconfigure_adc_data(data)}
+
+
+def _round_to_2sf_benchmark(fixtures):
+    data = np.random.RandomState(0).normal(size=SA_SAMPLES).tolist()
+    return {'function': lambda: helper_calc_functions.round_to_2sf(data)}
+
+
+def _adc_missing_bit_analysis_benchmark(fixtures):
+    data = np.random.RandomState(0).randint(-2 ** 15, 2 ** 15, size=(4, 16384))
+    # The analysis keeps its recent results, so the cache is emptied to time the analysis itself.
+    return {'function': lambda: array_calc_functions.adc_missing_bit_analysis(data, 16),
+            'before': array_calc_functions._bit_analysis_cache.clear}
+
+
+def _plot_benchmark(name, plot):
+    """Private function making a benchmark of a plot, drawn afresh on every run."""
+    def benchmark(fixtures):
+        arguments = plot(fixtures)
+        return {'function': lambda: arguments[0](fixtures.scratch(name), *arguments[1:]),
+                'before': lambda: fixtures.scratch(name)}
+    return benchmark
+
+
+def _fill_pattern_data():
+    duty_cycles = np.linspace(0.1, 1., 10)
+    return {'duty_cycles': [duty_cycles], 'x_pos_mean': [np.ones(10)], 'x_pos_std': [duty_cycles * 0.01],
+            'y_pos_mean': [np.ones(10)], 'y_pos_std': [duty_cycles * 0.01]}
+
+
+def _raster_plot_arguments(fixtures):
+    loaded_data = helper_functions.open_results(fixtures.results(), 'beam_position_raster_scan_data')
+    scan = helper_functions.evaluate_raster_scan(loaded_data)
+    centre = helper_functions.evaluate_centre_offset(loaded_data)
+    return (plotting_functions.plot_raster_scan, loaded_data, scan.results.tolist(), centre.results.tolist())
+
+
+def _noise_plot_arguments(fixtures):
+    loaded_data = helper_functions.open_results(fixtures.results(), 'Noise_test_data')
+    return plotting_functions.plot_noise, loaded_data, loaded_data
+
+
+def _assemble_report_benchmark(fixtures):
+    results = fixtures.results()
+    copy = os.path.join(fixtures.directory, 'report')
+
+    def fresh_copy():
+        # Each run starts from the results alone, with no figures or LaTeX build to reuse.
+        shutil.rmtree(copy, ignore_errors=True)
+        shutil.copytree(results, copy, ignore=shutil.ignore_patterns('*.pdf', '*' + HASH_EXTENSION))
+    return {'function': lambda: Latex_Report.assemble_report(copy, processes=1), 'before': fresh_copy,
+            'repeat': 2}
+
+
+# The benchmarks, in the order they are run. Each makes a dict of the function to time, and
+# optionally a function to call before each timed call and the number of runs.
+BENCHMARKS = [
+    ('accumulator', _accumulator_benchmark),
+    ('array_accumulator', _array_accumulator_benchmark),
+    ('multi_accumulator', _multi_accumulator_benchmark),
+    ('simulated_get_sa_data', _get_sa_data_benchmark),
+    ('simulated_get_xy_sa_data', _get_xy_sa_data_benchmark),
+    ('scpi_set_output_power', _rigol_set_output_power_benchmark),
+    ('scpi_get_frequency', _rigol_get_frequency_benchmark),
+    ('change_to_freq_domain', _change_to_freq_domain_benchmark),
+    ('stat_dataset', _stat_dataset_benchmark),
+    ('get_stats', _get_stats_benchmark),
+    ('subtract_mean', _subtract_mean_benchmark),
+    ('reconfigure_adc_data', _reconfigure_adc_data_benchmark),
+    ('round_to_2sf', _round_to_2sf_benchmark),
+    ('adc_missing_bit_analysis', _adc_missing_bit_analysis_benchmark),
+    ('plot_adc_bit_check_data', _plot_benchmark('plot_adc_bit_check_data', lambda fixtures: (
+        plotting_functions.plot_adc_bit_check_data,
+        helper_functions.open_results(fixtures.results(), 'ADC_bit_check_data')))),
+    ('plot_adc_int_atten_sweep_data', _plot_benchmark('plot_adc_int_atten_sweep_data', lambda fixtures: (
+        plotting_functions.plot_adc_int_atten_sweep_data,
+        helper_functions.open_results(fixtures.results(), 'ADC_int_atten_sweep_data')))),
+    ('plot_beam_power_dependence_data', _plot_benchmark('plot_beam_power_dependence_data', lambda fixtures: (
+        plotting_functions.plot_beam_power_dependence_data,
+        helper_functions.open_results(fixtures.results(), 'beam_power_dependence_data'),
+        'initial_BPM_state.json'))),
+    ('plot_fixed_voltage_amplitude_fill_pattern_data', _plot_benchmark(
+        'plot_fixed_voltage_amplitude_fill_pattern_data', lambda fixtures: (
+            plotting_functions.plot_fixed_voltage_amplitude_fill_pattern_data, _fill_pattern_data()))),
+    ('plot_scaled_voltage_amplitude_fill_pattern_data', _plot_benchmark(
+        'plot_scaled_voltage_amplitude_fill_pattern_data', lambda fixtures: (
+            plotting_functions.plot_scaled_voltage_amplitude_fill_pattern_data, _fill_pattern_data()))),
+    ('plot_raster_scan', _plot_benchmark('plot_raster_scan', _raster_plot_arguments)),
+    ('plot_noise', _plot_benchmark('plot_noise', _noise_plot_arguments)),
+    ('assemble_report', _assemble_report_benchmark)]
+
+
+def run_benchmarks(names=None):
+    """Runs the benchmarks on the simulated hardware.
+
+    A benchmark which raises an error is reported as failed, and the others still run.
+
+    Args:
+        names (list): Names of the benchmarks to run. Defaults to all of them.
+
+    Returns:
+        dict: For each benchmark, {'seconds': best time of one call} or {'error': traceback}.
+    """
+    fixtures = Fixtures()
+    results = {}
+    try:
+        for name, benchmark in BENCHMARKS:
+            if names and name not in names:
+                continue
+            print 'Running ', name
+            try:
+                timed = benchmark(fixtures)
+                results[name] = {'seconds': time_call(timed['function'], before=timed.get('before'),
+                                                      repeat=timed.get('repeat', 5))}
+            except Exception:
+                results[name] = {'error': traceback.format_exc()}
+    finally:
+        fixtures.close()
+    return results
+
+
+def machine_description():
+    """Describes the machine the benchmarks run on, as the times only compare on the same machine."""
+    return {'node': platform.node(), 'processor': platform.processor(), 'python': platform.python_version(),
+            'numpy': np.__version__}
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Saves the benchmark times as the baseline that later runs are compared with."""
+    baseline = {'machine': machine_description(),
+                'seconds': dict((name, result['seconds']) for name, result in results.items()
+                                if 'seconds' in result)}
+    with open(path, 'w') as write_file:
+        json.dump(baseline, write_file, indent=1, sort_keys=True)
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Loads the saved baseline, or returns None if there is not one."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as read_file:
+        return json.load(read_file)
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compares benchmark times with a baseline.
+
+    Args:
+        results (dict): Results from run_benchmarks.
+        baseline (dict): Baseline from load_baseline.
+        tolerance (float): Fraction a time may grow by before it is flagged as a regression.
+
+    Returns:
+        list: Tuples of (name, baseline seconds, seconds, ratio, status) for each benchmark run, where the
+            status is 'ok', 'regression', 'improved', 'new' or 'error'.
+    """
+    comparison = []
+    for name, benchmark in BENCHMARKS:
+        if name not in results:
+            continue
+        reference = baseline['seconds'].get(name) if baseline is not None else None
+        if 'error' in results[name]:
+            comparison.append((name, reference, None, None, 'error'))
+            continue
+        seconds = results[name]['seconds']
+        if reference is None:
+            comparison.append((name, None, seconds, None, 'new'))
+            continue
+        ratio = seconds / reference
+        if ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 / (1 + tolerance):
+            status = 'improved'
+        else:
+            status = 'ok'
+        comparison.append((name, reference, seconds, ratio, status))
+    return comparison
+
+
+def comparison_table(comparison):
+    """Formats the comparison from compare_with_baseline as a table, times in ms."""
+    rows = [('Benchmark', 'Baseline (ms)', 'Now (ms)', 'Ratio', 'Status')]
+    for name, reference, seconds, ratio, status in comparison:
+        rows.append((name, '' if reference is None else '%.3f' % (reference * 1e3),
+                     '' if seconds is None else '%.3f' % (seconds * 1e3),
+                     '' if ratio is None else '%.2f' % ratio, status))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
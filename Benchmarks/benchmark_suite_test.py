@@ -0,0 +1,73 @@
+from framework_requires import BaseTestClass
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import RFSignalGenerators
+from fake_scpi_server import FakeScpiServer
+from benchmark_suite import compare_with_baseline, comparison_table, save_baseline, load_baseline, time_call
+
+
+class FakeScpiServerTest(BaseTestClass):
+
+    def setUp(self):
+        self.server = FakeScpiServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_queries_reply_with_the_last_value_set(self):
+        self.assertEqual(self.server.respond('LEV?'), '-100.0')
+        self.assertEqual(self.server.respond('LEV -20'), None)
+        self.assertEqual(self.server.respond('LEV?'), '-20')
+        self.assertEqual(self.server.respond('OUTP ON'), None)
+        self.assertEqual(self.server.respond('OUTP?'), '1')
+
+    def test_rigol_driver_runs_against_the_server(self):
+        rigol = RFSignalGenerators.Rigol3030DSG_RFSigGen('127.0.0.1', self.server.port)
+        self.assertEqual(rigol.set_output_power(-50), (-50.0, '-50dBm'))
+        self.assertEqual(rigol.get_frequency()[0], 499.68)
+        self.assertTrue(rigol.turn_on_RF())
+        self.assertGreater(self.server.commands, 0)
+        del rigol
+
+
+class BaselineComparisonTest(BaseTestClass):
+
+    def setUp(self):
+        self.baseline = {'machine': {}, 'seconds': {'get_stats': 1.0, 'stat_dataset': 1.0, 'round_to_2sf': 1.0,
+                                                    'subtract_mean': 1.0}}
+
+    def test_each_benchmark_is_given_a_status(self):
+        results = {'get_stats': {'seconds': 1.5}, 'stat_dataset': {'seconds': 0.5}, 'round_to_2sf': {'seconds': 1.1},
+                   'subtract_mean': {'error': 'Traceback'}, 'change_to_freq_domain': {'seconds': 1.0}}
+        statuses = dict((name, status) for name, reference, seconds, ratio, status in
+                        compare_with_baseline(results, self.baseline, tolerance=0.25))
+        self.assertEqual(statuses, {'get_stats': 'regression', 'stat_dataset': 'improved', 'round_to_2sf': 'ok',
+                                    'subtract_mean': 'error', 'change_to_freq_domain': 'new'})
+
+    def test_everything_is_new_without_a_baseline(self):
+        comparison = compare_with_baseline({'get_stats': {'seconds': 1.5}}, None)
+        self.assertEqual(comparison, [('get_stats', None, 1.5, None, 'new')])
+        self.assertIn('get_stats', comparison_table(comparison))
+
+    def test_baseline_is_saved_without_the_failed_benchmarks(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'baseline.json')
+            self.assertEqual(load_baseline(path), None)
+            save_baseline({'get_stats': {'seconds': 1.5}, 'subtract_mean': {'error': 'Traceback'}}, path)
+            self.assertEqual(load_baseline(path)['seconds'], {'get_stats': 1.5})
+        finally:
+            shutil.rmtree(directory)
+
+    def test_time_call_calls_before_outside_the_timing(self):
+        calls = []
+        seconds = time_call(lambda: calls.append('call'), before=lambda: calls.append('before'), repeat=3)
+        self.assertEqual(calls, ['before', 'call'] * 3)
+        self.assertGreaterEqual(seconds, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import SocketServer
+
+# State of a Rigol DSG3030 at switch on, as SCPI query replies.
+RIGOL3030DSG_STATE = {'*IDN': 'Rigol Technologies,DSG3030,DSG3A000000001,00.01.00',
+                      'LEV': '-100.0', 'UNIT:POW': 'DBM', 'FREQ': '499.68MHz', 'OUTP': '0', 'LEV:LIM': '-40.0'}
+# Settings the instruments report back as numbers.
+SWITCH_STATES = {'ON': '1', 'OFF': '0'}
+
+
+class FakeScpiServer(object):
+    """A telnet server on the local machine which answers SCPI commands like a simple instrument.
+
+    Commands with a value, such as "LEV -20", set that value. Queries, such as "LEV?", reply with the
+    last value set, so the telnet drivers can be run against it without any hardware. Every reply
+    ends with a newline.
+
+    Attributes:
+        state (dict): Current value of each setting, keyed by the command without the '?'.
+        port (int): Port the server listens on, on 127.0.0.1.
+        commands (int): Number of commands received.
+    """
+
+    def __init__(self, state=None):
+        """Starts the server on a free port in a background thread.
+
+        Args:
+            state (dict): Starting value of each setting. Defaults to RIGOL3030DSG_STATE.
+        """
+        self.state = dict(RIGOL3030DSG_STATE if state is None else state)
+        self.commands = 0
+        self.server = SocketServer.ThreadingTCPServer(('127.0.0.1', 0), _ScpiHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def respond(self, command):
+        """Applies one command to the state.
+
+        Args:
+            command (str): The SCPI command, without line termination.
+
+        Returns:
+            str: The reply for a query, or None for a command which sets a value.
+        """
+        self.commands += 1
+        if command.endswith('?'):
+            return self.state.get(command[:-1], '0')
+        setting = command.split(' ', 1)
+        if len(setting) == 2:
+            self.state[setting[0]] = SWITCH_STATES.get(setting[1], setting[1])
+        return None
+
+    def close(self):
+        """Stops the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _ScpiHandler(SocketServer.StreamRequestHandler):
+    """Private class handling one telnet connection to the fake server, one command per line."""
+
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            command = line.strip()
+            if not command:
+                continue
+            reply = self.server.fake.respond(command)
+            if reply is not None:
+                self.wfile.write(reply + '\n')
+                self.wfile.flush()
@@ -15,10 +15,12 @@ class Simulated_GateSource(Generic_GateSource):
 
         """
 
-    def __init__(self):
+    def __init__(self, clock=None):
         """Initialises the Simulated GateSource object
 
         Args:
+            clock (Clock Obj): Test system clock. Changes to the modulation are recorded on it,
+                so a simulated BPM can model the signal settling.
 
         Returns:
 
@@ -26,6 +28,7 @@ class Simulated_GateSource(Generic_GateSource):
         self.dutycycle = 0  # default duty cycle level
         self.enable = False  # default output state
         self.period = 3  # default period in us
+        self.clock = clock
         print("Opened connection to \"Simulated GateSource\"")  # informs the user the object has been constructed
 
     def __del__(self):
@@ -38,6 +41,11 @@ class Simulated_GateSource(Generic_GateSource):
         """
         print("Closed connection to \"Simulated GateSource\"") # informs the user the object has been deconstructed
 
+    def _mark_change(self):
+        """Private method which records a change to the modulation on the test system clock."""
+        if self.clock is not None:
+            self.clock.mark_change()
+
     def get_device_id(self):
         """Override method, that will return device ID.
 
@@ -57,6 +65,7 @@ class Simulated_GateSource(Generic_GateSource):
 
         """
         self.enable = True  # make the virtual state on
+        self._mark_change()
         return self.get_modulation_state()
 
     def turn_off_modulation(self):
@@ -68,6 +77,7 @@ class Simulated_GateSource(Generic_GateSource):
 
         """
         self.enable = False  # make the virtual state off
+        self._mark_change()
         return self.get_modulation_state()
 
     def get_modulation_state(self):
@@ -148,4 +158,5 @@ class Simulated_GateSource(Generic_GateSource):
             raise ValueError
 
         self.dutycycle = dutycycle  # set the virtual duty cycle
+        self._mark_change()
         return self.get_pulse_dutycycle()
\ No newline at end of file
@@ -2,10 +2,13 @@ from pylatex import Document, Section, Figure, NoEscape, Command, Tabular
 from math import ceil
 import os
 import json
-from pkg_resources import require
-require("matplotlib")
-import matplotlib.pyplot as plt
+import hashlib
 import numpy as np
+from helper_functions.figure_cache import HASH_EXTENSION
+
+# Files written by pdflatex which carry the cross-references from one pass to the next.
+CROSS_REFERENCE_EXTENSIONS = ('.aux', '.toc', '.lof')
+BUILD_HASH_EXTENSION = '.build_hash'
 
 
 def takespread(sequence, num):
@@ -26,6 +29,7 @@ class TexReport:
     Attributes:
         doc (pylatex document Obj): LaTeX document that all text and figures
             for the report are written to. 
+        figures (list): Paths of the images added to the report.
     """
     def __init__(self, subdirectory):
         """Initialise the test report and start to record the data.
@@ -79,6 +83,8 @@ class TexReport:
         self.doc.append(NoEscape(r'\tableofcontents'))
         self.doc.append(NoEscape(r'\listoffigures'))
 
+        self.figures = []
+
     def _decimate_list(self, signal, size):
         step = len(signal) / size
         step = ceil(step)
@@ -137,7 +143,7 @@ class TexReport:
         with self.doc.create(Figure(position='htbp')) as plot:
             plot.add_image(image_name, width=NoEscape(r'%s\textwidth' % fig_width))
             plot.add_caption(str(caption))
-            plt.close()  # Close a figure window
+        self.figures.append(os.path.join(os.path.dirname(self.doc.default_filepath), image_name))
 
     def add_table_to_test(self, format_string, data, headings, caption=""):
         """Adds a figure to the current section of the report
@@ -181,16 +187,63 @@ class TexReport:
         self.doc.append(table)
         self.doc.append(NoEscape(r'\end{figure}'))
 
-    def create_report(self):
+    def create_report(self, max_passes=5):
         """Creates the report
         
         Compiles the tex file written by this object and creates a pdf output of the report. 
+        If the tex and every figure are the same as when the pdf was last built, the pdf is left as it is.
+        Otherwise pdflatex is run until the cross-reference files (table of contents, list of figures and
+        references) stop changing, up to max_passes times.
 
         Args: 
+            max_passes (int): Largest number of pdflatex runs.
 
         Returns:
-            
+            int: Number of pdflatex runs made.
         """
-        self.doc.generate_pdf(clean_tex=False, compiler='pdflatex')
-        self.doc.generate_pdf(clean_tex=False, compiler='pdflatex')
-        self.doc.generate_pdf(clean_tex=False, compiler='pdflatex')
+        filepath = self.doc.default_filepath
+        self.doc.generate_tex(filepath)
+        build_hash = self._build_hash(filepath)
+        if os.path.exists(filepath + '.pdf') and _file_text(filepath + BUILD_HASH_EXTENSION) == build_hash:
+            return 0
+
+        passes = 0
+        cross_references = _files_hash(filepath, CROSS_REFERENCE_EXTENSIONS)
+        while passes < max_passes:
+            self.doc.generate_pdf(clean=False, clean_tex=False, compiler='pdflatex')
+            passes += 1
+            previous_cross_references = cross_references
+            cross_references = _files_hash(filepath, CROSS_REFERENCE_EXTENSIONS)
+            if cross_references == previous_cross_references:
+                break
+        with open(filepath + BUILD_HASH_EXTENSION, 'w') as write_file:
+            write_file.write(build_hash)
+        return passes
+
+    def _build_hash(self, filepath):
+        """Private method giving a hash of the tex file and of every figure the report includes."""
+        digest = hashlib.sha1()
+        with open(filepath + '.tex', 'rb') as tex_file:
+            digest.update(tex_file.read())
+        for fig_path in self.figures:
+            digest.update(fig_path)
+            # The figures carry the hash of their data, so only that small file need be read.
+            digest.update(_file_text(fig_path + HASH_EXTENSION) or _file_text(fig_path) or '')
+        return digest.hexdigest()
+
+
+def _file_text(path):
+    """Private function returning the contents of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as read_file:
+        return read_file.read()
+
+
+def _files_hash(filepath, extensions):
+    """Private function giving a hash of the files with the given extensions, missing files included."""
+    digest = hashlib.sha1()
+    for extension in extensions:
+        digest.update(extension)
+        digest.update(_file_text(filepath + extension) or '')
+    return digest.hexdigest()
@@ -1,4 +1,5 @@
 from Tex_Report import TexReport
-from report_sections import assemble_report, report_section_adc_bit_test, report_section_adc_int_atten, \
+from report_sections import assemble_report, build_reports, report_section_adc_bit_test, report_section_adc_int_atten, \
     report_section_beam_power_dependence, report_section_bunch_train_length_dependency, \
     report_section_fixed_voltage_amplitude_fill_pattern
+from report_regeneration import find_result_directories, regenerate_reports, regeneration_summary
@@ -0,0 +1,194 @@
+import os
+import json
+import glob
+import time
+import hashlib
+import traceback
+from multiprocessing import Pool
+from helper_functions.result_store import MANIFEST_NAME, find_result_directories
+from helper_functions.figure_cache import HASH_EXTENSION
+from Tex_Report import BUILD_HASH_EXTENSION
+import report_sections
+
+# Each regenerated report gets a manifest recording the hashes of the results it was built from and of
+# the report code that built it. A report is only rebuilt when one of these has changed.
+REPORT_MANIFEST_NAME = 'report_manifest.json'
+REPORT_PATTERN = 'BPMTestReport_*.pdf'
+# Packages whose code decides what goes into a report.
+REPORT_CODE_PACKAGES = ('Latex_Report', 'helper_functions')
+# Reasons for a rebuild which the figure and build hashes can not see, so the hashes are thrown away.
+REDRAW_REASONS = ('forced', 'code changed')
+
+
+def code_versions():
+    """Hashes of the source files of the report code.
+
+    Returns:
+        dict: The sha1 of each source file, keyed by its path relative to the repository.
+    """
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    versions = {}
+    for package in REPORT_CODE_PACKAGES:
+        for path in glob.glob(os.path.join(repository, package, '*.py')):
+            if not path.endswith('_test.py'):
+                versions[os.path.relpath(path, repository).replace(os.sep, '/')] = _file_hash(path)
+    return versions
+
+
+def input_hashes(subdirectory):
+    """Hashes of the results a report is built from.
+
+    These are the JSON files of the results directory and the files of its result stores.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+
+    Returns:
+        dict: The sha1 of each input file, keyed by its path relative to the results directory.
+    """
+    hashes = {}
+    for name in os.listdir(subdirectory):
+        path = os.path.join(subdirectory, name)
+        if name.endswith('.json') and name != REPORT_MANIFEST_NAME:
+            hashes[name] = _file_hash(path)
+        elif os.path.exists(os.path.join(path, MANIFEST_NAME)):
+            for store_file in os.listdir(path):
+                hashes['/'.join((name, store_file))] = _file_hash(os.path.join(path, store_file))
+    return hashes
+
+
+def stale_reason(subdirectory, inputs, code):
+    """Checks if the report of a results directory needs building again.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+        inputs (dict): Current hashes of the results, from input_hashes.
+        code (dict): Current hashes of the report code, from code_versions.
+
+    Returns:
+        str: Why the report needs building, or None if it is up to date.
+    """
+    manifest_path = os.path.join(subdirectory, REPORT_MANIFEST_NAME)
+    if not glob.glob(os.path.join(subdirectory, REPORT_PATTERN)):
+        return 'no report'
+    if not os.path.exists(manifest_path):
+        return 'no manifest'
+    with open(manifest_path, 'r') as read_manifest:
+        manifest = json.load(read_manifest)
+    if manifest['inputs'] != inputs:
+        return 'results changed'
+    if manifest['code'] != code:
+        return 'code changed'
+    return None
+
+
+def remove_build_hashes(subdirectory):
+    """Removes the hash files which let a report build reuse its figures and pdf.
+
+    The hashes only cover the data, so after a change to the report code every figure must be drawn
+    again and the pdf built again.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+
+    Returns:
+        int: Number of hash files removed.
+    """
+    removed = 0
+    for extension in (HASH_EXTENSION, BUILD_HASH_EXTENSION):
+        for path in glob.glob(os.path.join(subdirectory, '*' + extension)):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def regenerate_reports(results_root, processes=None, force=False):
+    """Rebuilds the out of date reports under a results tree, in parallel.
+
+    Each results directory is checked, and if needed rebuilt, by one worker process.
+    A successful build writes the report manifest, so the report is skipped next time.
+
+    Args:
+        results_root (str): Root of the results tree.
+        processes (int): Number of reports checked and built at once. Defaults to one per CPU.
+        force (bool): Rebuild every report, even if it is up to date.
+
+    Returns:
+        list: One dict per results directory with the subdirectory, status ('up to date', 'rebuilt' or
+            'failed'), the reason it was rebuilt, the build time in seconds and any error traceback.
+    """
+    subdirectories = find_result_directories(results_root)
+    code = code_versions()
+    pool = Pool(processes=processes)
+    try:
+        outcomes = []
+        for outcome in pool.imap_unordered(_regenerate_report, [(subdirectory, code, force)
+                                                                for subdirectory in subdirectories]):
+            print outcome['status'], outcome['subdirectory']
+            outcomes.append(outcome)
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(outcomes, key=lambda outcome: outcome['subdirectory'])
+
+
+def _regenerate_report(job):
+    """Private function run in a worker process to check one report and rebuild it if it is out of date."""
+    subdirectory, code, force = job
+    outcome = {'subdirectory': subdirectory, 'status': 'up to date', 'reason': None, 'time': 0., 'error': None}
+    start = time.time()
+    try:
+        inputs = input_hashes(subdirectory)
+        outcome['reason'] = 'forced' if force else stale_reason(subdirectory, inputs, code)
+        if outcome['reason'] in REDRAW_REASONS:
+            remove_build_hashes(subdirectory)
+        if outcome['reason'] is not None:
+            report_sections.assemble_report(subdirectory, processes=1)
+            with open(os.path.join(subdirectory, REPORT_MANIFEST_NAME), 'w') as write_manifest:
+                json.dump({'inputs': inputs, 'code': code,
+                           'built': time.strftime('%d-%m-%Y_T_%H-%M-%S')},
+                          write_manifest, indent=1, sort_keys=True)
+            outcome['status'] = 'rebuilt'
+    except Exception:
+        outcome['status'] = 'failed'
+        outcome['error'] = traceback.format_exc()
+    outcome['time'] = time.time() - start
+    return outcome
+
+
+def regeneration_summary(outcomes, results_root=''):
+    """Formats the outcomes of regenerate_reports as a table.
+
+    Args:
+        outcomes (list): The outcomes returned by regenerate_reports.
+        results_root (str): Root of the results tree, left off the directory names.
+
+    Returns:
+        str: The table, with a line of totals at the end.
+    """
+    rows = [('Results', 'Status', 'Reason', 'Time (s)')]
+    for outcome in outcomes:
+        rows.append((os.path.relpath(outcome['subdirectory'], results_root) if results_root
+                     else outcome['subdirectory'],
+                     outcome['status'], outcome['reason'] or '', '%.1f' % outcome['time']))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    totals = dict((status, 0) for status in ('rebuilt', 'up to date', 'failed'))
+    for outcome in outcomes:
+        totals[outcome['status']] += 1
+    lines.append('%d reports: %d rebuilt, %d up to date, %d failed' % (len(outcomes), totals['rebuilt'],
+                                                                       totals['up to date'], totals['failed']))
+    for outcome in outcomes:
+        if outcome['error'] is not None:
+            lines.append('\n%s failed\n%s' % (outcome['subdirectory'], outcome['error']))
+    return '\n'.join(lines)
+
+
+def _file_hash(path):
+    """Private function returning the sha1 of a file, read in blocks so large arrays are not held in memory."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as read_file:
+        for block in iter(lambda: read_file.read(1 << 20), ''):
+            digest.update(block)
+    return digest.hexdigest()
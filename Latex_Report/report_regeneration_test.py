@@ -0,0 +1,89 @@
+from framework_requires import BaseTestClass
+import unittest
+import os
+import shutil
+import tempfile
+from mock import patch, Mock
+from helper_functions.figure_cache import render_figure
+import report_regeneration
+
+
+def fake_assemble_report(subdirectory, processes=None):
+    with open(os.path.join(subdirectory, 'BPMTestReport_00-d0-50-31-02-84.pdf'), 'w') as report:
+        report.write('report')
+
+
+def fail_assemble_report(subdirectory, processes=None):
+    raise ValueError('Bad results')
+
+
+class ReportRegenerationTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.root = tempfile.mkdtemp()
+        self.results = os.path.join(self.root, '00-d0-50-31-02-84', '20-01-2020_T_15-33')
+        os.makedirs(os.path.join(self.results, 'Noise_test_data'))
+        self.write(os.path.join(self.results, 'initial_BPM_state.json'), '{}')
+        self.write(os.path.join(self.results, 'Noise_test_data', 'manifest.json'), '{}')
+        self.write(os.path.join(self.results, 'Noise_test_data', 'x_pos.npy'), 'x')
+        self.code = {'Latex_Report/report_sections.py': 'abc'}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        with open(path, 'w') as write_file:
+            write_file.write(text)
+
+    def regenerate(self, assemble_report=fake_assemble_report, force=False):
+        with patch.object(report_regeneration.report_sections, 'assemble_report', side_effect=assemble_report):
+            return report_regeneration._regenerate_report((self.results, self.code, force))
+
+    def test_finds_each_results_directory(self):
+        os.makedirs(os.path.join(self.root, '00-d0-50-31-02-84', 'Campaign_notes'))
+        self.assertEqual(report_regeneration.find_result_directories(self.root), [self.results])
+
+    def test_inputs_include_result_stores(self):
+        self.assertEqual(sorted(report_regeneration.input_hashes(self.results)),
+                         ['Noise_test_data/manifest.json', 'Noise_test_data/x_pos.npy', 'initial_BPM_state.json'])
+
+    def test_report_is_only_rebuilt_when_it_is_stale(self):
+        self.assertEqual(self.regenerate()['reason'], 'no report')
+        self.assertEqual(self.regenerate()['status'], 'up to date')
+        self.write(os.path.join(self.results, 'Noise_test_data', 'x_pos.npy'), 'y')
+        self.assertEqual(self.regenerate()['reason'], 'results changed')
+        self.code = {'Latex_Report/report_sections.py': 'def'}
+        outcome = self.regenerate()
+        self.assertEqual((outcome['status'], outcome['reason']), ('rebuilt', 'code changed'))
+
+    def test_figures_are_drawn_again_when_the_code_changes_or_a_build_is_forced(self):
+        draw = Mock(__name__='draw_test_plot')
+
+        def assemble_report(subdirectory, processes=None):
+            render_figure(subdirectory, 'test.png', draw, [1, 2])
+            fake_assemble_report(subdirectory)
+        self.regenerate(assemble_report)
+        self.write(os.path.join(self.results, 'BPMTestReport_00-d0-50-31-02-84.build_hash'), 'abc')
+        self.code = {'Latex_Report/report_sections.py': 'def'}
+        self.assertEqual(self.regenerate(assemble_report)['reason'], 'code changed')
+        self.assertEqual(draw.call_count, 2)
+        self.assertFalse(os.path.exists(os.path.join(self.results, 'BPMTestReport_00-d0-50-31-02-84.build_hash')))
+        self.assertEqual(self.regenerate(assemble_report)['status'], 'up to date')
+        self.regenerate(assemble_report, force=True)
+        self.assertEqual(draw.call_count, 3)
+
+    def test_failed_build_is_retried_next_time(self):
+        outcome = self.regenerate(fail_assemble_report)
+        self.assertEqual(outcome['status'], 'failed')
+        self.assertIn('Bad results', outcome['error'])
+        self.assertEqual(self.regenerate()['status'], 'rebuilt')
+
+    def test_summary_counts_the_outcomes(self):
+        summary = report_regeneration.regeneration_summary([self.regenerate()], self.root)
+        self.assertIn('20-01-2020_T_15-33', summary)
+        self.assertIn('1 reports: 1 rebuilt, 0 up to date, 0 failed', summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 import helper_functions
 import Latex_Report
 import os.path
+import numpy as np
 import json
+import multiprocessing
 from helper_functions import pass_fail
 
 
@@ -11,7 +13,7 @@ def switching_state_label(switching_orig):
     elif switching_orig == 0:
         switching = 'Off'
     else:
-        raise ValueError('AGC value is incorrect')
+        raise ValueError('Switching value is incorrect')
     return switching
 
 
@@ -37,51 +39,151 @@ def dsc_state_label(dsc_orig):
     return dsc
 
 
-def assemble_report(subdirectory):
+def assemble_report(subdirectory, processes=None):
+    """Writes the test report for one set of results.
 
-    report = Latex_Report.TexReport(subdirectory=subdirectory)
+    The figures of each report section are drawn in a pool of worker processes, one job per section,
+    while the text of the report is written in this process in the usual order. Figures whose data
+    has not changed since they were last drawn are reused. Sections whose figures show the pass/fail
+    results are judged once in this process, and the verdicts passed to both the figures and the text.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+        processes (int): Number of worker processes drawing figures. Defaults to one per CPU.
+            With 1 the figures are drawn in this process. Workers of a pool cannot start pools of their
+            own, so callers running in a pool worker pass 1.
+
+    Returns:
 
+    """
+    sections = []  # report section, figure function, arguments
     if os.path.exists(os.path.join(subdirectory, 'ADC_bit_check_data.json')):
-        report_section_adc_bit_test(report_object=report, subdirectory=subdirectory,
-                                    test_data='ADC_bit_check_data.json')
-
-    if os.path.exists(os.path.join(subdirectory, 'ADC_int_atten_sweep_data.json')):
-        report_section_adc_int_atten(report_object=report, subdirectory=subdirectory,
-                                     test_data='ADC_int_atten_sweep_data.json')
-
-    if os.path.exists(os.path.join(subdirectory, 'beam_position_raster_scan_data.json')):
-        report_section_position_raster_scan(report_object=report, subdirectory=subdirectory,
-                                            test_data='beam_position_raster_scan_data.json')
-
-    if os.path.exists(os.path.join(subdirectory, 'beam_power_dependence_data.json')):
-        report_section_beam_power_dependence(report_object=report, subdirectory=subdirectory,
-                                             test_data='beam_power_dependence_data.json',
-                                             ref_data='initial_BPM_state.json')
-    if os.path.exists(os.path.join(subdirectory, 'beam_power_dependence_data_rf_power_sweep.json')):
-        report_section_beam_power_dependence(report_object=report, subdirectory=subdirectory,
-                                             test_data='beam_power_dependence_data_rf_power_sweep.json',
-                                             ref_data='initial_BPM_state.json')
+        sections.append((report_section_adc_bit_test, figures_adc_bit_test,
+                         {'test_data': 'ADC_bit_check_data.json',
+                          'verdicts': verdicts_adc_bit_test(subdirectory, 'ADC_bit_check_data.json')}))
+
+    if helper_functions.results_exist(subdirectory, 'ADC_int_atten_sweep_data'):
+        sections.append((report_section_adc_int_atten, figures_adc_int_atten,
+                         {'test_data': 'ADC_int_atten_sweep_data'}))
+
+    if helper_functions.results_exist(subdirectory, 'beam_position_raster_scan_data'):
+        sections.append((report_section_position_raster_scan, figures_position_raster_scan,
+                         {'test_data': 'beam_position_raster_scan_data',
+                          'verdicts': verdicts_position_raster_scan(subdirectory, 'beam_position_raster_scan_data')}))
+
+    if helper_functions.results_exist(subdirectory, 'beam_power_dependence_data'):
+        sections.append((report_section_beam_power_dependence, figures_beam_power_dependence,
+                         {'test_data': 'beam_power_dependence_data', 'ref_data': 'initial_BPM_state.json'}))
+    if helper_functions.results_exist(subdirectory, 'beam_power_dependence_data_rf_power_sweep'):
+        sections.append((report_section_beam_power_dependence, figures_beam_power_dependence,
+                         {'test_data': 'beam_power_dependence_data_rf_power_sweep',
+                          'ref_data': 'initial_BPM_state.json'}))
 
     if os.path.exists(os.path.join(subdirectory, 'constant_fill_charge_fill_sweep_data.json')):
-        report_section_fixed_voltage_amplitude_fill_pattern(report_object=report, subdirectory=subdirectory,
-                                                            test_data='constant_fill_charge_fill_sweep_data.json')
+        sections.append((report_section_fixed_voltage_amplitude_fill_pattern,
+                         figures_fixed_voltage_amplitude_fill_pattern,
+                         {'test_data': 'constant_fill_charge_fill_sweep_data.json'}))
 
     if os.path.exists(os.path.join(subdirectory, 'constant_bunch_charge_fill_sweep_data.json')):
-        report_section_bunch_train_length_dependency(report_object=report, subdirectory=subdirectory,
-                                                     test_data='constant_bunch_charge_fill_sweep_data.json')
+        sections.append((report_section_bunch_train_length_dependency, figures_bunch_train_length_dependency,
+                         {'test_data': 'constant_bunch_charge_fill_sweep_data.json'}))
 
-    if os.path.exists(os.path.join(subdirectory, 'Noise_test_data.json')):
-        report_section_noise_test(report_object=report, subdirectory=subdirectory,
-                                  test_data=['Noise_test_data.json', 'Noise_test_data_complex.json'])
+    if helper_functions.results_exist(subdirectory, 'Noise_test_data'):
+        sections.append((report_section_noise_test, figures_noise_test, {'test_data': 'Noise_test_data'}))
+
+    section_figures = _draw_section_figures(subdirectory, [(figure_function, arguments)
+                                                           for section, figure_function, arguments in sections],
+                                            processes)
+
+    report = Latex_Report.TexReport(subdirectory=subdirectory)
+    for (section, figure_function, arguments), figures in zip(sections, section_figures):
+        section(report_object=report, subdirectory=subdirectory, figures=figures, **arguments)
 
     report.create_report()
 
 
-def report_section_adc_bit_test(report_object, subdirectory, test_data):
+def build_reports(subdirectories, processes=None):
+    """Writes the test reports for several sets of results, in a pool of worker processes.
+
+    Each worker builds one report at a time, drawing its figures itself.
+
+    Args:
+        subdirectories (list): The folders the test results are stored in.
+        processes (int): Number of worker processes. Defaults to one per CPU.
+
+    Returns:
+        dict: For each folder, None if its report was written, otherwise the error raised.
+    """
+    pool = multiprocessing.Pool(processes)
+    try:
+        errors = pool.map(_build_report, subdirectories)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(subdirectories, errors))
+
+
+def _build_report(subdirectory):
+    """Private function writing one report in a worker, returning any error rather than raising it."""
+    try:
+        assemble_report(subdirectory, processes=1)
+    except Exception as error:
+        return '%s: %s' % (type(error).__name__, error)
+    return None
+
+
+def _draw_section_figures(subdirectory, figure_jobs, processes):
+    """Private function drawing the figures of each report section, in parallel if there are several sections.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+        figure_jobs (list): Pairs of figure function and its arguments, one per section.
+        processes (int): Number of worker processes.
+
+    Returns:
+        list: The figure names returned by each figure function.
+    """
+    if processes == 1 or len(figure_jobs) < 2:
+        return [figure_function(subdirectory=subdirectory, **arguments) for figure_function, arguments in figure_jobs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = [pool.apply_async(_call_figure_function, (figure_function, subdirectory, arguments))
+                   for figure_function, arguments in figure_jobs]
+        return [result.get() for result in results]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _call_figure_function(figure_function, subdirectory, arguments):
+    """Private function running one figure function in a worker process."""
+    return figure_function(subdirectory=subdirectory, **arguments)
+
+
+def verdicts_adc_bit_test(subdirectory, test_data):
+    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
+        loaded_data = json.load(read_data)
+    return [pass_fail.evaluate_adc_bit(loaded_data, lim=pass_fail.ADC_BIT_TEST_LIMIT)]
+
+
+def figures_adc_bit_test(subdirectory, test_data, verdicts=None):
+    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
+        loaded_data = json.load(read_data)
+    if verdicts is None:
+        verdicts = verdicts_adc_bit_test(subdirectory, test_data)
+    # The verdict holds the bit analysis, so it is not repeated for the plot.
+    return helper_functions.plot_adc_bit_check_data(sub_directory=subdirectory, loaded_data=loaded_data,
+                                                    data_std=verdicts[0].results)
+
+
+def report_section_adc_bit_test(report_object, subdirectory, test_data, figures=None, verdicts=None):
     with open(os.path.join(subdirectory, test_data), 'r') as read_data:
         loaded_data = json.load(read_data)
-    test_limit = 0.05
-    status_label, status = pass_fail.adc_bit_test_pass_fail(loaded_data=loaded_data, lim=test_limit)
+    if verdicts is None:
+        verdicts = verdicts_adc_bit_test(subdirectory, test_data)
+    verdict, = verdicts
+    test_limit = verdict.limit
+    status_label = verdict.label
     intro_text = r"""Excites with a sine wave and then gets the ADC data from each channel. 
      Plots the histogram to that any missing bits can be identified. The expected value is 0.5. 
      Any value 0.1 away from this indicates a problem.
@@ -106,22 +208,27 @@ def report_section_adc_bit_test(report_object, subdirectory, test_data):
     caption = "ADC range rached by the RF signal"
     headings = [["ADC", "Max", "Min"],
                 ["", "(counts)", "(counts)"]]
-    data = [range(len(loaded_data['data']) + 1)[1:],
-            [max(loaded_data['data'][x]) for x in range(len(loaded_data['data']))],
-            [min(loaded_data['data'][x]) for x in range(len(loaded_data['data']))]]
+    adc_data = np.asarray(loaded_data['data'])
+    data = [range(1, adc_data.shape[0] + 1),
+            np.max(adc_data, axis=1).tolist(),
+            np.min(adc_data, axis=1).tolist()]
     # copy the values to the report
     report_object.add_table_to_test('|c|c|c|', data, headings, caption)
 
-    fig1_adc = helper_functions.plot_adc_bit_check_data(sub_directory=subdirectory,
-                                                        loaded_data=loaded_data)
-    report_object.add_figure_to_test(image_name=fig1_adc, caption='ADC bit test. All should be close to 0.5',
+    if figures is None:
+        figures = figures_adc_bit_test(subdirectory, test_data, verdicts)
+    report_object.add_figure_to_test(image_name=figures, caption='ADC bit test. All should be close to 0.5',
                                      fig_width=0.6)
 
 
-def report_section_adc_int_atten(report_object, subdirectory, test_data):
-    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
-        loaded_data = json.load(read_data)
-    test_limit = 0.1
+def figures_adc_int_atten(subdirectory, test_data):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    return helper_functions.plot_adc_int_atten_sweep_data(sub_directory=subdirectory, loaded_data=loaded_data)
+
+
+def report_section_adc_int_atten(report_object, subdirectory, test_data, figures=None):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    test_limit = pass_fail.INTERNAL_ATTENUATOR_TEST_LIMIT
     status_label, status = pass_fail.internal_attenuator_pass_fail(loaded_data=loaded_data, lim=test_limit)
     intro_text = r"""The RF signal is a sine wave.
     As the external attenuation is reduced, the internal is increased to compensate. 
@@ -142,17 +249,23 @@ def report_section_adc_int_atten(report_object, subdirectory, test_data):
                        #                       'BPM attenuation setting %s dB' % str(loaded_data['bpm_attenuation']),
     # add the test details to the report
     report_object.setup_test(' - '.join((loaded_data['test_name'], status_label)), intro_text, device_names, parameter_names)
-    fig1_name, fig2_name = helper_functions.plot_adc_int_atten_sweep_data(sub_directory=subdirectory,
-                                                                          loaded_data=loaded_data)
+    if figures is None:
+        figures = figures_adc_int_atten(subdirectory, test_data)
+    fig1_name, fig2_name = figures
     report_object.add_figure_to_test(image_name=fig1_name, caption='Varying internal attenuation', fig_width=0.5)
     report_object.add_figure_to_test(image_name=fig2_name, caption='Varying internal attenuation (normalised signals)',
                                      fig_width=0.5)
 
 
-def report_section_beam_power_dependence(report_object, subdirectory, test_data, ref_data):
-    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
-        loaded_data = json.load(read_data)
-    test_limit = 100
+def figures_beam_power_dependence(subdirectory, test_data, ref_data):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    return helper_functions.plot_beam_power_dependence_data(sub_directory=subdirectory, loaded_data=loaded_data,
+                                                            ref_data=ref_data)
+
+
+def report_section_beam_power_dependence(report_object, subdirectory, test_data, ref_data, figures=None):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    test_limit = pass_fail.POWER_DEPENDENCE_TEST_LEVEL
     status_label, status = pass_fail.power_dependence_pass_fail(loaded_data=loaded_data, level=test_limit)
     intro_text = r"""Tests the relationship between power at the BPM inputs and values read from the BPM. 
        
@@ -178,38 +291,32 @@ def report_section_beam_power_dependence(report_object, subdirectory, test_data,
     caption = "Beam Power Dependence Results"
     headings = [["Input Power", " mean X Position", "mean Y Position", "Std X", "Std Y"],
                 ["(dBm)", "(um)", "(um)", "(nm)", "(nm)"]]
-    x_pos_mean, x_pos_std = helper_functions.stat_dataset(loaded_data['x_pos_raw'])
-    y_pos_mean, y_pos_std = helper_functions.stat_dataset(loaded_data['y_pos_raw'])
-    x_pos_mean_scaled = list()
-    x_pos_mean_scaled_abs = list()
-    for xpm in x_pos_mean:
-        x_pos_mean_scaled.append(xpm * 1e3)
-        x_pos_mean_scaled_abs.append(abs(x_pos_mean_scaled[-1]))
-    y_pos_mean_scaled = list()
-    y_pos_mean_scaled_abs = list()
-    for ypm in y_pos_mean:
-        y_pos_mean_scaled.append(ypm * 1e3)
-        y_pos_mean_scaled_abs.append(abs(y_pos_mean_scaled[-1]))
-    x_pos_std_scaled = list()
-    for xps in x_pos_std:
-        x_pos_std_scaled.append(xps * 1e6)
-    y_pos_std_scaled = list()
-    for yps in y_pos_std:
-        y_pos_std_scaled.append(yps * 1e6)
+    x_pos_mean, x_pos_std = helper_functions.array_calc_functions.stat_dataset(loaded_data['x_pos_raw'])
+    y_pos_mean, y_pos_std = helper_functions.array_calc_functions.stat_dataset(loaded_data['y_pos_raw'])
+    x_pos_mean_scaled = (x_pos_mean * 1e3).tolist()
+    y_pos_mean_scaled = (y_pos_mean * 1e3).tolist()
+    x_pos_std_scaled = (x_pos_std * 1e6).tolist()
+    y_pos_std_scaled = (y_pos_std * 1e6).tolist()
     data = [loaded_data['set_output_power_levels'],
             x_pos_mean_scaled, y_pos_mean_scaled,
             x_pos_std_scaled, y_pos_std_scaled]
     # copy the values to the report
     report_object.add_table_to_test('|c|c|c|c|c|', data, headings, caption)
-    fig1_bpd, fig_noise_time, fig_noise_freq = helper_functions.plot_beam_power_dependence_data(
-        sub_directory=subdirectory,
-        loaded_data=loaded_data,
-        ref_data=ref_data)
+    if figures is None:
+        figures = figures_beam_power_dependence(subdirectory, test_data, ref_data)
+    fig1_bpd, fig_noise_time, fig_noise_freq = figures
     report_object.add_figure_to_test(image_name=fig1_bpd, caption='Position errors as a function of input power',
                                      fig_width=0.5)
 
 
-def report_section_bunch_train_length_dependency(report_object, subdirectory, test_data):
+def figures_bunch_train_length_dependency(subdirectory, test_data):
+    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
+        loaded_data = json.load(read_data)
+    return helper_functions.plot_scaled_voltage_amplitude_fill_pattern_data(sub_directory=subdirectory,
+                                                                            loaded_data=loaded_data)
+
+
+def report_section_bunch_train_length_dependency(report_object, subdirectory, test_data, figures=None):
     with open(os.path.join(subdirectory, test_data), 'r') as read_data:
         loaded_data = json.load(read_data)
     intro_text = r"""
@@ -244,12 +351,19 @@ def report_section_bunch_train_length_dependency(report_object, subdirectory, te
             loaded_data['x_pos_std'], loaded_data['y_pos_std']]
     # copy the values to the report
     report_object.add_table_to_test('|c|c|c|c|c|', data, headings, caption)
-    fig_name = helper_functions.plot_scaled_voltage_amplitude_fill_pattern_data(sub_directory=subdirectory,
-                                                                                loaded_data=loaded_data)
-    report_object.add_figure_to_test(image_name=fig_name, caption=fig_name)
+    if figures is None:
+        figures = figures_bunch_train_length_dependency(subdirectory, test_data)
+    report_object.add_figure_to_test(image_name=figures, caption=figures)
 
 
-def report_section_fixed_voltage_amplitude_fill_pattern(report_object, subdirectory, test_data):
+def figures_fixed_voltage_amplitude_fill_pattern(subdirectory, test_data):
+    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
+        loaded_data = json.load(read_data)
+    return helper_functions.plot_fixed_voltage_amplitude_fill_pattern_data(sub_directory=subdirectory,
+                                                                           loaded_data=loaded_data)
+
+
+def report_section_fixed_voltage_amplitude_fill_pattern(report_object, subdirectory, test_data, figures=None):
     with open(os.path.join(subdirectory, test_data), 'r') as read_data:
         loaded_data = json.load(read_data)
     intro_text = r"""
@@ -284,18 +398,35 @@ def report_section_fixed_voltage_amplitude_fill_pattern(report_object, subdirect
 
     # copy the values to the report
     report_object.add_table_to_test('|c|c|c|c|c|', data, headings, caption)
-    fig_name = helper_functions.plot_fixed_voltage_amplitude_fill_pattern_data(sub_directory=subdirectory,
-                                                                               loaded_data=loaded_data)
-    report_object.add_figure_to_test(image_name=fig_name, caption=fig_name)
-
-
-def report_section_position_raster_scan(report_object, subdirectory, test_data):
-    with open(os.path.join(subdirectory, test_data), 'r') as read_data:
-        loaded_data = json.load(read_data)
-    test_limit = 0.05
-    status_label, status, test_results = pass_fail.raster_scan_pass_fail(loaded_data=loaded_data, lim=test_limit)
-    centre_test_limit = 0.03
-    centre_status_label, centre_status, centre_test_results = pass_fail.centre_offset_pass_fail(loaded_data=loaded_data, lim=centre_test_limit)
+    if figures is None:
+        figures = figures_fixed_voltage_amplitude_fill_pattern(subdirectory, test_data)
+    report_object.add_figure_to_test(image_name=figures, caption=figures)
+
+
+def verdicts_position_raster_scan(subdirectory, test_data):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    return [pass_fail.evaluate_raster_scan(loaded_data, lim=pass_fail.RASTER_SCAN_TEST_LIMIT),
+            pass_fail.evaluate_centre_offset(loaded_data, lim=pass_fail.RASTER_SCAN_CENTRE_TEST_LIMIT)]
+
+
+def figures_position_raster_scan(subdirectory, test_data, verdicts=None):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    if verdicts is None:
+        verdicts = verdicts_position_raster_scan(subdirectory, test_data)
+    scan_verdict, centre_verdict = verdicts
+    return helper_functions.plot_raster_scan(subdirectory, loaded_data, scan_verdict.results.tolist(),
+                                             centre_verdict.results.tolist())
+
+
+def report_section_position_raster_scan(report_object, subdirectory, test_data, figures=None, verdicts=None):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    if verdicts is None:
+        verdicts = verdicts_position_raster_scan(subdirectory, test_data)
+    scan_verdict, centre_verdict = verdicts
+    test_limit = scan_verdict.limit
+    status_label = scan_verdict.label
+    centre_test_limit = centre_verdict.limit
+    centre_status_label = centre_verdict.label
     # Readies text that will introduce this test in the report
     intro_text = r"""Moves the beam position in the XY plane and records beam position.
              A fixed RF frequency and power is used while the attenuator values are changed. 
@@ -318,16 +449,25 @@ def report_section_position_raster_scan(report_object, subdirectory, test_data):
 
     report_object.setup_test(' '.join((loaded_data['test_name'], '-scan', status_label, '-centre', centre_status_label)), intro_text, device_names, parameter_names)
 
-    fig_name = helper_functions.plot_raster_scan(subdirectory, loaded_data, test_results, centre_test_results)
+    if figures is None:
+        figures = figures_position_raster_scan(subdirectory, test_data, verdicts)
 
-    report_object.add_figure_to_test(image_name=fig_name, caption="Beam position equidistant grid raster scan test")
+    report_object.add_figure_to_test(image_name=figures, caption="Beam position equidistant grid raster scan test")
 
 
-def report_section_noise_test(report_object, subdirectory, test_data):
-    with open(os.path.join(subdirectory, test_data[0]), 'r') as read_data:
-        loaded_data = json.load(read_data)
-    with open(os.path.join(subdirectory, test_data[1]), 'r') as read_data_complex:
-        loaded_data_complex = json.load(read_data_complex)
+def figures_noise_test(subdirectory, test_data):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
+    if 'x_f_freq' in loaded_data:
+        loaded_data_complex = loaded_data
+    else:
+        # Older results kept the spectra in a separate file.
+        with open(os.path.join(subdirectory, test_data + '_complex.json'), 'r') as read_data_complex:
+            loaded_data_complex = json.load(read_data_complex)
+    return helper_functions.plot_noise(subdirectory, loaded_data, loaded_data_complex)
+
+
+def report_section_noise_test(report_object, subdirectory, test_data, figures=None):
+    loaded_data = helper_functions.open_results(subdirectory, test_data)
     intro_text = r"""Compares the noise generated.
 
         In order to get the baseline, the RF signal is turned off, and then different parameters 
@@ -349,8 +489,9 @@ def report_section_noise_test(report_object, subdirectory, test_data):
     # data = [x_pos_baseline, y_pos_baseline]
     # copy the values to the report
     # report_object.add_table_to_test('|c|c|', data, headings, caption)
-    fig_names = helper_functions.plot_noise(subdirectory, loaded_data, loaded_data_complex)
+    if figures is None:
+        figures = figures_noise_test(subdirectory, test_data)
 
-    for fig_n in fig_names:
+    for fig_n in figures:
         head, tail = os.path.split(fig_n)
         report_object.add_figure_to_test(image_name=fig_n, caption=tail)
@@ -0,0 +1,23 @@
+import sys
+import Test_system_common
+from pkg_resources import require
+require("numpy == 1.13.1")
+require("scipy == 1.2.3")
+
+# Tests a crate of BPMs in one go. Units with their own RF source and attenuator run at the same time,
+# units sharing an instrument wait for each other.
+dls_rf_frequency = 499.655  # MHz.
+data_store_location = sys.argv[1]
+crate = [{'bpm_epics_id': 'TS-DI-EBPM-05', 'rf_hw': 'Rigol3030DSG', 'bpm_hw': 'Libera_Brilliance',
+          'atten_hw': 'MC_RC4DAT6G95'},
+         {'bpm_epics_id': 'TS-DI-EBPM-06', 'rf_hw': 'ITechBL12HI', 'bpm_hw': 'Libera_Brilliance',
+          'atten_hw': 'MC_RC4DAT6G95',
+          'device_settings': {'Programmable_attenuators': {'MC_RC4DAT6G95': {'ipaddress': "172.23.252.144"}}}}]
+
+outcomes = Test_system_common.run_campaign(units=crate, data_location=data_store_location,
+                                           rf_frequency=dls_rf_frequency, settling_time=0.1)
+for outcome in outcomes:
+    if outcome['error'] is None:
+        print outcome['bpm_epics_id'], ' data stored in ', outcome['subdirectory']
+    else:
+        print outcome['bpm_epics_id'], ' FAILED\n', outcome['error']
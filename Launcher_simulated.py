@@ -2,8 +2,8 @@ import sys
 import os
 import time
 from pkg_resources import require
-require('numpy == 1.11.1')
-require('scipy == 0.19.1')
+require('numpy == 1.13.1')
+require('scipy == 1.2.3')
 require("matplotlib")
 import numpy as np
 import Test_system_common
@@ -20,6 +20,10 @@ class Generic_Prog_Atten():
     def set_channel_attenuation(self, channel, attenuation):
         pass
 
+    @abstractmethod
+    def set_channel_attenuations(self, attenuations):
+        pass
+
     @abstractmethod
     def get_channel_attenuation(self, channel):
         pass
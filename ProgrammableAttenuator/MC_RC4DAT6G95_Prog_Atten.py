@@ -13,6 +13,7 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
         #print ipaddress
         #print port
         self.tn = telnetlib.Telnet(ipaddress, port, self.timeout)  # connects to the telnet device
+        self.readback = None  # Last attenuation values read back from the device, one per channel.
         # gets the device of the telnet device, makes sure its the right one
         self.DeviceID = self.get_device_id()
         print "Connected to Programmable attenuator" + self.DeviceID
@@ -96,6 +97,7 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
             print 'Odd attenuation value ', attenuation
             raise ValueError
         self._check_attenuation(attenuation)
+        self.readback = None
         self._telnet_query(":CHAN:1:2:3:4:SETATT:" + str(attenuation))
         # print 'Attenuation requested', attenuation, 'Attenuation set', self.get_global_attenuation()
 
@@ -103,6 +105,7 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
         replies = self._telnet_query(':ATT?')
         replies = replies.split()
         replies = map(float, replies)
+        self.readback = replies
         return replies
 
     def set_channel_attenuation(self, channel, attenuation):
@@ -120,28 +123,56 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
         if type(channel) == str:
             raise TypeError
         command = ":CHAN:" + str(channel) + ":SETATT:" + str(attenuation)
+        self.readback = None
         self._telnet_write(command)
         test = self.get_channel_attenuation(channel)
         if attenuation != test:
+            self.readback = None
             self._telnet_write(command)
             test = self.get_channel_attenuation(channel)
         # print 'Channel ', channel, ' Attenuation requested', attenuation, 'Attenuation set', test
 
-    def get_channel_attenuation(self, atten_channel):
-        """
-        
-        Args:
-             atten_channel (number): The channel of the attenuator to use. This is in native values of 1,2,3,4.
-        
+    def set_channel_attenuations(self, attenuations):
+        """Sets several channels in one burst and verifies them with a single readback.
+
+        All of the channel commands are written back to back, then one ":ATT?" query reads back
+        every channel. Any channel which has not taken the new value is sent again once.
+        The readback is cached so that following get_channel_attenuation calls do not need
+        to go back to the device.
+
+                Args:
+                    attenuations (dict): channel (1,2,3,4): attenuation (0-95 in steps of 0.25).
+
+                Returns:
+                     list: Values of the attenuator on all four channels.
+                """
+        for channel, attenuation in attenuations.items():
+            self._check_channel(channel)
+            self._check_attenuation(attenuation)
+        pending = dict(attenuations)
+        for attempt in range(2):
+            self.readback = None
+            for channel, attenuation in sorted(pending.items()):
+                self._telnet_write(":CHAN:" + str(channel) + ":SETATT:" + str(attenuation))
+            # Each set command leaves a status line waiting. The query below reads the last of
+            # these along with its own reply, so the others are cleared first.
+            for md in range(len(pending) - 1):
+                self.tn.read_until("\r\n", self.timeout)
+            readback = self._read_attenuations()
+            pending = dict((channel, attenuation) for channel, attenuation in pending.items()
+                           if readback[channel - 1] != attenuation)
+            if not pending:
+                break
+        return readback
+
+    def _read_attenuations(self):
+        """Private method that reads back all four channels and caches the result.
+
         Returns:
-             float: Value of the attenuator on that channel.
+             list: Value of the attenuator on each channel.
         """
-        self._check_channel(atten_channel)
-        if type(atten_channel) == str:
-            raise TypeError
-        else:
-            command = ":ATT?"
-        reply = self._telnet_query(':ATT?')
+        command = ":ATT?"
+        reply = self._telnet_query(command)
         for md in range(10):
             if not reply:  # Checking for an empty string.
                 print 'Got nothing back .... Trying again.'
@@ -153,5 +184,21 @@ class MC_RC4DAT6G95_Prog_Atten(Generic_Prog_Atten):
                 break
             if md == 9:
                 raise IOError
-        vals = reply.split()
-        return float(vals[atten_channel - 1])
+        self.readback = map(float, reply.split())
+        return self.readback
+
+    def get_channel_attenuation(self, atten_channel):
+        """Returns the cached readback if one is held, otherwise reads back all channels.
+
+        Args:
+             atten_channel (number): The channel of the attenuator to use. This is in native values of 1,2,3,4.
+        
+        Returns:
+             float: Value of the attenuator on that channel.
+        """
+        self._check_channel(atten_channel)
+        if type(atten_channel) == str:
+            raise TypeError
+        if self.readback is None:
+            self._read_attenuations()
+        return self.readback[atten_channel - 1]
@@ -38,4 +38,27 @@ class ExpectedDataTest(BaseTestClass):
         self.assertRaises(TypeError, self.PA_test_inst.set_global_attenuation, ("D", 22))
         self.assertRaises(TypeError, self.PA_test_inst.set_global_attenuation, (33, 22))
 
+    def test_set_channel_attenuations_verifies_with_a_single_readback(self):
+        with patch.object(self.PA_test_inst, "_telnet_query", return_value="10 10 12.25 10") as mock_query:
+            readback = self.PA_test_inst.set_channel_attenuations({3: 12.25, 4: 10})
+            self.assertEqual(readback, [10., 10., 12.25, 10.])
+            self.assertEqual(mock_query.call_count, 1)
+            # Following reads are served from the cached readback.
+            self.assertEqual(self.PA_test_inst.get_channel_attenuation(3), 12.25)
+            self.assertEqual(self.PA_test_inst.get_channel_attenuation(4), 10.)
+            self.assertEqual(mock_query.call_count, 1)
 
+    def test_set_channel_attenuations_resends_channels_which_did_not_change(self):
+        with patch.object(self.PA_test_inst, "_telnet_query",
+                          side_effect=["10 10 10 10", "10 10 12.25 10"]) as mock_query:
+            readback = self.PA_test_inst.set_channel_attenuations({3: 12.25})
+            self.assertEqual(readback, [10., 10., 12.25, 10.])
+            self.assertEqual(mock_query.call_count, 2)
+
+    def test_set_channel_attenuations_errors_if_invalid_input_values_used(self):
+        self.assertRaises(ValueError, self.PA_test_inst.set_channel_attenuations, {5: 10})
+        self.assertRaises(ValueError, self.PA_test_inst.set_channel_attenuations, {1: 100})
+
+
+if __name__ == "__main__":
+    unittest.main()
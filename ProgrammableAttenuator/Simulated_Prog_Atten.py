@@ -7,11 +7,12 @@ import numpy as np
 
 class Simulated_Prog_Atten(Generic_Prog_Atten):
 
-    def __init__(self):
+    def __init__(self, clock=None):
         self.A = 0
         self.B = 0
         self.C = 0
         self.D = 0
+        self.clock = clock  # Changes are recorded on the test system clock, for the simulated BPM settling.
 
     def __del__(self):
         pass
@@ -23,6 +24,10 @@ class Simulated_Prog_Atten(Generic_Prog_Atten):
         elif attenuation > 95 or attenuation < 0:
             raise ValueError
 
+    def _mark_change(self):
+        if self.clock is not None:
+            self.clock.mark_change()
+
     def _check_channel(self, channel):
         if type(channel) == int:
             while channel not in [1, 2, 3, 4]:
@@ -39,6 +44,7 @@ class Simulated_Prog_Atten(Generic_Prog_Atten):
         self.B = attenuation
         self.C = attenuation
         self.D = attenuation
+        self._mark_change()
 
     def get_global_attenuation(self):
         return self.A, self.B, self.C, self.D
@@ -56,6 +62,12 @@ class Simulated_Prog_Atten(Generic_Prog_Atten):
             self.C = attenuation
         elif channel == 4:
             self.D = attenuation
+        self._mark_change()
+
+    def set_channel_attenuations(self, attenuations):
+        for channel, attenuation in attenuations.items():
+            self.set_channel_attenuation(channel, attenuation)
+        return [self.A, self.B, self.C, self.D]
 
     def get_channel_attenuation(self, channel):
         self._check_channel(channel)
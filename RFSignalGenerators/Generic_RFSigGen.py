@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+import time
 
 class Generic_RFSigGen():
     """Generic RF signal generator class used for hardware abstraction.
@@ -22,6 +23,18 @@ class Generic_RFSigGen():
     Output_State = False
     DeviceID = 'Abstract Device Class'
 
+    # Getters which can be answered from the state cache, and the cache entry they use.
+    _cached_getters = {'get_output_power': 'power',
+                       'get_frequency': 'frequency',
+                       'get_output_state': 'state'}
+    # Setters which write through to the state cache: (entries they change, entry their reply fills).
+    _cache_setters = {'set_output_power': (('power',), 'power'),
+                      'set_output_power_limit': (('power',), None),
+                      'set_frequency': (('frequency',), 'frequency'),
+                      'turn_on_RF': (('state', 'power'), 'state'),
+                      'turn_off_RF': (('state', 'power'), 'state')}
+    _commanded_states = {'turn_on_RF': True, 'turn_off_RF': False}
+
     def _split_num_char(self, s):
         """Private method to split up a numeric and characters. 
         
@@ -47,6 +60,86 @@ class Generic_RFSigGen():
 
         return (number, unit)
 
+    def enable_state_cache(self, ttl=None):
+        """Turns on the write through state cache for this device.
+
+        Once enabled the last commanded power, frequency and output state are remembered and the
+        getters answer locally instead of querying the instrument. An entry is only re-queried
+        when it has been invalidated by a setter or is older than the time to live.
+        This works on any child class as the existing methods are wrapped on the instance.
+
+        Args:
+            ttl (float): Time in seconds a cached value is trusted for. None means until invalidated.
+
+        Returns:
+
+        """
+        self._state_cache_ttl = ttl
+        if getattr(self, '_state_cache', None) is not None:
+            return  # The methods are already wrapped, only the time to live changes.
+        self._state_cache = {}
+        for name, key in self._cached_getters.items():
+            setattr(self, name, self._make_cached_getter(getattr(self, name), key))
+        for name, (keys, reply_key) in self._cache_setters.items():
+            setattr(self, name, self._make_cached_setter(getattr(self, name), keys, reply_key,
+                                                         self._commanded_states.get(name)))
+
+    def disable_state_cache(self):
+        """Turns off the state cache so that every getter queries the instrument again.
+
+        Args:
+
+        Returns:
+
+        """
+        for name in list(self._cached_getters) + list(self._cache_setters):
+            self.__dict__.pop(name, None)  # Removing the wrapper exposes the class method again.
+        self._state_cache = None
+
+    def invalidate_state_cache(self):
+        """Forgets all cached values so the next getter calls query the instrument.
+
+        Args:
+
+        Returns:
+
+        """
+        if getattr(self, '_state_cache', None) is not None:
+            self._state_cache.clear()
+
+    def _make_cached_getter(self, method, key):
+        """Private method which wraps a getter so that it is answered from the state cache."""
+        def cached_getter():
+            entry = self._state_cache.get(key)
+            if entry is not None and (self._state_cache_ttl is None or
+                                      time.time() - entry[0] < self._state_cache_ttl):
+                return entry[1]
+            value = method()
+            self._state_cache[key] = (time.time(), value)
+            return value
+        cached_getter.__doc__ = method.__doc__
+        return cached_getter
+
+    def _make_cached_setter(self, method, keys, reply_key=None, commanded_state=None):
+        """Private method which wraps a setter so that it writes through to the state cache.
+
+        The affected entries are dropped before the setter runs, so any readback the setter does
+        comes from the instrument. Output state setters store the state they read back, or the
+        commanded state if they return nothing, and the other setters store their readback.
+        """
+        def cached_setter(*args, **kwargs):
+            for key in keys:
+                self._state_cache.pop(key, None)
+            reply = method(*args, **kwargs)
+            if commanded_state is not None:
+                state = reply if type(reply) is bool else commanded_state
+                self._state_cache[reply_key] = (time.time(), state)
+            elif reply_key is not None and type(reply) is tuple and len(reply) == 2:
+                self._state_cache[reply_key] = (time.time(), reply)
+            return reply
+        cached_setter.__doc__ = method.__doc__
+        return cached_setter
+
     @abstractmethod
     def get_device_id(self):
         """Abstract method for override that will return device ID.
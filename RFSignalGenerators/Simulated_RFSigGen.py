@@ -20,13 +20,15 @@ class Simulated_RFSigGen(Generic_RFSigGen):
     """
 
     # Constructor and Deconstructor.
-    def __init__(self, limit=-40, noise_mag=None):
+    def __init__(self, limit=-40, noise_mag=None, clock=None):
         """Informs the user when the simulated device has been created in memory.
         
         The simulated device for the RF sig gen does not need any arguments. It's main 
         purpose is to repeat values that have been given to it with the 'set' methods. 
         
         Args:
+            clock (Clock Obj): Test system clock. Changes to the output are recorded on it,
+                so a simulated BPM can model the signal settling.
             
         Returns:
         
@@ -37,6 +39,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         self.Output_State = False  # Default output state is off/False
         self.limit = limit  # Sets the limit of the device
         self.noise_magnitude = noise_mag
+        self.clock = clock
         print("Constructed " + self.DeviceID)
 
     def __del__(self):
@@ -52,6 +55,11 @@ class Simulated_RFSigGen(Generic_RFSigGen):
         """
         print("Deconstructed " + self.DeviceID)  # Tells the user the object has been deconstructed
 
+    def _mark_change(self):
+        """Private method which records a change to the output on the test system clock."""
+        if self.clock is not None:
+            self.clock.mark_change()
+
     # API Calls
 
     def get_device_id(self):
@@ -101,6 +109,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             warnings.warn('Power limit has been reached, output will be capped')
 
         self.Output_Power = power # Sets the virtual output power
+        self._mark_change()
         return self.get_output_power()
 
     def get_frequency(self):
@@ -143,6 +152,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             bool: Returns True if the output is enabled, False if it is not. 
         """
         self.Output_State = True  # Sets the virtual output state to on
+        self._mark_change()
         return self.Output_State
 
     def turn_off_RF(self):
@@ -154,6 +164,7 @@ class Simulated_RFSigGen(Generic_RFSigGen):
             bool: Returns True if the output is enabled, False if it is not.
         """
         self.Output_State = False  # Sets the virtual output state to off
+        self._mark_change()
         return self.Output_State
 
     def get_output_state(self):
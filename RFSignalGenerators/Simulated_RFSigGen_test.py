@@ -75,6 +75,74 @@ class ExpectedDataTest(BaseTestClass):
 
 
 
+class CountingRFSigGen(Simulated_RFSigGen):
+    """Simulated device which counts how often the instrument is queried."""
+
+    def __init__(self, *args, **kwargs):
+        Simulated_RFSigGen.__init__(self, *args, **kwargs)
+        self.queries = 0
+
+    def get_output_power(self):
+        self.queries += 1
+        return Simulated_RFSigGen.get_output_power(self)
+
+    def get_output_state(self):
+        self.queries += 1
+        return Simulated_RFSigGen.get_output_state(self)
+
+
+class StateCacheTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.RFSim = CountingRFSigGen()
+        self.RFSim.enable_state_cache()
+
+    def test_getter_is_served_from_cache_after_set(self):
+        self.assertEqual(self.RFSim.set_output_power(-50), (-50, "-50dBm"))
+        queries = self.RFSim.queries
+        for _ in range(3):
+            self.assertEqual(self.RFSim.get_output_power(), (-50, "-50dBm"))
+        self.assertEqual(self.RFSim.queries, queries)
+
+    def test_setter_invalidates_cached_value(self):
+        self.RFSim.set_output_power(-50)
+        self.RFSim.set_output_power(-60)
+        self.assertEqual(self.RFSim.get_output_power(), (-60, "-60dBm"))
+
+    def test_output_state_is_written_through(self):
+        self.RFSim.turn_on_RF()
+        queries = self.RFSim.queries
+        self.assertTrue(self.RFSim.get_output_state())
+        self.RFSim.turn_off_RF()
+        self.assertFalse(self.RFSim.get_output_state())
+        self.assertEqual(self.RFSim.queries, queries)
+
+    @patch("time.time")
+    def test_cached_value_expires_after_ttl(self, mock_time):
+        mock_time.return_value = 100.0
+        self.RFSim.enable_state_cache(ttl=1)
+        self.RFSim.get_output_state()
+        queries = self.RFSim.queries
+        mock_time.return_value = 100.5
+        self.RFSim.get_output_state()
+        self.assertEqual(self.RFSim.queries, queries)
+        mock_time.return_value = 101.5
+        self.RFSim.get_output_state()
+        self.assertEqual(self.RFSim.queries, queries + 1)
+
+    def test_invalidate_and_disable_query_the_device(self):
+        self.RFSim.get_output_power()
+        queries = self.RFSim.queries
+        self.RFSim.invalidate_state_cache()
+        self.RFSim.get_output_power()
+        self.assertEqual(self.RFSim.queries, queries + 1)
+        self.RFSim.disable_state_cache()
+        self.RFSim.get_output_power()
+        self.RFSim.get_output_power()
+        self.assertEqual(self.RFSim.queries, queries + 3)
+
+
 if __name__ == "__main__":
         unittest.main()
 
@@ -1 +1,5 @@
 from test_system import *
+from clock import WallClock, VirtualClock
+from settling import settle_until_stable
+from campaign import run_campaign, instruments_used
+from instrumentation import Profiler, PROFILE_NAME
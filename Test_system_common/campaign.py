@@ -0,0 +1,129 @@
+import traceback
+from copy import deepcopy
+from multiprocessing import Pool, Manager
+from test_system import TestSystem, DEVICE_SETTINGS
+import Tests
+import Latex_Report
+
+# Which DEVICE_SETTINGS category holds the settings for each TestSystem hardware argument.
+HARDWARE_CATEGORIES = {'rf_hw': 'RF_sources',
+                       'gate_hw': 'Modulation_sources',
+                       'trigger_hw': 'Trigger_sources',
+                       'atten_hw': 'Programmable_attenuators'}
+
+
+def instruments_used(unit):
+    """Lists the physical instruments a campaign unit needs exclusive use of.
+
+    Networked instruments are identified by address, so an RF source that is also used as the
+    gate source only counts once, and two units configured with the same address share the lock.
+    Simulated devices are created per unit and so need no lock.
+
+    Args:
+        unit (dict): Keyword arguments for TestSystem describing one BPM and its resources.
+
+    Returns:
+        list: Sorted instrument keys.
+    """
+    settings = deepcopy(DEVICE_SETTINGS)
+    for category, devices in unit.get('device_settings', {}).items():
+        for device, device_settings in devices.items():
+            settings.setdefault(category, {}).setdefault(device, {}).update(device_settings)
+    instruments = set()
+    for hw_argument, category in HARDWARE_CATEGORIES.items():
+        hw = unit.get(hw_argument)
+        if hw is None or hw == 'Simulated':
+            continue
+        instruments.add((settings[category][hw]['ipaddress'], settings[category][hw]['port']))
+    if unit['bpm_hw'] != 'Simulated':
+        instruments.add(('BPM', unit['bpm_epics_id']))
+    return sorted(instruments)
+
+
+def run_campaign(units, data_location, rf_frequency, settling_time=0.1, processes=None, report_processes=1):
+    """Runs the standard test sequence on several BPMs at the same time.
+
+    Each unit is tested in its own process. Before building its TestSystem a unit takes the locks
+    for every instrument it uses, always in sorted order so that two units can not deadlock.
+    Units which share an instrument therefore run one after the other, while units with their own
+    resources run concurrently. The reports are generated by a separate pool as each unit finishes,
+    so the next unit does not wait for pdflatex.
+
+    No channel access should be made in this process before calling this, as the EPICS context
+    does not survive the fork into the worker processes.
+
+    Args:
+        units (list): One dict per BPM, holding the TestSystem keyword arguments
+            (bpm_epics_id, rf_hw, bpm_hw, atten_hw and optionally gate_hw, trigger_hw, device_settings).
+        data_location (str): Root of the results tree.
+        rf_frequency (float): RF frequency to test at in MHz.
+        settling_time (float): Time in seconds to wait after changing the RF settings.
+        processes (int): Number of units tested at once. Defaults to one per unit.
+        report_processes (int): Number of reports generated at once.
+
+    Returns:
+        list: One dict per unit with the bpm_epics_id, the results subdirectory and any error traceback.
+    """
+    manager = Manager()
+    locks = {}
+    for unit in units:
+        for instrument in instruments_used(unit):
+            if instrument not in locks:
+                locks[instrument] = manager.Lock()
+
+    # maxtasksperchild gives every unit a fresh process, and so a fresh EPICS context.
+    test_pool = Pool(processes=processes or len(units), maxtasksperchild=1)
+    report_pool = Pool(processes=report_processes)
+    reports = []
+
+    def queue_report(outcome):
+        # Called as soon as a unit finishes, so its report is built while the other units are still testing.
+        if outcome['subdirectory'] is not None:
+            reports.append((outcome, report_pool.apply_async(_assemble_report, (outcome['subdirectory'],))))
+
+    jobs = [test_pool.apply_async(_test_unit, (unit, [locks[key] for key in instruments_used(unit)],
+                                               data_location, rf_frequency, settling_time),
+                                  callback=queue_report)
+            for unit in units]
+    test_pool.close()
+    outcomes = [job.get() for job in jobs]
+    test_pool.join()
+    report_pool.close()
+    for outcome, report in reports:
+        report_error = report.get()
+        if report_error is not None:
+            outcome['error'] = report_error
+    report_pool.join()
+    manager.shutdown()
+    return outcomes
+
+
+def _test_unit(unit, locks, data_location, rf_frequency, settling_time):
+    """Private function run in a worker process to test one BPM while holding its instrument locks."""
+    outcome = {'bpm_epics_id': unit['bpm_epics_id'], 'subdirectory': None, 'error': None}
+    for lock in locks:
+        lock.acquire()
+    try:
+        print 'Testing ', unit['bpm_epics_id']
+        test_sys = TestSystem(**unit)
+        outcome['subdirectory'] = Tests.tests_for_single_bpm(test_sys=test_sys, data_location=data_location,
+                                                             rf_frequency=rf_frequency,
+                                                             settling_time=settling_time)
+        # Closes the instrument connections before the locks are released.
+        del test_sys
+    except Exception:
+        outcome['error'] = traceback.format_exc()
+        print 'Testing of ', unit['bpm_epics_id'], ' failed\n', outcome['error']
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    return outcome
+
+
+def _assemble_report(subdirectory):
+    """Private function run in the report pool. Returns the traceback if the report could not be made."""
+    try:
+        Latex_Report.assemble_report(subdirectory=subdirectory, processes=1)
+    except Exception:
+        return traceback.format_exc()
+    return None
@@ -0,0 +1,119 @@
+from framework_requires import BaseTestClass
+import unittest
+from mock import patch, Mock, call
+from Test_system_common import campaign
+
+SIMULATED_UNIT = {'bpm_epics_id': 'A', 'rf_hw': 'Simulated', 'bpm_hw': 'Simulated', 'atten_hw': 'Simulated'}
+RIGOL_UNIT = {'bpm_epics_id': 'C', 'rf_hw': 'Rigol3030DSG', 'bpm_hw': 'Simulated', 'atten_hw': 'Simulated'}
+
+
+class FakeResult(object):
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakePool(object):
+    # Runs each job as soon as it is submitted, in this process.
+    created = []
+
+    def __init__(self, processes=None, maxtasksperchild=None):
+        self.processes = processes
+        self.maxtasksperchild = maxtasksperchild
+        FakePool.created.append(self)
+
+    def apply_async(self, function, args, callback=None):
+        result = function(*args)
+        if callback is not None:
+            callback(result)
+        return FakeResult(result)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class InstrumentsUsedTest(BaseTestClass):
+
+    def test_simulated_devices_need_no_lock(self):
+        self.assertEqual(campaign.instruments_used(SIMULATED_UNIT), [])
+
+    def test_an_instrument_used_twice_is_listed_once(self):
+        unit = dict(RIGOL_UNIT, gate_hw='Rigol3030DSG', atten_hw='MC_RC4DAT6G95', bpm_hw='Libera_Electron')
+        self.assertEqual(campaign.instruments_used(unit),
+                         [('172.23.252.143', 23), ('172.23.252.51', 5555), ('BPM', 'C')])
+
+    def test_device_settings_change_the_instrument(self):
+        unit = dict(RIGOL_UNIT, device_settings={'RF_sources': {'Rigol3030DSG': {'ipaddress': '172.23.252.52'}}})
+        self.assertEqual(campaign.instruments_used(unit), [('172.23.252.52', 5555)])
+        self.assertEqual(campaign.instruments_used(RIGOL_UNIT), [('172.23.252.51', 5555)])
+
+
+class TestUnitTest(BaseTestClass):
+
+    @patch("Test_system_common.campaign.Tests.tests_for_single_bpm", return_value='/results/C/')
+    @patch("Test_system_common.campaign.TestSystem")
+    def test_locks_are_taken_in_order_and_released_in_reverse(self, system_mock, tests_mock):
+        locks = Mock()
+        outcome = campaign._test_unit(RIGOL_UNIT, [locks.first, locks.second], '/results', 499.68, 0.1)
+        self.assertEqual(locks.mock_calls, [call.first.acquire(), call.second.acquire(),
+                                            call.second.release(), call.first.release()])
+        self.assertEqual(outcome, {'bpm_epics_id': 'C', 'subdirectory': '/results/C/', 'error': None})
+
+    @patch("Test_system_common.campaign.TestSystem", side_effect=IOError('No route to host'))
+    def test_locks_are_released_when_the_unit_fails(self, system_mock):
+        locks = Mock()
+        outcome = campaign._test_unit(RIGOL_UNIT, [locks.first], '/results', 499.68, 0.1)
+        self.assertEqual(locks.mock_calls, [call.first.acquire(), call.first.release()])
+        self.assertIsNone(outcome['subdirectory'])
+        self.assertIn('No route to host', outcome['error'])
+
+
+class RunCampaignTest(BaseTestClass):
+
+    def setUp(self):
+        FakePool.created = []
+
+    @patch("Test_system_common.campaign.Latex_Report.assemble_report")
+    @patch("Test_system_common.campaign._test_unit")
+    @patch("Test_system_common.campaign.Manager")
+    @patch("Test_system_common.campaign.Pool", FakePool)
+    def test_units_sharing_an_instrument_share_its_lock(self, manager_mock, test_unit_mock, report_mock):
+        manager_mock.return_value.Lock.side_effect = lambda: Mock()
+        test_unit_mock.side_effect = lambda unit, locks, *args: {'bpm_epics_id': unit['bpm_epics_id'],
+                                                                 'subdirectory': '/results/' + unit['bpm_epics_id'],
+                                                                 'error': None}
+        units = [SIMULATED_UNIT, RIGOL_UNIT, dict(RIGOL_UNIT, bpm_epics_id='D')]
+        outcomes = campaign.run_campaign(units, '/results', 499.68)
+        locks = dict((args[0][0]['bpm_epics_id'], args[0][1]) for args in test_unit_mock.call_args_list)
+        self.assertEqual(locks['A'], [])
+        self.assertEqual(len(locks['C']), 1)
+        self.assertIs(locks['C'][0], locks['D'][0])
+        self.assertEqual(manager_mock.return_value.Lock.call_count, 1)
+        self.assertEqual([outcome['bpm_epics_id'] for outcome in outcomes], ['A', 'C', 'D'])
+        self.assertTrue(manager_mock.return_value.shutdown.called)
+
+    @patch("Test_system_common.campaign.Latex_Report.assemble_report")
+    @patch("Test_system_common.campaign._test_unit")
+    @patch("Test_system_common.campaign.Manager")
+    @patch("Test_system_common.campaign.Pool", FakePool)
+    def test_reports_are_made_in_their_own_pool_for_each_finished_unit(self, manager_mock, test_unit_mock,
+                                                                       report_mock):
+        test_unit_mock.side_effect = [{'bpm_epics_id': 'A', 'subdirectory': '/results/A/', 'error': None},
+                                      {'bpm_epics_id': 'C', 'subdirectory': None, 'error': 'Traceback'}]
+        report_mock.side_effect = ValueError('Switching value is incorrect')
+        outcomes = campaign.run_campaign([SIMULATED_UNIT, RIGOL_UNIT], '/results', 499.68, report_processes=2)
+        test_pool, report_pool = FakePool.created
+        self.assertEqual((test_pool.processes, test_pool.maxtasksperchild), (2, 1))
+        self.assertEqual(report_pool.processes, 2)
+        report_mock.assert_called_once_with(subdirectory='/results/A/', processes=1)
+        self.assertIn('Switching value is incorrect', outcomes[0]['error'])
+        self.assertEqual(outcomes[1]['error'], 'Traceback')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import time
+
+
+class WallClock(object):
+    """Real time, used whenever any of the test system hardware is real.
+
+    Attributes:
+        last_change (float): Time of the last change made by a simulated device, if any.
+    """
+
+    def __init__(self):
+        self.last_change = self.time()
+
+    def time(self):
+        """Returns the current time in seconds."""
+        return time.time()
+
+    def sleep(self, seconds):
+        """Waits for the given number of seconds."""
+        time.sleep(seconds)
+
+    def mark_change(self):
+        """Records that a simulated device has changed the signal reaching the BPM."""
+        self.last_change = self.time()
+
+    def time_since_change(self):
+        """Returns the time in seconds since the last recorded change."""
+        return self.time() - self.last_change
+
+
+class VirtualClock(WallClock):
+    """Simulated time, for a test system made only of simulated devices.
+
+    sleep moves the time on straight away rather than waiting, so settling times cost nothing.
+    The simulated devices record their changes against this clock, which lets the simulated BPM
+    work out how far its readings have settled.
+
+    Attributes:
+        now (float): Current virtual time in seconds.
+        last_change (float): Virtual time of the last change made by a simulated device.
+    """
+
+    def __init__(self, start=0.):
+        self.now = start
+        WallClock.__init__(self)
+
+    def time(self):
+        """Returns the current virtual time in seconds."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Moves the virtual time on by the given number of seconds without waiting."""
+        if seconds > 0:
+            self.now += seconds
@@ -0,0 +1,208 @@
+import time
+import json
+from bisect import bisect_right
+
+# The profile is written into the results directory under this name.
+PROFILE_NAME = 'timing_profile.json'
+# Upper edges in seconds of the latency histogram bins, four to a decade from 10 us to 100 s.
+# The last bin holds everything slower.
+LATENCY_BIN_EDGES = [10 ** (exponent / 4.) for exponent in range(-20, 9)]
+# Connection methods whose string arguments are sent to the device.
+SENDING_METHODS = ('write', 'query')
+
+
+class Profiler(object):
+    """Records where the time of a test run goes.
+
+    For every driver method it keeps the number of calls, the time taken, a latency histogram and
+    the bytes sent and received. Calls which raise are counted too. For each test it keeps the wall
+    time, the time spent in driver calls for each device, and the real time spent in deliberate waits
+    on the test system clock. What is left of the wall time of a test is computation.
+
+    Bytes are counted on the telnet connections where a driver has one. For drivers without one,
+    such as the EPICS BPMs, the size of any arrays returned is counted as received.
+
+    Attributes:
+        methods (dict): Statistics of each method, keyed by '<device>.<method>'.
+        tests (dict): Time breakdown of each test, keyed by test name.
+        current_test (str): Name of the test running now.
+    """
+
+    def __init__(self):
+        self.methods = {}
+        self.tests = {}
+        self.current_test = None
+        self._active = []  # Statistics of the driver calls in progress, innermost last.
+        self._start = time.time()
+        self.start_test('setup')
+
+    def start_test(self, test_name):
+        """Marks the start of a test, so later calls and waits are counted against it."""
+        now = time.time()
+        if self.current_test is not None:
+            self.tests[self.current_test]['wall_time'] += now - self._test_start
+        self.current_test = test_name
+        self._test_start = now
+        self.tests.setdefault(test_name, {'wall_time': 0., 'sleep_time': 0., 'device_time': {}, 'calls': 0})
+
+    def record_call(self, device, method, elapsed, bytes_in=0):
+        """Adds one driver call to the statistics."""
+        stats = self._method_stats(device, method)
+        stats['calls'] += 1
+        stats['total_time'] += elapsed
+        stats['max_time'] = max(stats['max_time'], elapsed)
+        stats['bytes_in'] += bytes_in
+        stats['histogram'][bisect_right(LATENCY_BIN_EDGES, elapsed)] += 1
+        test = self.tests[self.current_test]
+        test['calls'] += 1
+        test['device_time'][device] = test['device_time'].get(device, 0.) + elapsed
+
+    def record_sleep(self, seconds):
+        """Adds a deliberate wait to the current test."""
+        self.tests[self.current_test]['sleep_time'] += seconds
+
+    def record_bytes(self, bytes_out, bytes_in):
+        """Adds bytes moved over a connection to the driver call in progress."""
+        if self._active:
+            self._active[-1]['bytes_out'] += bytes_out
+            self._active[-1]['bytes_in'] += bytes_in
+
+    def profile(self):
+        """Returns the statistics collected so far, as a dict ready to be written as JSON."""
+        self.start_test(self.current_test)  # Brings the wall time of the current test up to date.
+        return {'total_wall_time': time.time() - self._start,
+                'latency_bin_edges': LATENCY_BIN_EDGES,
+                'methods': self.methods,
+                'tests': self.tests}
+
+    def write(self, subdirectory):
+        """Writes the profile into a results directory.
+
+        Args:
+            subdirectory (str): Directory the test results were written to.
+
+        Returns:
+            str: Path of the profile file.
+        """
+        path = '/'.join((subdirectory.rstrip('/'), PROFILE_NAME))
+        with open(path, 'w') as write_file:
+            json.dump(self.profile(), write_file, indent=1, sort_keys=True)
+        return path
+
+    def _method_stats(self, device, method):
+        """Private method returning the statistics of a method, creating them on its first call."""
+        key = '.'.join((device, method))
+        if key not in self.methods:
+            self.methods[key] = {'calls': 0, 'total_time': 0., 'max_time': 0., 'bytes_out': 0, 'bytes_in': 0,
+                                 'histogram': [0] * (len(LATENCY_BIN_EDGES) + 1)}
+        return self.methods[key]
+
+
+class InstrumentedDevice(object):
+    """Stands in for a driver, timing every method called on it.
+
+    Attributes which are not methods are read from and written to the driver as normal.
+    Calls the driver makes on itself are not seen, so each top level call is counted once.
+    """
+
+    def __init__(self, device, name, profiler):
+        """Wraps a driver, and the telnet connection it holds, if any.
+
+        Args:
+            device: The driver.
+            name (str): Name the calls are recorded under, such as 'RF'.
+            profiler (Profiler): Where the calls are recorded.
+        """
+        object.__setattr__(self, '_device', device)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_profiler', profiler)
+        connection = getattr(device, 'tn', None)
+        if connection is not None and not isinstance(connection, CountingConnection):
+            device.tn = CountingConnection(connection, profiler)
+
+    def __getattr__(self, name):
+        value = getattr(self._device, name)
+        if not callable(value):
+            return value
+        device_name = self._name
+        profiler = self._profiler
+
+        def instrumented(*args, **kwargs):
+            stats = profiler._method_stats(device_name, name)
+            profiler._active.append(stats)
+            result = None  # A call which raises is still counted, with nothing received.
+            start = time.time()
+            try:
+                result = value(*args, **kwargs)
+                return result
+            finally:
+                elapsed = time.time() - start
+                profiler._active.pop()
+                profiler.record_call(device_name, name, elapsed,
+                                     0 if getattr(self._device, 'tn', None) is not None else _array_bytes(result))
+        instrumented.__name__ = name
+        return instrumented
+
+    def __setattr__(self, name, value):
+        setattr(self._device, name, value)
+
+
+class CountingConnection(object):
+    """Stands in for a telnet connection, counting the bytes sent and received."""
+
+    def __init__(self, connection, profiler):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        value = getattr(self._connection, name)
+        if not callable(value):
+            return value
+        profiler = self._profiler
+
+        def counted(*args, **kwargs):
+            result = value(*args, **kwargs)
+            bytes_out = sum(len(arg) for arg in args if isinstance(arg, str)) if name in SENDING_METHODS else 0
+            profiler.record_bytes(bytes_out, _string_bytes(result))
+            return result
+        return counted
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+class RecordingClock(object):
+    """Stands in for the test system clock, recording every deliberate wait."""
+
+    def __init__(self, clock, profiler):
+        self._clock = clock
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._clock, name)
+
+    def sleep(self, seconds):
+        """Waits on the clock, recording the real time the wait took.
+
+        The time asked for is not recorded, as on a VirtualClock it passes without any real waiting
+        and would make the waits of a test add up to more than its wall time.
+        """
+        start = time.time()
+        self._clock.sleep(seconds)
+        self._profiler.record_sleep(time.time() - start)
+
+
+def _string_bytes(result):
+    """Private function giving the length of the strings in a connection reply."""
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(len(item) for item in result if isinstance(item, str))
+    return 0
+
+
+def _array_bytes(result):
+    """Private function giving the size of the arrays in a driver reply."""
+    if isinstance(result, tuple):
+        return sum(_array_bytes(item) for item in result)
+    return getattr(result, 'nbytes', 0)
@@ -0,0 +1,113 @@
+from framework_requires import BaseTestClass
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from clock import VirtualClock, WallClock
+from instrumentation import Profiler, InstrumentedDevice, RecordingClock, CountingConnection, PROFILE_NAME
+
+
+class FakeTelnet(object):
+    def __init__(self):
+        self.timeout = 1
+
+    def write(self, message):
+        pass
+
+    def read_until(self, match, timeout):
+        return 'Rigol,DSG3030\n'
+
+
+class TelnetDevice(object):
+    def __init__(self):
+        self.tn = FakeTelnet()
+        self.limit = 10
+
+    def get_device_id(self):
+        self.tn.write('*IDN?\r\n')
+        return self.tn.read_until('\n', 1)
+
+
+class EpicsDevice(object):
+    def get_sa_data(self, num_vals):
+        return np.zeros(num_vals), np.zeros(num_vals)
+
+    def get_tt_data(self):
+        raise IOError('Capture timed out')
+
+
+class InstrumentationTest(BaseTestClass):
+
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def test_calls_and_bytes_are_recorded_per_method(self):
+        device = InstrumentedDevice(TelnetDevice(), 'RF', self.profiler)
+        self.assertEqual(device.get_device_id(), 'Rigol,DSG3030\n')
+        device.get_device_id()
+        stats = self.profiler.methods['RF.get_device_id']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual((stats['bytes_out'], stats['bytes_in']), (14, 28))
+        self.assertEqual(sum(stats['histogram']), 2)
+        self.assertTrue(isinstance(device.tn, CountingConnection))
+
+    def test_attributes_pass_through_to_the_device(self):
+        device = InstrumentedDevice(TelnetDevice(), 'RF', self.profiler)
+        device.limit = 5
+        self.assertEqual(device._device.limit, 5)
+        self.assertEqual(self.profiler.methods, {})
+
+    def test_arrays_returned_count_as_bytes_received(self):
+        device = InstrumentedDevice(EpicsDevice(), 'BPM', self.profiler)
+        device.get_sa_data(10)
+        self.assertEqual(self.profiler.methods['BPM.get_sa_data']['bytes_in'], 160)
+
+    def test_waits_and_device_time_are_recorded_per_test(self):
+        clock = RecordingClock(VirtualClock(), self.profiler)
+        device = InstrumentedDevice(EpicsDevice(), 'BPM', self.profiler)
+        self.profiler.start_test('Noise test')
+        clock.sleep(0.5)
+        clock.sleep(0.25)
+        device.get_sa_data(10)
+        self.assertEqual(clock.time(), 0.75)
+        profile = self.profiler.profile()
+        # Virtual waits take no real time, so they do not count against the wall time.
+        self.assertLess(profile['tests']['Noise test']['sleep_time'], 0.1)
+        self.assertLessEqual(profile['tests']['Noise test']['sleep_time'],
+                             profile['tests']['Noise test']['wall_time'])
+        self.assertEqual(profile['tests']['Noise test']['calls'], 1)
+        self.assertIn('BPM', profile['tests']['Noise test']['device_time'])
+        self.assertEqual(profile['tests']['setup']['calls'], 0)
+
+    def test_real_waits_are_recorded_within_the_wall_time(self):
+        clock = RecordingClock(WallClock(), self.profiler)
+        self.profiler.start_test('Noise test')
+        clock.sleep(0.02)
+        test = self.profiler.profile()['tests']['Noise test']
+        self.assertGreaterEqual(test['sleep_time'], 0.02)
+        self.assertLessEqual(test['sleep_time'], test['wall_time'])
+
+    def test_calls_which_raise_are_recorded(self):
+        device = InstrumentedDevice(EpicsDevice(), 'BPM', self.profiler)
+        self.profiler.start_test('Transient test')
+        self.assertRaises(IOError, device.get_tt_data)
+        stats = self.profiler.methods['BPM.get_tt_data']
+        self.assertEqual((stats['calls'], stats['bytes_in']), (1, 0))
+        self.assertEqual(self.profiler.tests['Transient test']['calls'], 1)
+        self.assertEqual(self.profiler._active, [])
+
+    def test_profile_is_written_into_the_results_directory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = self.profiler.write(directory + '/')
+            self.assertEqual(path, os.path.join(directory, PROFILE_NAME))
+            with open(path, 'r') as read_profile:
+                self.assertIn('setup', json.load(read_profile)['tests'])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import warnings
+import numpy as np
+
+# Functions reading the value watched while waiting for the signal to settle, the default tolerance for each,
+# and the time in seconds between updates of the value. Power is read in dBm, positions in mm.
+# Both come from the slow acquisition (SA) data, which the BPMs update at 10 Hz.
+SETTLE_READBACKS = {'input_power': (lambda bpm: (bpm.get_input_power(),), 0.05, 0.1),
+                    'position': (lambda bpm: bpm.get_xy_position(), 0.001, 0.1)}
+# Number of recent readings the noise is estimated from within one settle.
+RECENT_READINGS = 5
+# Number of earlier settles whose last change between readings is kept for the noise allowance.
+HISTORY_LENGTH = 10
+
+
+def settle_until_stable(bpm, clock, max_wait, readback='input_power', tolerance=None, poll_interval=None,
+                        history=None):
+    """Waits until the BPM readings stop changing, rather than for a fixed time.
+
+    The readback is read once per update, and each reading compared with the one before. The signal
+    is taken as settled once they differ by no more than the tolerance plus an allowance for the
+    noise on the readings, so a noisy but steady signal still counts as settled. Once four readings
+    have been taken the noise is estimated from the scatter of the last few about a smooth curve
+    through them, so a signal which is still changing does not add to its own allowance. Before
+    then it comes from the history of earlier settles. If the signal has not settled by max_wait
+    the wait ends anyway, as the fixed wait used to, and a warning is given.
+
+    Two fresh readings are needed to see a change, so the shortest settle time is 2 * poll_interval,
+    0.2 s at the 10 Hz SA update rate. A max_wait shorter than that is raised to it.
+
+    Args:
+        bpm (BPMDevice Obj): BPM to read.
+        clock (Clock Obj): Test system clock to wait on.
+        max_wait (float): Longest time in seconds to wait.
+        readback (str): Value to watch, a key of SETTLE_READBACKS.
+            'input_power' uses BPM.get_input_power, 'position' BPM.get_xy_position.
+        tolerance (float): Largest change between readings counted as stable.
+            Defaults to the tolerance in SETTLE_READBACKS.
+        poll_interval (float): Time in seconds between readings. Defaults to the update period in
+            SETTLE_READBACKS, so each reading is a new value rather than a repeat of the last.
+        history (list): The last change between readings in each earlier settle of this readback.
+            The change seen at the end of this settle is added to it. Pass the same list each time.
+
+    Returns:
+        float: Time in seconds taken to settle, or the longest wait if the readings never settled.
+    """
+    if max_wait <= 0:
+        return 0.
+    read_values, default_tolerance, update_period = SETTLE_READBACKS[readback]
+    if tolerance is None:
+        tolerance = default_tolerance
+    if poll_interval is None:
+        poll_interval = update_period
+    if history is None:
+        history = []
+    max_wait = max(max_wait, minimum_settle_time(poll_interval))
+    start = clock.time()
+    deadline = start + max_wait
+    readings = []
+    # Readings are only taken a whole update apart, so the last one is never a repeat of the one before.
+    while clock.time() + poll_interval <= deadline + 1e-9:
+        clock.sleep(poll_interval)
+        readings.append(read_values(bpm))
+        if len(readings) < 2:
+            continue
+        recent = np.array(readings[-RECENT_READINGS:], dtype=float)
+        change = np.abs(recent[-1] - recent[-2])
+        if np.all(change <= tolerance + _noise_allowance(recent, history)):
+            _remember(history, change)
+            return clock.time() - start
+    _remember(history, np.abs(np.subtract(readings[-1], readings[-2])))
+    clock.sleep(max(0., deadline - clock.time()))
+    warnings.warn('BPM %s did not settle within %s s' % (readback, max_wait))
+    return max_wait
+
+
+def minimum_settle_time(poll_interval):
+    """Returns the shortest time in seconds in which settle_until_stable can find the signal settled."""
+    return 2 * poll_interval
+
+
+def _noise_allowance(recent, history):
+    """Private function giving the largest change between two readings expected from noise alone.
+
+    This is two standard deviations of the change. With four or more readings the noise is taken from
+    their scatter about a quadratic fitted through them, which follows the tail of a transient
+    closely. With fewer it is taken from the median of the changes in the history.
+    """
+    if len(recent) >= 4:
+        steps = np.arange(len(recent))
+        steps = np.vstack((steps ** 2, steps, np.ones(len(recent)))).T
+        trend = steps.dot(np.linalg.lstsq(steps, recent, rcond=-1)[0])
+        noise = np.sqrt(np.sum((recent - trend) ** 2, axis=0) / (len(recent) - 3))
+        return 2 * np.sqrt(2) * noise
+    if history:
+        # The median size of a normally distributed change is 0.6745 of its standard deviation.
+        return 2 * np.median(history, axis=0) / 0.6745
+    return 0.
+
+
+def _remember(history, change):
+    """Private function adding the last change of a settle to the history, keeping the newest only."""
+    history.append(change)
+    del history[:-HISTORY_LENGTH]
@@ -0,0 +1,113 @@
+from framework_requires import BaseTestClass
+import unittest
+import warnings
+import numpy as np
+from mock import Mock
+from clock import VirtualClock
+from settling import settle_until_stable, minimum_settle_time
+
+
+class SettlingBPM(object):
+    # Input power which approaches its final value exponentially after the clock starts.
+    # Like the SA PVs, it only takes a new value every update_period, and holds it in between.
+    def __init__(self, clock, time_constant, noise=0., update_period=0.1):
+        self.clock = clock
+        self.time_constant = time_constant
+        self.noise = noise
+        self.update_period = update_period
+        self.rng = np.random.RandomState(0)
+        self.updates = {}
+        self.reads = []
+
+    def get_input_power(self):
+        update = int(round(self.clock.time() / self.update_period, 6))
+        self.reads.append(update)
+        if update not in self.updates:
+            transient = 10. * np.exp(-update * self.update_period / self.time_constant)
+            self.updates[update] = -20. - transient + (self.rng.random_sample() - 0.5) * self.noise
+        return self.updates[update]
+
+
+class SettleUntilStableTest(BaseTestClass):
+
+    def test_a_steady_signal_settles_in_two_updates(self):
+        clock = VirtualClock()
+        settle_time = settle_until_stable(SettlingBPM(clock, 0.001), clock, max_wait=2.)
+        self.assertAlmostEqual(settle_time, minimum_settle_time(0.1))
+        self.assertAlmostEqual(settle_time, 0.2)
+        self.assertAlmostEqual(clock.time(), settle_time)
+
+    def test_returns_once_the_readings_stop_changing(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.05)
+        settle_time = settle_until_stable(bpm, clock, max_wait=2.)
+        self.assertLess(settle_time, 0.5)
+        self.assertAlmostEqual(bpm.get_input_power(), -20., delta=0.05)
+
+    def test_slow_transients_are_waited_for(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.3)
+        settle_time = settle_until_stable(bpm, clock, max_wait=5.)
+        self.assertGreater(settle_time, 1.)
+        self.assertLess(settle_time, 5.)
+        self.assertAlmostEqual(bpm.get_input_power(), -20., delta=0.2)
+
+    def test_noisy_steady_readings_count_as_settled(self):
+        clock = VirtualClock()
+        settle_time = settle_until_stable(SettlingBPM(clock, 0.01, noise=1.), clock, max_wait=2.)
+        self.assertLess(settle_time, 1.5)
+
+    def test_every_reading_is_a_new_update(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.05)
+        settle_until_stable(bpm, clock, max_wait=2.)
+        self.assertEqual(len(bpm.reads), len(set(bpm.reads)))
+
+    def test_gives_up_at_the_maximum_wait(self):
+        clock = VirtualClock()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            settle_time = settle_until_stable(SettlingBPM(clock, 10.), clock, max_wait=1.)
+        self.assertEqual(settle_time, 1.)
+        self.assertAlmostEqual(clock.time(), 1.)
+        self.assertEqual(len(caught), 1)
+
+    def test_short_waits_are_raised_to_two_updates_and_measured(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.001)
+        self.assertAlmostEqual(settle_until_stable(bpm, clock, max_wait=0.1), 0.2)
+        self.assertEqual(bpm.reads, [1, 2])
+        clock = VirtualClock()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            settle_time = settle_until_stable(SettlingBPM(clock, 10.), clock, max_wait=0.1)
+        self.assertAlmostEqual(settle_time, 0.2)
+        self.assertEqual(len(caught), 1)
+
+    def test_earlier_settles_give_short_waits_a_noise_allowance(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.001, noise=1.)
+        history = []
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            settle_times = [settle_until_stable(bpm, clock, max_wait=0.1, history=history) for _ in range(20)]
+        self.assertEqual(len(history), 10)
+        self.assertLessEqual(len(caught), 3)
+        self.assertTrue(all(abs(settle_time - 0.2) < 1e-9 for settle_time in settle_times))
+
+    def test_without_a_history_noise_is_only_allowed_for_once_there_are_four_readings(self):
+        clock = VirtualClock()
+        bpm = SettlingBPM(clock, 0.001, noise=1.)
+        self.assertAlmostEqual(settle_until_stable(bpm, clock, max_wait=2.), 0.4)
+
+    def test_positions_are_read_x_and_y_together(self):
+        clock = VirtualClock()
+        bpm = Mock()
+        bpm.get_xy_position.return_value = (0.5, -0.5)
+        self.assertAlmostEqual(settle_until_stable(bpm, clock, max_wait=1., readback='position'), 0.2)
+        self.assertEqual(bpm.get_xy_position.call_count, 2)
+        self.assertFalse(bpm.get_x_position.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,13 @@
 from math import floor
+from copy import deepcopy
 import RFSignalGenerators
 import BPMDevice
 import Gate_Source
 import Trigger_Source
 import ProgrammableAttenuator
+from clock import WallClock, VirtualClock
+from settling import settle_until_stable
+from instrumentation import Profiler, InstrumentedDevice, RecordingClock
 
 # rf_object(RFSignalGenerator
 # Obj): Object
@@ -27,43 +31,76 @@ import ProgrammableAttenuator
 # with the gate source
 # hardware.
 
+# Connection settings for each supported device, grouped by role.
+# A TestSystem can override any of these with its device_settings argument.
+DEVICE_SETTINGS = {'RF_sources': {'Rigol3030DSG': {'ipaddress': "172.23.252.51", 'port': 5555,
+                                                   'timeout': 1, 'limit': 10},
+                                  'RigolDSG815': {'ipaddress': "", 'port': 5555,
+                                                   'timeout': 1, 'limit': 10},
+                                  'AtlantecASG3000U': {'ipaddress': "", 'port': 5555,
+                                                   'timeout': 1, 'limit': 10},
+                                  'ITechBL12HI': {'ipaddress': "172.23.252.102", 'port': 23,
+                                                  'timeout': 20, 'limit': 10},
+                                  'Simulated': {'limit': 10, 'noise_mag': 1}},
+
+                   'Modulation_sources': {'Rigol3030DSG': {'ipaddress': "172.23.252.51", 'port': 5555,
+                                                           'timeout': 1},
+                                          'ITechBL12HI': {'ipaddress': "172.23.252.102", 'port': 23,
+                                                          'timeout': 20},
+                                          'Simulated': {}},
+                   'Trigger_sources': {'Agilent33220A': {'ipaddress': "172.23.252.204", 'port': 5024,
+                                                         'timeout': 1},
+                                       'ITechBL12HI': {'ipaddress': "172.23.252.204", 'port': 5024,
+                                                       'timeout': 1}},
+                   'Programmable_attenuators': {'MC_RC4DAT6G95': {'ipaddress': "172.23.252.143", 'port': 23,
+                                                                  'timeout': 10},
+                                                'Simulated': {}},
+                   'BPM': {'Libera_Electron': {'damage_level': 0},
+                           'Libera_Brilliance': {'damage_level': 0},
+                           'Simulated': {'noise_mag': 1, 'damage_level': 2, 'seed': None, 'noise_colour': 0}}
+                   }
+
 
 class TestSystem:
     """This captures the behaviour of the system due to cabling losses"""
 
-    def __init__(self, bpm_epics_id, rf_hw, bpm_hw, atten_hw, gate_hw=None, trigger_hw=None):
+    def __init__(self, bpm_epics_id, rf_hw, bpm_hw, atten_hw, gate_hw=None, trigger_hw=None,
+                 rf_state_cache=False, rf_cache_ttl=None, device_settings=None, clock=None, profile=False):
+        """Connects to all the hardware making up the test system.
+
+        Args:
+            bpm_epics_id (str): EPICS ID of the BPM under test.
+            rf_hw (str): Name of the RF source, a key of DEVICE_SETTINGS['RF_sources'].
+            bpm_hw (str): Name of the BPM type.
+            atten_hw (str): Name of the programmable attenuator.
+            gate_hw (str): Name of the modulation source, if used.
+            trigger_hw (str): Name of the trigger source, if used.
+            rf_state_cache (bool): Answer repeated RF getter calls from the last commanded state.
+            rf_cache_ttl (float): Time in seconds a cached RF value is trusted for. None means until changed.
+            device_settings (dict): Overrides for DEVICE_SETTINGS, in the same layout.
+                e.g. {'Programmable_attenuators': {'MC_RC4DAT6G95': {'ipaddress': '172.23.252.144'}}}
+            clock (Clock Obj): Clock the tests wait on. Defaults to a VirtualClock if every device
+                is simulated, so settling waits take no time, and a WallClock otherwise.
+            profile (bool): Time every call made to the devices and every wait on the clock, in self.profiler.
+                Without this the devices are used directly, with no overhead.
+        """
         self.rf_hw = rf_hw
         self.gate_hw = gate_hw
         self.bpm_hw = bpm_hw
         self.atten_hw = atten_hw
         self.trigger_hw = trigger_hw
 
-        self.all_devices = {'RF_sources': {'Rigol3030DSG': {'ipaddress': "172.23.252.51", 'port': 5555,
-                                                            'timeout': 1, 'limit': 10},
-                                           'RigolDSG815': {'ipaddress': "", 'port': 5555,
-                                                            'timeout': 1, 'limit': 10},
-                                           'AtlantecASG3000U': {'ipaddress': "", 'port': 5555,
-                                                            'timeout': 1, 'limit': 10},
-                                           'ITechBL12HI': {'ipaddress': "172.23.252.102", 'port': 23,
-                                                           'timeout': 20, 'limit': 10},
-                                           'Simulated': {'limit': 10, 'noise_mag': 1}},
-
-                            'Modulation_sources': {'Rigol3030DSG': {'ipaddress': "172.23.252.51", 'port': 5555,
-                                                                    'timeout': 1},
-                                                   'ITechBL12HI': {'ipaddress': "172.23.252.102", 'port': 23,
-                                                                   'timeout': 20},
-                                                   'Simulated': {}},
-                            'Trigger_sources': {'Agilent33220A': {'ipaddress': "172.23.252.204", 'port': 5024,
-                                                                  'timeout': 1},
-                                                'ITechBL12HI': {'ipaddress': "172.23.252.204", 'port': 5024,
-                                                                'timeout': 1}},
-                            'Programmable_attenuators': {'MC_RC4DAT6G95': {'ipaddress': "172.23.252.143", 'port': 23,
-                                                                           'timeout': 10},
-                                                         'Simulated': {}},
-                            'BPM': {'Libera_Electron': {'damage_level': 0},
-                                    'Libera_Brilliance': {'damage_level': 0},
-                                    'Simulated': {'noise_mag': 1, 'damage_level': 2}}
-                            }
+        # Each system gets its own copy so that per unit overrides do not leak between systems.
+        self.all_devices = deepcopy(DEVICE_SETTINGS)
+        if device_settings is not None:
+            for category, devices in device_settings.items():
+                for device, settings in devices.items():
+                    self.all_devices.setdefault(category, {}).setdefault(device, {}).update(settings)
+
+        if clock is None:
+            all_simulated = all(hw in (None, 'Simulated') for hw in (rf_hw, bpm_hw, atten_hw, gate_hw, trigger_hw))
+            clock = VirtualClock() if all_simulated else WallClock()
+        self.clock = clock
 
         print 'Initialising RF source'
         if self.rf_hw == 'Rigol3030DSG':
@@ -103,7 +140,13 @@ class TestSystem:
         elif rf_hw == 'Simulated':
             self.RF = RFSignalGenerators.Simulated_RFSigGen(
                 limit=self.all_devices['RF_sources'][self.rf_hw]['limit'],
-                noise_mag=self.all_devices['RF_sources'][self.rf_hw]['noise_mag'])
+                noise_mag=self.all_devices['RF_sources'][self.rf_hw]['noise_mag'],
+                clock=self.clock)
+            # Matches the fixed output of the real sources.
+            self.rf_output = 5  # dBm
+        if rf_state_cache:
+            # Repeated getter calls are answered from the last commanded state rather than the instrument.
+            self.RF.enable_state_cache(ttl=rf_cache_ttl)
 
         if self.gate_hw is not None:
             print 'Initialising Gate'
@@ -116,7 +159,7 @@ class TestSystem:
                                                              self.all_devices['Modulation_sources'][self.gate_hw][
                                                                  'timeout'])
             elif self.gate_hw == 'Simulated':
-                self.GS = Gate_Source.Simulated_GateSource()
+                self.GS = Gate_Source.Simulated_GateSource(clock=self.clock)
         elif self.gate_hw is None:
             self.GS = None
 
@@ -141,7 +184,7 @@ class TestSystem:
                 timeout=self.all_devices['Programmable_attenuators'][self.atten_hw]['timeout']
                 )
         elif self.atten_hw == 'Simulated':
-            self.ProgAtten = ProgrammableAttenuator.Simulated_Prog_Atten()
+            self.ProgAtten = ProgrammableAttenuator.Simulated_Prog_Atten(clock=self.clock)
         else:
             raise ValueError('You need a valid device name for the programmable attenuator')
 
@@ -155,11 +198,19 @@ class TestSystem:
                                                     gatesim=self.GS,
                                                     progatten=self.ProgAtten,
                                                     noise_mag=self.all_devices['BPM'][self.bpm_hw]['noise_mag'],
-                                                    damage_level=self.all_devices['BPM'][self.bpm_hw]['damage_level']
+                                                    damage_level=self.all_devices['BPM'][self.bpm_hw]['damage_level'],
+                                                    seed=self.all_devices['BPM'][self.bpm_hw]['seed'],
+                                                    noise_colour=self.all_devices['BPM'][self.bpm_hw]['noise_colour'],
+                                                    clock=self.clock
                                                     )
         else:
             raise ValueError('You need to select Libera Electron, Libera Brilliance or Simulated.')
 
+        self.settle_history = {}  # Recent changes seen at the end of each settle, keyed by readback.
+        self.profiler = None
+        if profile:
+            self._instrument()
+
         # Get device IDs
         self.rf_id = self.RF.get_device_id()
         self.bpm_id = self.BPM.get_device_id()
@@ -190,13 +241,42 @@ class TestSystem:
         This depends on the wiring up of the test system."""
         self.channel_map = {'A': 4, 'B': 3, 'C': 2, 'D': 1}
 
+    def _instrument(self):
+        """Private method putting a profiling layer around each device and the clock."""
+        self.profiler = Profiler()
+        for role in ('RF', 'GS', 'Trigger', 'ProgAtten', 'BPM'):
+            if getattr(self, role) is not None:
+                setattr(self, role, InstrumentedDevice(getattr(self, role), role, self.profiler))
+        self.clock = RecordingClock(self.clock, self.profiler)
+
+    def settle(self, max_wait, readback='input_power', tolerance=None):
+        """Waits for the signal at the BPM to settle after a change, for at most max_wait seconds.
+
+        The changes seen at the end of earlier settles are kept for each readback, so that short waits
+        on a noisy signal still have a noise allowance.
+
+        Args:
+            max_wait (float): Longest time in seconds to wait. This is the old fixed settling time.
+                Waits shorter than settling.minimum_settle_time, two SA updates or 0.2 s, are raised to it.
+            readback (str): BPM value to watch, 'input_power' or 'position'.
+            tolerance (float): Largest change between readings counted as stable.
+
+        Returns:
+            float: Time in seconds the signal took to settle.
+        """
+        return settle_until_stable(self.BPM, self.clock, max_wait, readback=readback, tolerance=tolerance,
+                                   history=self.settle_history.setdefault(readback, []))
+
     def test_initialisation(self, test_name, frequency, output_power_level=-55):
         # Formats the test name and tells the user the test has started
         test_name = test_name.rsplit("Tests.")[1]
         test_name = test_name.replace("_", " ")
         print("Starting test \"" + test_name + "\"")
+        if self.profiler is not None:
+            self.profiler.start_test(test_name)
 
         # Initial setup of the RF system.
+        self.RF.invalidate_state_cache()
         self.RF.turn_off_RF()
         self.RF.set_frequency(frequency)
         max_system_output = self.rf_output - self.loss
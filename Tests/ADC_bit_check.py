@@ -1,5 +1,5 @@
-import time
 import json
+import helper_functions
 
 
 def adc_test(
@@ -37,8 +37,8 @@ def adc_test(
         test_system_object.BPM.get_internal_state()
     test_system_object.RF.set_output_power(output_power_level)
     test_system_object.RF.turn_on_RF()
-    time.sleep(settling_time) # Wait for signal to settle
-    # Gets 1024 samples for each ADC.
+    settle_time = test_system_object.settle(settling_time)  # Wait for signal to settle
+    # Gets 1024 samples for each ADC, as one int32 array.
     time_tmp, data_tmp = test_system_object.BPM.get_adc_data(16)  # record data
     # turn off the RF
     test_system_object.RF.turn_off_RF()
@@ -53,8 +53,9 @@ def adc_test(
                 'n_bits': test_system_object.BPM.adc_n_bits,
                 'n_adc': test_system_object.BPM.num_adcs,
                 'data': data_tmp,
-                'time': list(time_tmp)
+                'time': time_tmp,
+                'settle_time': settle_time
                 }
 
     with open(sub_directory + "ADC_bit_check_data.json", 'w') as write_file:
-        json.dump(data_out, write_file)
+        json.dump(data_out, write_file, cls=helper_functions.NumpyEncoder)
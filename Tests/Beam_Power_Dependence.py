@@ -1,7 +1,9 @@
 import numpy as np
-import time
-import json
-import sys
+import helper_functions
+import sweep_engine
+
+# Step fields holding the X and Y SA captures.
+_POSITION_FIELDS = ('x_pos_raw_time', 'x_pos_raw', 'y_pos_raw_time', 'y_pos_raw')
 
 
 def beam_power_dependence(
@@ -32,14 +34,6 @@ def beam_power_dependence(
     Returns:
      """
 
-    # Build up the arrays where the final values will be saved
-    x_pos_raw = []
-    y_pos_raw = []
-    x_pos_raw_time = []
-    y_pos_raw_time = []
-    input_power = []
-    applied_output_power_levels = []
-
     test_name, starting_power = test_system_object.test_initialisation(test_name=__name__,
                                                                        frequency=frequency,
                                                                        output_power_level=output_power_levels[0])
@@ -48,7 +42,7 @@ def beam_power_dependence(
 
     # turn off the RF
     test_system_object.RF.turn_off_RF()
-    time.sleep(settling_time) # Wait for signal to settle
+    test_system_object.clock.sleep(settling_time) # Wait for signal to settle
     
     # Set up BPM for normal operation
     test_system_object.BPM.set_internal_state({'agc': 0, 'attenuation': 35})
@@ -62,67 +56,45 @@ def beam_power_dependence(
     #    starting_attenuations[0] - starting_attenuations[3] > 0.00001:
     #     raise ValueError('The initial attenuation values are not the same value')
     # Perform the test
-    x_time_baseline, x_pos_baseline = test_system_object.BPM.get_x_sa_data(samples)  # record X pos
-    y_time_baseline, y_pos_baseline = test_system_object.BPM.get_y_sa_data(samples)  # record Y pos
+    store = helper_functions.ResultStore(sub_directory, "beam_power_dependence_data",
+                                         metadata={'test_name': test_name,
+                                                   'rf_id': test_system_object.rf_id,
+                                                   'bpm_id': test_system_object.bpm_id,
+                                                   'prog_atten_id': test_system_object.prog_atten_id,
+                                                   'frequency': frequency,
+                                                   'settling_time': settling_time,
+                                                   'set_output_power_levels': original_output_power_levels,
+                                                   'bpm_agc': agc,
+                                                   'bpm_switching': switches,
+                                                   'bpm_dsc': dsc,
+                                                   'bpm_attenuation': bpm_attenuation,
+                                                   'bpm_spec': test_system_object.BPM.spec},
+                                         step_fields=['output_power_levels', 'bpm_input_power', 'x_pos_raw',
+                                                      'y_pos_raw', 'x_pos_raw_time', 'y_pos_raw_time', 'settle_time'])
+    x_time_baseline, x_pos_baseline, y_pos_baseline = test_system_object.BPM.get_xy_sa_data(samples)  # X and Y pos
+    y_time_baseline = x_time_baseline
+    store.save_array('x_time_baseline', x_time_baseline)
+    store.save_array('x_pos_baseline', x_pos_baseline)
+    store.save_array('y_time_baseline', y_time_baseline)
+    store.save_array('y_pos_baseline', y_pos_baseline)
     fixed_rf_output = 0 # defines the max possible input power
     test_system_object.RF.set_output_power(fixed_rf_output) 
     test_system_object.ProgAtten.set_global_attenuation(fixed_rf_output - output_power_levels[0])
     test_system_object.RF.turn_on_RF()
-    time.sleep(settling_time) # Wait for signal to settle
-    ck = 0
-    for power_level in output_power_levels:
-        # Set attenuator value to give desired power level.
-        # As this is a relative adjustment the initial correction for system loss is
-        # still valid.
-        attenuation_applied = fixed_rf_output - power_level
-        test_system_object.ProgAtten.set_global_attenuation(attenuation_applied)
-        time.sleep(settling_time)  # Wait for signal to settle
-        applied_output_power_levels.append(fixed_rf_output - attenuation_applied)
-
-        # Perform the test
-        input_power.append(test_system_object.BPM.get_input_power())
-        x_time, x_pos_data = test_system_object.BPM.get_x_sa_data(samples)  # record X pos
-        y_time, y_pos_data = test_system_object.BPM.get_y_sa_data(samples)  # record Y pos
-        x_pos_raw.append(x_pos_data)
-        y_pos_raw.append(y_pos_data)
-        x_pos_raw_time.append(x_time)
-        y_pos_raw_time.append(y_time)
-        ck += 1
-        progress = (ck * 1.0 / len(output_power_levels)) * 100.
-        sys.stdout.write("\r [ %d" % progress + "% ] ")
-        sys.stdout.flush()
-
-    print "Done"
+    test_system_object.settle(settling_time)  # Wait for signal to settle
+    # As this is a relative adjustment the initial correction for system loss is still valid.
+    sweep_engine.run_sweep(test_system_object, store,
+                           points=[{'output_power_levels': power_level} for power_level in output_power_levels],
+                           apply_point=lambda system, point: system.ProgAtten.set_global_attenuation(
+                               fixed_rf_output - point['output_power_levels']),
+                           acquisitions=[sweep_engine.input_power(),
+                                         sweep_engine.xy_sa_capture(samples, fields=_POSITION_FIELDS)],
+                           settling_time=settling_time)
     # turn off the RF
     test_system_object.RF.turn_off_RF()
-    time.sleep(settling_time) # Wait for signal to settle
-
-    data_out = {'test_name': test_name,
-                'rf_id': test_system_object.rf_id,
-                'bpm_id': test_system_object.bpm_id,
-                'prog_atten_id': test_system_object.prog_atten_id,
-                'frequency': frequency,
-                'settling_time': settling_time,
-                'set_output_power_levels': original_output_power_levels,
-                'output_power_levels': applied_output_power_levels,
-                'bpm_input_power': input_power,
-                'bpm_agc': agc,
-                'bpm_switching': switches,
-                'bpm_dsc': dsc,
-                'bpm_attenuation': bpm_attenuation,
-                'x_pos_raw': x_pos_raw,
-                'y_pos_raw': y_pos_raw,
-                'x_pos_raw_time': x_pos_raw_time,
-                'y_pos_raw_time': y_pos_raw_time,
-                'x_time_baseline': x_time_baseline,
-                'x_pos_baseline': x_pos_baseline,
-                'y_time_baseline': y_time_baseline,
-                'y_pos_baseline': y_pos_baseline,
-                'bpm_spec': test_system_object.BPM.spec
-                }
-
-    with open(sub_directory + "beam_power_dependence_data.json", 'w') as write_file:
-        json.dump(data_out, write_file)
+    test_system_object.clock.sleep(settling_time) # Wait for signal to settle
+
+    store.finish()
         
 def beam_power_dependence_rf_power_sweep(
                           test_system_object,
@@ -152,18 +124,6 @@ def beam_power_dependence_rf_power_sweep(
     Returns:
      """
 
-    # Build up the arrays where the final values will be saved
-    x_pos_raw = []
-    y_pos_raw = []
-    x_pos_raw_time = []
-    y_pos_raw_time = []
-    a_raw = []
-    b_raw = []
-    c_raw = []
-    d_raw = []
-    input_power = []
-    applied_output_power_levels = []
-
     test_name, starting_power = test_system_object.test_initialisation(test_name='Tests.beam_power_dependence_rf_power_sweep',
                                                                        frequency=frequency,
                                                                        output_power_level=output_power_levels[0])
@@ -174,7 +134,7 @@ def beam_power_dependence_rf_power_sweep(
         
     # turn off the RF
     test_system_object.RF.turn_off_RF()
-    time.sleep(settling_time) # Wait for signal to settle
+    test_system_object.clock.sleep(settling_time) # Wait for signal to settle
     
     # Set up BPM for normal operation
     test_system_object.BPM.set_internal_state({'agc': 0, 'attenuation': 35})
@@ -183,70 +143,42 @@ def beam_power_dependence_rf_power_sweep(
         test_system_object.BPM.get_internal_state()
 
     # Perform the test
-    x_time_baseline, x_pos_baseline = test_system_object.BPM.get_x_sa_data(samples)  # record X pos
-    y_time_baseline, y_pos_baseline = test_system_object.BPM.get_y_sa_data(samples)  # record Y pos
+    store = helper_functions.ResultStore(sub_directory, "beam_power_dependence_data_rf_power_sweep",
+                                         metadata={'test_name': test_name,
+                                                   'rf_id': test_system_object.rf_id,
+                                                   'bpm_id': test_system_object.bpm_id,
+                                                   'prog_atten_id': test_system_object.prog_atten_id,
+                                                   'frequency': frequency,
+                                                   'settling_time': settling_time,
+                                                   'set_output_power_levels': original_output_power_levels,
+                                                   'bpm_agc': agc,
+                                                   'bpm_switching': switches,
+                                                   'bpm_dsc': dsc,
+                                                   'bpm_attenuation': bpm_attenuation,
+                                                   'bpm_spec': test_system_object.BPM.spec},
+                                         step_fields=['output_power_levels', 'bpm_input_power', 'x_pos_raw',
+                                                      'y_pos_raw', 'x_pos_raw_time', 'y_pos_raw_time', 'a_raw',
+                                                      'b_raw', 'c_raw', 'd_raw', 'settle_time'])
+    x_time_baseline, x_pos_baseline, y_pos_baseline = test_system_object.BPM.get_xy_sa_data(samples)  # X and Y pos
+    y_time_baseline = x_time_baseline
+    store.save_array('x_time_baseline', x_time_baseline)
+    store.save_array('x_pos_baseline', x_pos_baseline)
+    store.save_array('y_time_baseline', y_time_baseline)
+    store.save_array('y_pos_baseline', y_pos_baseline)
     test_system_object.RF.set_output_power(output_power_levels[0] ) 
     test_system_object.ProgAtten.set_global_attenuation(0)
     test_system_object.RF.turn_on_RF()
-    time.sleep(settling_time) # Wait for signal to settle
-    ck = 0
-    for power_level in output_power_levels:
-        # Set RF source to give desired power level.
-        # As this is a relative adjustment the initial correction for system loss is
-        # still valid.
-        test_system_object.RF.set_output_power(power_level) 
-        applied_output_power_levels.append(power_level)
-        time.sleep(settling_time) # Wait for signal to settle
-        # Perform the test
-        input_power.append(test_system_object.BPM.get_input_power())
-        x_time, x_pos_data = test_system_object.BPM.get_x_sa_data(samples)  # record X pos
-        y_time, y_pos_data = test_system_object.BPM.get_y_sa_data(samples)  # record Y pos
-        a_data, b_data, c_data, d_data = test_system_object.BPM.get_raw_bpm_buttons()
-        x_pos_raw.append(x_pos_data)
-        y_pos_raw.append(y_pos_data)
-        x_pos_raw_time.append(x_time)
-        y_pos_raw_time.append(y_time)
-        a_raw.append(a_data)
-        b_raw.append(b_data)
-        c_raw.append(c_data)
-        d_raw.append(d_data)
-        ck += 1
-        progress = (ck * 1.0 / len(output_power_levels)) * 100.
-        sys.stdout.write("\r [ %d" % progress + "% ] ")
-        sys.stdout.flush()
-
-    print "Done"
+    test_system_object.settle(settling_time)  # Wait for signal to settle
+    # As this is a relative adjustment the initial correction for system loss is still valid.
+    sweep_engine.run_sweep(test_system_object, store,
+                           points=[{'output_power_levels': power_level} for power_level in output_power_levels],
+                           apply_point=lambda system, point: system.RF.set_output_power(point['output_power_levels']),
+                           acquisitions=[sweep_engine.input_power(),
+                                         sweep_engine.xy_sa_capture(samples, fields=_POSITION_FIELDS),
+                                         sweep_engine.raw_buttons()],
+                           settling_time=settling_time)
     # turn off the RF
     test_system_object.RF.turn_off_RF()
-    time.sleep(settling_time) # Wait for signal to settle
-
-    data_out = {'test_name': test_name,
-                'rf_id': test_system_object.rf_id,
-                'bpm_id': test_system_object.bpm_id,
-                'prog_atten_id': test_system_object.prog_atten_id,
-                'frequency': frequency,
-                'settling_time': settling_time,
-                'set_output_power_levels': original_output_power_levels,
-                'output_power_levels': applied_output_power_levels,
-                'bpm_input_power': input_power,
-                'bpm_agc': agc,
-                'bpm_switching': switches,
-                'bpm_dsc': dsc,
-                'bpm_attenuation': bpm_attenuation,
-                'x_pos_raw': x_pos_raw,
-                'y_pos_raw': y_pos_raw,
-                'x_pos_raw_time': x_pos_raw_time,
-                'y_pos_raw_time': y_pos_raw_time,
-                'x_time_baseline': x_time_baseline,
-                'x_pos_baseline': x_pos_baseline,
-                'y_time_baseline': y_time_baseline,
-                'y_pos_baseline': y_pos_baseline,
-                'bpm_spec': test_system_object.BPM.spec,
-                'a_raw':a_raw,
-                'b_raw':b_raw,
-                'c_raw':c_raw,
-                'd_raw':d_raw
-                }
-
-    with open(sub_directory + "beam_power_dependence_data_rf_power_sweep.json", 'w') as write_file:
-        json.dump(data_out, write_file)
+    test_system_object.clock.sleep(settling_time) # Wait for signal to settle
+
+    store.finish()
@@ -5,11 +5,8 @@ require("cothread")
 require("matplotlib")
 require("scipy")
 import numpy as np
-import time
-from math import log10
-import json
 import helper_functions
-import sys
+import sweep_engine
 
 
 def beam_position_equidistant_grid_raster_scan_test(
@@ -20,7 +17,8 @@ def beam_position_equidistant_grid_raster_scan_test(
                                                     y_points,
                                                     settling_time,
                                                     samples,
-                                                    sub_directory=""):
+                                                    sub_directory="",
+                                                    pipelined=True):
     """Moves the beam position in the XY plane and records beam position
 
     The calc_x_pos and calc_y_pos functions are used to measure the theoretical beam position values.
@@ -29,6 +27,10 @@ def beam_position_equidistant_grid_raster_scan_test(
     and power is used while the attenuator values are changed. Finally the predicted values are compared 
     with the measured values of position. 
 
+    The attenuations for every point of the grid are worked out before the scan starts. In pipelined
+    mode the X and Y positions at each point come from one SA capture, and the settings for the next
+    point are sent while that capture is processed and stored.
+
         Args:
             test_system_object (Obj): Object to set up the initial test conditions.
             output_power_level (float): Output power of the RF system throughout the test, in dBm
@@ -39,6 +41,8 @@ def beam_position_equidistant_grid_raster_scan_test(
                 taking a reading from the BPM.
             samples (int): number of samples to be taken at each point.
             sub_directory (str): String that can change where the graphs will be saved to
+            pipelined (bool): If False the positions are read one sample at a time with get_x_position
+                and get_y_position, as the scan used to.
                 
         Returns:
             float list: measured X values of position
@@ -58,7 +62,7 @@ def beam_position_equidistant_grid_raster_scan_test(
     bpm_input_power = test_system_object.BPM.get_input_power()
     test_system_object.RF.turn_on_RF()
     # Wait for system to settle
-    time.sleep(settling_time)
+    test_system_object.settle(settling_time)
 
     starting_attenuations = test_system_object.ProgAtten.get_global_attenuation()
     if starting_attenuations[0] - starting_attenuations[1] > 0.00001 or \
@@ -71,150 +75,102 @@ def beam_position_equidistant_grid_raster_scan_test(
     beam_signal_y = np.linspace(-0.4, 0.4, y_points)
     beam_signal_sum = 1
     beam_signal_q = 0
-    measured_x = []
-    measured_y = []
-    predicted_x = []
-    predicted_y = []
-    requested_x = []
-    requested_y = []
-    a = []
-    b = []
-    c = []
-    d = []
-    a_adj = []
-    b_adj = []
-    c_adj = []
-    d_adj = []
-    a_atten = []
-    b_atten = []
-    c_atten = []
-    d_atten = []
-    a_atten_readback = []
-    b_atten_readback = []
-    c_atten_readback = []
-    d_atten_readback = []
-
+    store = helper_functions.ResultStore(sub_directory, "beam_position_raster_scan_data",
+                                         metadata={'test_name': test_name,
+                                                   'rf_id': test_system_object.rf_id,
+                                                   'bpm_id': test_system_object.bpm_id,
+                                                   'rf_hw': test_system_object.rf_hw,
+                                                   'bpm_hw': test_system_object.bpm_hw,
+                                                   'prog_atten_id': test_system_object.prog_atten_id,
+                                                   'frequency': rf_frequency,
+                                                   'settling_time': settling_time,
+                                                   'number_of_samples': samples,
+                                                   'output_power_level': output_power_level,
+                                                   'bpm_input_power': int(round(bpm_input_power)),
+                                                   'bpm_agc': agc,
+                                                   'bpm_switching': switches,
+                                                   'bpm_dsc': dsc,
+                                                   'bpm_attenuation': bpm_attenuation,
+                                                   'predicted_x': [],
+                                                   'predicted_y': [],
+                                                   'starting_attenuations': starting_attenuations,
+                                                   'map_atten_bpm': map_atten_bpm},
+                                         step_fields=['requested_x', 'requested_y', 'a', 'b', 'c', 'd', 'a_adj',
+                                                      'b_adj', 'c_adj', 'd_adj', 'a_atten', 'b_atten', 'c_atten',
+                                                      'd_atten', 'a_atten_readback', 'b_atten_readback',
+                                                      'c_atten_readback', 'd_atten_readback', 'settle_time'])
     # Reference point (centre)
     baseline_attenuation = starting_attenuations[0]
-    test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['A'], baseline_attenuation)
-    test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['B'], baseline_attenuation)
-    test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['C'], baseline_attenuation)
-    test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['D'], baseline_attenuation)
-    x_scaled = 0
-    y_scaled = 0
-
-    a_ref = beam_signal_sum / 4. * (x_scaled + y_scaled + beam_signal_q + 1.)  # in V?
-    b_ref = beam_signal_sum / 4. * (-x_scaled + y_scaled - beam_signal_q + 1.)  # in V?
-    c_ref = beam_signal_sum / 4. * (-x_scaled - y_scaled + beam_signal_q + 1.)  # in V?
-    d_ref = beam_signal_sum / 4. * (x_scaled - y_scaled - beam_signal_q + 1.)  # in V?
-
-    a_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['A']))
-    b_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['B']))
-    c_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['C']))
-    d_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['D']))
-
-    for n in range(samples):
-        measured_x.append(test_system_object.BPM.get_x_position())
-        measured_y.append(test_system_object.BPM.get_y_position())
-
-    count = 1.
-    for x_index in beam_signal_x:
-        for y_index in beam_signal_y:
-            x_scaled = x_index  # / (test_system_object.BPM.kx * 0.1) #Kx is in mm?
-            y_scaled = y_index  #/ (test_system_object.BPM.ky * 0.1) #Kx is in mm?
-
-            a.append(beam_signal_sum/4. * (x_scaled + y_scaled + beam_signal_q + 1.))  # in V?
-            b.append(beam_signal_sum/4. * (-x_scaled + y_scaled - beam_signal_q + 1.))  # in V?
-            c.append(beam_signal_sum/4. * (-x_scaled - y_scaled + beam_signal_q + 1.)) # in V?
-            d.append(beam_signal_sum/4. * (x_scaled - y_scaled - beam_signal_q + 1.))  # in V?
-
-            if a[-1] > 0. and b[-1] > 0. and c[-1] > 0. and d[-1] > 0.:
-                a_adj.append(log10(a[-1] / a_ref))
-                b_adj.append(log10(b[-1] / b_ref))
-                c_adj.append(log10(c[-1] / c_ref))
-                d_adj.append(log10(d[-1] / d_ref))
-
-                a_atten.append(baseline_attenuation - a_adj[-1])
-                b_atten.append(baseline_attenuation - b_adj[-1])
-                c_atten.append(baseline_attenuation - c_adj[-1])
-                d_atten.append(baseline_attenuation - d_adj[-1])
-
-                test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['A'],
-                                                                     helper_functions.quarter_round(a_atten[-1]))
-                test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['B'],
-                                                                     helper_functions.quarter_round(b_atten[-1]))
-                test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['C'],
-                                                                     helper_functions.quarter_round(c_atten[-1]))
-                test_system_object.ProgAtten.set_channel_attenuation(map_atten_bpm['D'],
-                                                                     helper_functions.quarter_round(d_atten[-1]))
-                time.sleep(settling_time)
-
-                a_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['A']))
-                b_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['B']))
-                c_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['C']))
-                d_atten_readback.append(test_system_object.ProgAtten.get_channel_attenuation(map_atten_bpm['D']))
-
-                for n in range(samples):
-                    measured_x.append(test_system_object.BPM.get_x_position())
-                    measured_y.append(test_system_object.BPM.get_y_position())
-
-                requested_x.append(x_scaled)
-                requested_y.append(y_scaled)
-                progress = int(count / (len(beam_signal_x) * len(beam_signal_y)) * 100.)
-                sys.stdout.write(('=' * progress) + ('' * (100 - progress)) + ("\r [ %d" % progress + "% ] "))
-                sys.stdout.flush()
-                # progress = int(round((count/len(beam_signal_x)) * 100.))
-                count += 1
-
+    abcd_ref = _abcd_signals(0., 0., beam_signal_sum, beam_signal_q)
+
+    # Every point of the grid at once, X changing slowest.
+    x_grid, y_grid = np.meshgrid(beam_signal_x, beam_signal_y, indexing='ij')
+    requested_x = x_grid.ravel()
+    requested_y = y_grid.ravel()
+    abcd = _abcd_signals(requested_x, requested_y, beam_signal_sum, beam_signal_q)
+    reachable = np.all(abcd > 0., axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        abcd_adj = np.log10(abcd / abcd_ref[:, np.newaxis])
+    abcd_atten = baseline_attenuation - abcd_adj
+
+    # The reference point is the first step. It only has readbacks, so the readback lists have one
+    # more entry than the requested positions, and its samples lead the measured positions.
+    points = [{}]
+    for n_point in range(len(requested_x)):
+        point = dict(zip(('a', 'b', 'c', 'd'), abcd[:, n_point]))
+        if reachable[n_point]:
+            point.update(zip(('a_adj', 'b_adj', 'c_adj', 'd_adj'), abcd_adj[:, n_point]))
+            point.update(zip(('a_atten', 'b_atten', 'c_atten', 'd_atten'), abcd_atten[:, n_point]))
+            point.update(requested_x=requested_x[n_point], requested_y=requested_y[n_point])
+        # Points which can not be reached are still recorded, as in the original results.
+        points.append(point)
+
+    if pipelined:
+        position_capture = sweep_engine.xy_sa_capture(samples, fields=('measured_x_time', 'measured_x',
+                                                                       'measured_y_time', 'measured_y'))
+        process = _drop_capture_times
+    else:
+        position_capture = sweep_engine.position_samples(samples)
+        process = None
+    # The attenuators move the beam position, so it is the position that is watched while settling.
+    sweep_engine.run_sweep(test_system_object, store, points,
+                           apply_point=lambda system, point: _set_point_attenuations(system, map_atten_bpm, point,
+                                                                                     baseline_attenuation),
+                           acquisitions=[sweep_engine.attenuation_readbacks(map_atten_bpm), position_capture],
+                           settling_time=settling_time,
+                           readback='position',
+                           process=process,
+                           append_fields=('measured_x', 'measured_y'),
+                           record_only=lambda point: 'a' in point and 'a_atten' not in point)
 
     test_system_object.RF.turn_off_RF()
 
-    data_out = {'test_name': test_name,
-                'rf_id': test_system_object.rf_id,
-                'bpm_id': test_system_object.bpm_id,
-                'rf_hw': test_system_object.rf_hw,
-                'bpm_hw': test_system_object.bpm_hw,
-                'prog_atten_id': test_system_object.prog_atten_id,
-                'frequency': rf_frequency,
-                'settling_time': settling_time,
-                'number_of_samples': samples,
-                'output_power_level': output_power_level,
-                'bpm_input_power': int(round(bpm_input_power)),
-                'bpm_agc': agc,
-                'bpm_switching': switches,
-                'bpm_dsc': dsc,
-                'bpm_attenuation': bpm_attenuation,
-                'measured_x': measured_x,
-                'measured_y': measured_y,
-                'requested_x': requested_x,
-                'requested_y': requested_y,
-                'predicted_x': predicted_x,
-                'predicted_y': predicted_y,
-                'a': a,
-                'a_adj': a_adj,
-                'a_atten': a_atten,
-                'a_atten_readback': a_atten_readback,
-                'b': b,
-                'b_adj': b_adj,
-                'b_atten': b_atten,
-                'b_atten_readback': b_atten_readback,
-                'c': c,
-                'c_adj': c_adj,
-                'c_atten': c_atten,
-                'c_atten_readback': c_atten_readback,
-                'd': d,
-                'd_adj': d_adj,
-                'd_atten': d_atten,
-                'd_atten_readback': d_atten_readback,
-                'starting_attenuations': starting_attenuations,
-                'map_atten_bpm': map_atten_bpm
-                }
-
-    with open(sub_directory + "beam_position_raster_scan_data.json", 'w') as write_file:
-        json.dump(data_out, write_file)
+    store.finish()
+
 
+def _abcd_signals(x_scaled, y_scaled, beam_signal_sum, beam_signal_q):
+    """Private function giving the button signals for a beam position, as an array indexed as [button][point]."""
+    x_scaled = np.asarray(x_scaled, dtype=float)
+    y_scaled = np.asarray(y_scaled, dtype=float)
+    return beam_signal_sum / 4. * np.array([x_scaled + y_scaled + beam_signal_q + 1.,
+                                            -x_scaled + y_scaled - beam_signal_q + 1.,
+                                            -x_scaled - y_scaled + beam_signal_q + 1.,
+                                            x_scaled - y_scaled - beam_signal_q + 1.])  # in V?
 
 
+def _drop_capture_times(fields):
+    """Private function removing the SA capture times, which the raster scan does not keep."""
+    del fields['measured_x_time']
+    del fields['measured_y_time']
+    return fields
 
 
+def _set_point_attenuations(test_system_object, map_atten_bpm, point, baseline_attenuation):
+    """Private function which sets the attenuation of all four buttons for a point in one burst.
 
+    The reference point, which has no attenuations of its own, uses the baseline attenuation on every button.
+    """
+    test_system_object.ProgAtten.set_channel_attenuations(
+        dict((map_atten_bpm[button],
+              helper_functions.quarter_round(point.get(button.lower() + '_atten', baseline_attenuation)))
+             for button in 'ABCD'))
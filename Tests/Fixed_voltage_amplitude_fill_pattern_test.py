@@ -1,5 +1,4 @@
 import numpy as np
-import time
 import json
 #  from scipy.io import savemat
 
@@ -51,7 +50,7 @@ def fixed_voltage_amplitude_fill_pattern_test(
     test_system_object.BPM.set_internal_state({'agc': 0, 'attenuation': 35})
     test_system_object.RF.turn_on_RF()
     # Wait for system to settle
-    time.sleep(5)
+    test_system_object.settle(5)
 
     # Build up the arrays where the final values will be saved
     x_pos_raw = np.array([])
@@ -60,13 +59,14 @@ def fixed_voltage_amplitude_fill_pattern_test(
     y_pos_mean = np.array([])
     x_pos_std = np.array([])
     y_pos_std = np.array([])
+    settle_times = []
 
     for index in duty_cycles:
         if test_system_object.GS is not None:
             test_system_object.GS.set_pulse_dutycycle(index)
-        time.sleep(settling_time)
-        x_time, x_pos_data = test_system_object.BPM.get_x_sa_data(samples)  # record X pos
-        y_time, y_pos_data = test_system_object.BPM.get_y_sa_data(samples)  # record Y pos
+        settle_times.append(test_system_object.settle(settling_time))
+        x_time, x_pos_data, y_pos_data = test_system_object.BPM.get_xy_sa_data(samples)  # record X and Y pos
+        y_time = x_time
         x_pos_raw = np.append(x_pos_raw, x_pos_data)
         y_pos_raw = np.append(y_pos_raw, y_pos_data)
         if index == duty_cycles[0]:
@@ -100,6 +100,7 @@ def fixed_voltage_amplitude_fill_pattern_test(
                 'bpm_switching': test_system_object.BPM.switches,
                 'bpm_dsc': test_system_object.BPM.dsc,
                 'settling_time': settling_time,
+                'settle_times': settle_times,
                 'frequency': frequency,
                 'test_name': test_name,
                 'rf_hw': test_system_object.rf_id,
@@ -6,3 +6,5 @@ from Beam_position_equidistant_grid_raster_scan_test import beam_position_equidi
 from Noise_test import noise_test
 from ADC_bit_check import adc_test
 from int_atten_sweep import adc_int_atten_sweep_test
+from bpm_test_sequence import tests_for_single_bpm
+import sweep_engine
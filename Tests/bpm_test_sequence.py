@@ -0,0 +1,85 @@
+import os
+import time
+import json
+from ADC_bit_check import adc_test
+from int_atten_sweep import adc_int_atten_sweep_test
+from Beam_Power_Dependence import beam_power_dependence
+
+
+def tests_for_single_bpm(test_sys, data_location, rf_frequency, settling_time=0.1):
+    """Runs the standard sequence of tests on one BPM and stores the results.
+
+    Args:
+        test_sys (TestSystem): Test system connected to the BPM under test.
+        data_location (str): Root of the results tree. A directory per BPM and run is made under it.
+        rf_frequency (float): RF frequency to test at in MHz.
+        settling_time (float): Time in seconds to wait after changing the RF settings.
+
+    Returns:
+        str: Directory the results were stored in, ending with a /.
+    """
+    root_path = '/'.join((data_location, test_sys.BPM.mac_address.replace(':', '-'), time.strftime("%d-%m-%Y_T_%H-%M")))
+    if not os.path.exists(root_path):
+        os.makedirs(root_path)
+
+    subdirectory = ''.join((root_path, '/'))
+
+    data_out = {'epics_id': test_sys.BPM.epics_id,
+                'rf_id': test_sys.rf_id,
+                'prog_atten_id': test_sys.prog_atten_id,
+                'mac_address': test_sys.BPM.mac_address,
+                'first_turn': test_sys.BPM.ft,
+                'agc': test_sys.BPM.agc,
+                'delta': test_sys.BPM.delta,
+                'switches': test_sys.BPM.switches,
+                'switch_val': test_sys.BPM.switch_val,
+                'attenuation': test_sys.BPM.attn,
+                'dsc': test_sys.BPM.dsc,
+                'kx': test_sys.BPM.kx,
+                'ky': test_sys.BPM.ky,
+                'bpm_spec': test_sys.BPM.spec}
+
+    with open(subdirectory + "initial_BPM_state.json", 'w') as write_file:
+        json.dump(data_out, write_file)
+
+    adc_test(test_system_object=test_sys,
+             frequency=rf_frequency,
+             output_power_level=-4,
+             settling_time=settling_time,
+             sub_directory=subdirectory
+             )
+
+    adc_int_atten_sweep_test(test_system_object=test_sys,
+                             frequency=rf_frequency,
+                             output_power_level=-24,
+                             settling_time=settling_time,
+                             sub_directory=subdirectory)
+
+    beam_power_dependence(test_system_object=test_sys,
+                          frequency=rf_frequency,
+                          output_power_levels=range(-4, -50, -5),
+                          settling_time=settling_time,
+                          samples=5,
+                          sub_directory=subdirectory
+                          )
+    # beam_power_dependence_rf_power_sweep(test_system_object=test_sys,
+    #                                      frequency=rf_frequency,
+    #                                      output_power_levels=range(-4, -25, -5),
+    #                                      settling_time=settling_time,
+    #                                      samples=5,
+    #                                      sub_directory=subdirectory
+    #                                      )
+
+    # beam_position_equidistant_grid_raster_scan_test(test_system_object=test_sys,
+    #                                                 rf_frequency=rf_frequency,
+    #                                                 output_power_level=-6,
+    #                                                 x_points=3,
+    #                                                 y_points=3,
+    #                                                 settling_time=settling_time,
+    #                                                 samples=100,
+    #                                                 sub_directory=subdirectory
+    #                                                 )
+    if test_sys.profiler is not None:
+        print '\nTiming profile written to ', test_sys.profiler.write(subdirectory)
+    print '\nData stored in ', subdirectory
+    return subdirectory
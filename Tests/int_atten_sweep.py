@@ -1,8 +1,6 @@
 import numpy as np
-import time
-import json
-import sys
-from helper_functions.helper_calc_functions import sa_data_to_dict
+import helper_functions
+import sweep_engine
 
 
 def adc_int_atten_sweep_test(
@@ -43,82 +41,65 @@ def adc_int_atten_sweep_test(
         test_system_object.BPM.get_internal_state()
 
     num_repeat_points = 5
-    data = []
-    adj_before = []
-    adj_after = []
+    store = helper_functions.ResultStore(sub_directory, "ADC_int_atten_sweep_data",
+                                         metadata={'test_name': test_name,
+                                                   'rf_id': test_system_object.rf_id,
+                                                   'bpm_id': test_system_object.bpm_id,
+                                                   'prog_atten_id': test_system_object.prog_atten_id,
+                                                   'frequency': frequency,
+                                                   'settling_time': settling_time,
+                                                   'bpm_agc': agc,
+                                                   'bpm_switching': switches,
+                                                   'bpm_dsc': dsc,
+                                                   'n_bits': test_system_object.BPM.adc_n_bits,
+                                                   'n_adc': test_system_object.BPM.num_adcs},
+                                         step_fields=['bpm_input_power', 'bpm_attenuation', 'data', 'adj_before',
+                                                      'adj_after', 'settle_time', 'bpm_atten_settle_time'])
+
     # Start test
     rf_output_fixed = 0 # setting the output power to 0dBm. This defines the max allowed input power.
     test_system_object.RF.set_output_power(rf_output_fixed)
     test_system_object.ProgAtten.set_global_attenuation(rf_output_fixed - output_power_level)
     number_of_attenuation_steps = int(np.floor(float(rf_output_fixed - output_power_level) / attenuation_step_size))
     test_system_object.RF.turn_on_RF()
-    time.sleep(settling_time) # Wait for system to settle
-    # Gradually reducing the power level
-    bpm_input_power = []
-    #output_power = []
-    bpm_attenuations = []
-
-    for step in range(number_of_attenuation_steps):
-        bpm_input_power.append(int(round(test_system_object.BPM.get_input_power())))
-        #output_power.append(rf_output_fixed - step * attenuation_step_size)
-        data.append([])
-        adj_before.append([])
-        adj_after.append([])
-        # Getting data before the attenuator changes
-        sa_a_times_ab, sa_a_data_ab, sa_b_times_ab, sa_b_data_ab, \
-            sa_c_times_ab, sa_c_data_ab, sa_d_times_ab, sa_d_data_ab = \
-            test_system_object.BPM.get_sa_data(num_repeat_points)
-        adj_before[step] = sa_data_to_dict(sa_a_times_ab, sa_a_data_ab, sa_b_times_ab, sa_b_data_ab,
-                                           sa_c_times_ab, sa_c_data_ab, sa_d_times_ab, sa_d_data_ab)
-        glob_atten = test_system_object.ProgAtten.get_global_attenuation()
-        if glob_atten[0] - glob_atten[1] > 0.00001 or glob_atten[0] - glob_atten[2] > 0.00001 or \
-           glob_atten[0] - glob_atten[3] > 0.00001:
-            raise ValueError('The four attenuation levels are not set to the same value')
-        # Changing the attenuator through the programmable attenuator.
-        test_system_object.ProgAtten.set_global_attenuation(glob_atten[0] - attenuation_step_size)
-        time.sleep(settling_time)  # Wait for signal to settle
-        sa_a_times_aa, sa_a_data_aa, sa_b_times_aa, sa_b_data_aa, \
-            sa_c_times_aa, sa_c_data_aa, sa_d_times_aa, sa_d_data_aa = \
-            test_system_object.BPM.get_sa_data(num_repeat_points)
-        adj_after[step] = sa_data_to_dict(sa_a_times_aa, sa_a_data_aa, sa_b_times_aa, sa_b_data_aa,
-                                          sa_c_times_aa, sa_c_data_aa, sa_d_times_aa, sa_d_data_aa)
-        # Changing the BPM attenuation to compensate for the programable attenuator change. 
-        # This is to keep the power levels constant in order to isolate the test from beam current dependence.
-        bpm_atten = test_system_object.BPM.get_attenuation()
-        test_system_object.BPM.set_attenuation(bpm_atten + attenuation_step_size)
-        time.sleep(settling_time)  # Wait for signal to settle
-        bpm_attenuations.append(bpm_atten + attenuation_step_size)
-        # Capture data
-        sa_a_times, sa_a_data, sa_b_times, sa_b_data, sa_c_times, sa_c_data, sa_d_times, sa_d_data = \
-            test_system_object.BPM.get_sa_data(num_repeat_points)
-        data[step] = sa_data_to_dict(sa_a_times, sa_a_data, sa_b_times, sa_b_data,
-                                     sa_c_times, sa_c_data, sa_d_times, sa_d_data)
-        progress = round((step + 1.) / number_of_attenuation_steps * 100.)
-        sys.stdout.write("\r [ %d" % progress + "% ] ")
-        sys.stdout.flush()
-
-    print "Done"
+    test_system_object.settle(settling_time)  # Wait for system to settle
+    # Gradually reducing the attenuation, while the BPM attenuation is raised to compensate.
+    # This is to keep the power levels constant in order to isolate the test from beam current dependence.
+    sweep_engine.run_sweep(test_system_object, store,
+                           points=sweep_engine.parameter_grid(
+                               ('prog_attenuation', rf_output_fixed - output_power_level -
+                                attenuation_step_size * np.arange(1, number_of_attenuation_steps + 1))),
+                           apply_point=_set_prog_attenuation,
+                           before_apply=[_rounded_input_power,
+                                         sweep_engine.abcd_sa_capture(num_repeat_points, 'adj_before')],
+                           acquisitions=[sweep_engine.abcd_sa_capture(num_repeat_points, 'adj_after'),
+                                         lambda system: _compensate_bpm_attenuation(system, attenuation_step_size,
+                                                                                    settling_time),
+                                         sweep_engine.abcd_sa_capture(num_repeat_points, 'data')],
+                           settling_time=settling_time)
 
     # turn off the RF
     test_system_object.RF.turn_off_RF()
 
-    data_out = {'test_name': test_name,
-                'rf_id': test_system_object.rf_id,
-                'bpm_id': test_system_object.bpm_id,
-                'prog_atten_id': test_system_object.prog_atten_id,
-                'frequency': frequency,
-                'settling_time': settling_time,
-                'bpm_input_power': bpm_input_power,
-                'bpm_agc': agc,
-                'bpm_switching': switches,
-                'bpm_dsc': dsc,
-                'bpm_attenuation': bpm_attenuations,
-                'n_bits': test_system_object.BPM.adc_n_bits,
-                'n_adc': test_system_object.BPM.num_adcs,
-                'data': data,
-                'adj_before': adj_before,
-                'adj_after': adj_after
-                }
-                #'output_power': output_power,
-    with open(sub_directory + "ADC_int_atten_sweep_data.json", 'w') as write_file:
-        json.dump(data_out, write_file)
+    store.finish()
+
+
+def _rounded_input_power(test_system_object):
+    """Private function reading the BPM input power, to the nearest dBm."""
+    return {'bpm_input_power': int(round(test_system_object.BPM.get_input_power()))}
+
+
+def _set_prog_attenuation(test_system_object, point):
+    """Private function which checks the attenuator channels still match before stepping them all."""
+    glob_atten = test_system_object.ProgAtten.get_global_attenuation()
+    if any(abs(glob_atten[0] - channel_atten) > 0.00001 for channel_atten in glob_atten[1:]):
+        raise ValueError('The four attenuation levels are not set to the same value')
+    test_system_object.ProgAtten.set_global_attenuation(point['prog_attenuation'])
+
+
+def _compensate_bpm_attenuation(test_system_object, attenuation_step_size, settling_time):
+    """Private function which raises the BPM attenuation by one step and waits for it to settle."""
+    bpm_attenuation = test_system_object.BPM.get_attenuation() + attenuation_step_size
+    test_system_object.BPM.set_attenuation(bpm_attenuation)
+    return {'bpm_attenuation': bpm_attenuation,
+            'bpm_atten_settle_time': test_system_object.settle(settling_time)}
@@ -0,0 +1,170 @@
+import sys
+import itertools
+from helper_functions.helper_calc_functions import sa_data_to_dict
+
+# The sweep engine runs the loop shared by the swept tests. A test is defined by
+#   points: the parameter grid, one dict per step. The values are recorded with the step.
+#   apply_point: sets the hardware for a point.
+#   acquisitions: read the BPM once the signal has settled.
+#   process: optional post processing of the captures, such as taking a spectrum.
+# Each step is written to the result store as soon as it is complete.
+
+
+def parameter_grid(*axes):
+    """Builds the points of a sweep from one or more axes, the last axis changing fastest.
+
+    Args:
+        *axes (tuple): Pairs of (field name, values) for each axis.
+
+    Returns:
+        list: One dict per point, mapping each field name to its value at that point.
+    """
+    names = [name for name, values in axes]
+    return [dict(zip(names, point)) for point in itertools.product(*[values for name, values in axes])]
+
+
+def run_sweep(test_system_object, store, points, apply_point, acquisitions, settling_time,
+              readback='input_power', process=None, before_apply=(), append_fields=(), record_only=None):
+    """Runs a sweep over a set of points, streaming each step to the result store.
+
+    For each point any before_apply acquisitions are taken, the hardware is set by apply_point,
+    the test system waits for the signal to settle and then the acquisitions are taken.
+    The processing and writing of a step does not need the hardware, so it is done after the
+    settings for the next point have been sent, while that point settles.
+
+    Args:
+        test_system_object (System Obj): Object capturing the devices used, system losses and hardware ids.
+        store (ResultStore): Store the steps are written to.
+        points (list): Dicts of the values defining each step, recorded as step fields.
+        apply_point (function): Called as apply_point(test_system_object, point) to set the hardware.
+            If it returns a dict, those fields are recorded too, such as the settings actually used.
+            Any other return value is ignored, so a hardware setter can be used directly.
+        acquisitions (list): Functions called as acquisition(test_system_object) once the signal has
+            settled, each returning a dict of fields.
+        settling_time (float): Longest time in seconds to wait for the signal to settle at each point.
+        readback (str): Value watched while waiting for the signal to settle.
+        process (function): Called as process(fields) on the fields of a step before it is stored,
+            returning the fields to store.
+        before_apply (list): Acquisitions taken before the hardware is changed for a point.
+        append_fields (list): Fields which are appended to concatenated store fields rather than
+            stored with the step.
+        record_only (function): Called as record_only(point). Points for which it is True are
+            recorded without changing the hardware or taking any acquisitions.
+
+    Returns:
+        int: Number of steps stored.
+    """
+    pending = None
+    for point_number, point in enumerate(points):
+        if record_only is not None and record_only(point):
+            # Keeps the stored steps in the order of the points.
+            if pending is not None:
+                _store_step(store, pending, process, append_fields)
+                pending = None
+            store.add_step(**point)
+        else:
+            fields = dict(point)
+            fields.update(_acquire(test_system_object, before_apply))
+            applied = apply_point(test_system_object, point)
+            if isinstance(applied, dict):
+                fields.update(applied)
+            if pending is not None:
+                _store_step(store, pending, process, append_fields)
+            fields['settle_time'] = test_system_object.settle(settling_time, readback=readback)
+            fields.update(_acquire(test_system_object, acquisitions))
+            pending = fields
+        _report_progress(point_number + 1, len(points))
+    if pending is not None:
+        _store_step(store, pending, process, append_fields)
+    print "Done"
+    return len(store.manifest['steps'])
+
+
+def _acquire(test_system_object, acquisitions):
+    """Private function which takes a set of acquisitions and returns all their fields."""
+    fields = {}
+    for acquisition in acquisitions:
+        fields.update(acquisition(test_system_object))
+    return fields
+
+
+def _store_step(store, fields, process, append_fields):
+    """Private function which processes a step and writes it to the store."""
+    if process is not None:
+        fields = process(fields)
+    for name in append_fields:
+        store.append(name, fields.pop(name))
+    store.add_step(**fields)
+
+
+def _report_progress(done, total):
+    """Private function which prints the percentage of the sweep completed."""
+    progress = (done * 1.0 / total) * 100.
+    sys.stdout.write("\r [ %d" % progress + "% ] ")
+    sys.stdout.flush()
+
+
+def input_power(field='bpm_input_power'):
+    """Acquisition reading the input power of the BPM, in dBm."""
+    def acquisition(test_system_object):
+        return {field: test_system_object.BPM.get_input_power()}
+    return acquisition
+
+
+def xy_sa_capture(samples, fields=('x_time', 'x_pos', 'y_time', 'y_pos')):
+    """Acquisition capturing the X and Y SA positions together, in one acquisition.
+
+    Args:
+        samples (int): Number of samples to capture.
+        fields (tuple): Names of the X times, X positions, Y times and Y positions fields.
+
+    Returns:
+        function: The acquisition.
+    """
+    def acquisition(test_system_object):
+        sa_time, x_pos, y_pos = test_system_object.BPM.get_xy_sa_data(samples)
+        return dict(zip(fields, (sa_time, x_pos, sa_time, y_pos)))
+    return acquisition
+
+
+def abcd_sa_capture(samples, field):
+    """Acquisition capturing the SA data of all four buttons in one read, stored as a dict."""
+    def acquisition(test_system_object):
+        return {field: sa_data_to_dict(*test_system_object.BPM.get_sa_data(samples))}
+    return acquisition
+
+
+def raw_buttons(fields=('a_raw', 'b_raw', 'c_raw', 'd_raw')):
+    """Acquisition reading the raw values of the four BPM buttons."""
+    def acquisition(test_system_object):
+        return dict(zip(fields, test_system_object.BPM.get_raw_bpm_buttons()))
+    return acquisition
+
+
+def position_samples(samples, fields=('measured_x', 'measured_y')):
+    """Acquisition reading the X and Y positions a number of times, both from one fetch each time."""
+    def acquisition(test_system_object):
+        measured_x = []
+        measured_y = []
+        for n in range(samples):
+            x_position, y_position = test_system_object.BPM.get_xy_position()
+            measured_x.append(x_position)
+            measured_y.append(y_position)
+        return dict(zip(fields, (measured_x, measured_y)))
+    return acquisition
+
+
+def attenuation_readbacks(channel_map):
+    """Acquisition reading back the programmable attenuator setting of each BPM button.
+
+    Args:
+        channel_map (dict): Attenuator channel connected to each of the buttons 'A' to 'D'.
+
+    Returns:
+        function: The acquisition, giving the fields a_atten_readback to d_atten_readback.
+    """
+    def acquisition(test_system_object):
+        return dict((button.lower() + '_atten_readback',
+                     test_system_object.ProgAtten.get_channel_attenuation(channel_map[button]))
+                    for button in 'ABCD')
+    return acquisition
@@ -0,0 +1,61 @@
+from framework_requires import BaseTestClass
+import unittest
+from mock import Mock, call
+import sweep_engine
+
+
+class SweepEngineTest(BaseTestClass):
+
+    def setUp(self):
+        self.order = []
+        self.system = Mock()
+        self.system.settle.side_effect = lambda max_wait, readback: self.order.append('settle') or 0.1
+        self.store = Mock()
+        self.store.manifest = {'steps': []}
+        self.store.add_step.side_effect = lambda **fields: self.order.append(('store', fields.get('level')))
+
+    def apply_point(self, system, point):
+        self.order.append(('apply', point['level']))
+
+    def acquire(self, system):
+        self.order.append('acquire')
+        return {'reading': 1.}
+
+    def test_parameter_grid_changes_the_last_axis_fastest(self):
+        self.assertEqual(sweep_engine.parameter_grid(('x', [1, 2]), ('y', [3, 4])),
+                         [{'x': 1, 'y': 3}, {'x': 1, 'y': 4}, {'x': 2, 'y': 3}, {'x': 2, 'y': 4}])
+
+    def test_each_step_is_stored_while_the_next_point_settles(self):
+        sweep_engine.run_sweep(self.system, self.store, sweep_engine.parameter_grid(('level', [1, 2])),
+                               self.apply_point, [self.acquire], settling_time=0.5)
+        self.assertEqual(self.order, [('apply', 1), 'settle', 'acquire',
+                                      ('apply', 2), ('store', 1), 'settle', 'acquire',
+                                      ('store', 2)])
+        self.store.add_step.assert_called_with(level=2, reading=1., settle_time=0.1)
+
+    def test_processing_and_appended_fields(self):
+        sweep_engine.run_sweep(self.system, self.store, [{'level': 1}], self.apply_point,
+                               [lambda system: {'samples': [1, 2]}], settling_time=0.5,
+                               process=lambda fields: dict(fields, total=sum(fields['samples'])),
+                               append_fields=['samples'])
+        self.store.append.assert_called_once_with('samples', [1, 2])
+        self.store.add_step.assert_called_once_with(level=1, total=3, settle_time=0.1)
+
+    def test_record_only_points_keep_their_place_without_using_the_hardware(self):
+        sweep_engine.run_sweep(self.system, self.store, sweep_engine.parameter_grid(('level', [1, 2, 3])),
+                               self.apply_point, [self.acquire], settling_time=0.5,
+                               record_only=lambda point: point['level'] == 2)
+        self.assertEqual([step for step in self.order if step[0] == 'store'],
+                         [('store', 1), ('store', 2), ('store', 3)])
+        self.assertNotIn(('apply', 2), self.order)
+        self.assertEqual(self.system.settle.call_args_list, [call(0.5, readback='input_power')] * 2)
+
+    def test_position_samples_read_x_and_y_together(self):
+        self.system.BPM.get_xy_position.side_effect = [(1., 2.), (3., 4.)]
+        fields = sweep_engine.position_samples(2)(self.system)
+        self.assertEqual(fields, {'measured_x': [1., 3.], 'measured_y': [2., 4.]})
+        self.assertFalse(self.system.BPM.get_x_position.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
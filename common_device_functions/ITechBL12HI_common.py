@@ -1,54 +1,184 @@
-
 import telnetlib
 import re
+import threading
+import Queue
+
+# Expected reply pattern. The device echoes the command (optionally after the scpi> prompt) before the reply.
+message_pattern = re.compile('(?:scpi>)*(\S*)\s*(.*)')
+
+
+class ITechBL12HIConnection(object):
+    """Shared telnet session to one ITechBL12HI.
+
+    The device does not block, so if several commands are written before reading, the replies
+    arrive in one stream and can be attributed to the wrong command. All the RF, gate and trigger
+    drivers for an instrument share one of these objects. Requests are put on a queue and a
+    single worker thread writes each command, then reads until it finds the echo of that command
+    followed by its status line. Lines left over from an earlier command are discarded.
+
+    Use ITechBL12HIConnection.connect to get the connection for an address, so that every
+    driver talking to the same instrument gets the same object.
+
+    Attributes:
+        ipaddress (str): IP address of the device.
+        port (int): Telnet port of the device.
+        timeout (float): Default timeout in seconds for a reply.
+    """
+    _connections = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, ipaddress, port, timeout):
+        """Returns the connection for this address, opening it if it is not already open.
+
+        Args:
+            ipaddress (str): IP address of the device.
+            port (int): Telnet port of the device.
+            timeout (float): Timeout in seconds for telnet reads.
+
+        Returns:
+            ITechBL12HIConnection: The shared connection. Call close() once for every connect().
+        """
+        with cls._registry_lock:
+            connection = cls._connections.get((ipaddress, port))
+            if connection is None:
+                connection = cls(ipaddress, port, timeout)
+                cls._connections[(ipaddress, port)] = connection
+            connection.users += 1
+        return connection
+
+    def __init__(self, ipaddress, port, timeout):
+        self.ipaddress = ipaddress
+        self.port = port
+        self.timeout = timeout
+        self.users = 0
+        self.tn = telnetlib.Telnet(ipaddress, port, timeout)  # Connects to the IP via telnet
+        self.tn.read_until("\n", timeout).rstrip('\n')
+        self.tn.read_until("\n", timeout).rstrip('\n')
+        self.tn.write("scpi>\r\n")  # putting the device into scpi mode.
+        self.requests = Queue.Queue()
+        self.worker = threading.Thread(target=self._process_requests)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def query(self, message, timeout=None):
+        """Sends a SCPI command and waits for its reply.
+
+        Safe to call from several threads, the commands are sent in the order they are queued.
+
+        Args:
+            message (str): SCPI message to be sent to the ITechBL12HI
+            timeout (float): Timeout in seconds for the reply. Defaults to the connection timeout.
+
+        Returns:
+            str: Reply message from the ITechBL12HI
+            str: Status line from the ITechBL12HI
+        """
+        if type(message) != str:
+            raise TypeError
+        if timeout is None:
+            timeout = self.timeout
+        result = Queue.Queue(maxsize=1)
+        self.requests.put((message.strip(), timeout, result))
+        ok, reply = result.get()
+        if not ok:
+            raise reply
+        return reply
+
+    def close(self):
+        """Releases this user of the connection. The session is closed when the last user releases it.
+
+        Args:
+
+        Returns:
+
+        """
+        with self._registry_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if self._connections.get((self.ipaddress, self.port)) is self:
+                del self._connections[(self.ipaddress, self.port)]
+        self.requests.put(None)  # Tells the worker to stop once the queued requests are done.
+        self.worker.join(self.timeout)
+        self.tn.close()
+
+    def _process_requests(self):
+        """Private method run by the worker thread, sending one queued command at a time."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            message, timeout, result = request
+            try:
+                result.put((True, self._exchange(message, timeout)))
+            except Exception as error:
+                result.put((False, error))
+
+    def _exchange(self, message, timeout):
+        """Private method which writes one command and reads back its own reply and status line.
+
+        Args:
+            message (str): SCPI message to be sent to the ITechBL12HI
+            timeout (float): Timeout in seconds for each line read.
+
+        Returns:
+            str: Reply message from the ITechBL12HI
+            str: Status line from the ITechBL12HI
+        """
+        command = message.split()[0].upper() if message else ''
+        self.tn.write(message + "\r\n")  # Writes a telnet message with termination characters
+        while True:
+            r_str = self.tn.read_until("\n", timeout)
+            if not r_str.endswith("\n"):
+                raise ValueError(''.join(('No reply from ITechBL12HI to: ', message)))
+            reply = re.match(message_pattern, r_str.strip())
+            if reply.group(1).upper() == command:
+                break
+            # Anything else is left over from an earlier exchange, so it is dropped.
+        check = self.tn.read_until("\n", timeout).rstrip('\n')  # Status line
+        if 'OK' not in check:
+            print "Original message = ", message
+            print 'Returned command = ', r_str.rstrip('\n')
+            print 'Bad status  STATUS = ', check
+            print 'Return = ', reply.group(2)
+            raise ValueError(''.join(('Bad status on communication with ITechBL12HI: ', message)))
+        return reply.group(2), check
 
 
 def telnet_setup(ipaddress, port, timeout):
-    tn = telnetlib.Telnet(ipaddress, port, timeout)  # Connects to the IP via telnet
-    tn.read_until("\n", timeout).rstrip('\n')
-    tn.read_until("\n", timeout).rstrip('\n')
-    tn.write("scpi>\r\n")  # putting the device into scpi mode.
-    return tn
+    """Gets the shared connection to the ITechBL12HI at this address.
+
+    Args:
+        ipaddress (str): IP address of the device.
+        port (int): Telnet port of the device.
+        timeout (float): Timeout in seconds for telnet reads.
+
+    Returns:
+        ITechBL12HIConnection: Connection to pass to telnet_query.
+    """
+    return ITechBL12HIConnection.connect(ipaddress, port, timeout)
 
 
 def telnet_query(tn, timeout, orig_message):
-    """Private method that will send a message over telnet to the ITechBL12HI and return the reply.
-        This needs to open and close a connection in order to isolate the replies. If one connection is opened on
-        this hardware the responses do not block so several responses can arrive before the first read.
-        So the wrong data is read.
+    """Sends a message to the ITechBL12HI and returns the reply.
+
+    The device does not block, so the exchange goes through the shared connection, which
+    serialises the commands and matches each reply to the command it echoes.
 
     Args:
+        tn (ITechBL12HIConnection): Connection returned by telnet_setup.
+        timeout (float): Timeout in seconds for the reply.
         orig_message (str): SCPI message to be sent to the ITechBL12HI
 
     Returns:
         str: Reply message from the ITechBL12HI
+        str: Status line from the ITechBL12HI
     """
-    # Expected message pattern
-    message_pattern = re.compile('(?:scpi>)*\S*\s+(.*)')
-
     # Checks that the telnet message is a string
     if type(orig_message) != str:
         raise TypeError
-    tn.write(orig_message + "\r\n")  # Writes a telnet message with termination characters
-    r_str = tn.read_until("\n", timeout).rstrip('\n')  # Telnet reply, with termination chars removed
-    check = tn.read_until("\n", timeout).rstrip('\n')  # Status line
-    message = re.match(message_pattern, r_str)
-
-    if 'OK' not in check:
-        #Have another go
-        print 'Retrying ', orig_message
-        tn.write(orig_message + "\r\n")  # Writes a telnet message with termination characters
-        r_str = tn.read_until("\n", timeout).rstrip('\n')  # Telnet reply, with termination chars removed
-        check = tn.read_until("\n", timeout).rstrip('\n')  # Status line
-        message = re.match(message_pattern, r_str)
-        if 'OK' not in check:
-            print "Original message = ", orig_message
-            print 'Returned command = ', r_str
-            print 'Bad status  STATUS = ', check
-            if message is not None:
-                print 'Return = ', message.group(1)
-            raise ValueError(''.join(('Bad status on communication with ITechBL12HI: ', orig_message)))
-    return message.group(1), check
+    return tn.query(orig_message, timeout)
 
 
 def get_device_identity(tn, timeout):
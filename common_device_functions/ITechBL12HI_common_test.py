@@ -0,0 +1,86 @@
+from framework_requires import BaseTestClass
+import unittest
+import threading
+from mock import patch
+import common_device_functions.ITechBL12HI_common as itechbl12hi_common
+
+
+class FakeITechTelnet(object):
+    """Telnet stand in which echoes each command and replies with a value and a status line."""
+
+    def __init__(self, *args):
+        self.lines = ["Welcome\n", "IT CLKGEN\n"]
+        self.written = []
+        self.replies = {"*IDN?": "IT CLKGEN", "POW:RF?": "-40DBM", "GATE:FILL?": "50 %"}
+        self.status = "OK"
+        self.condition = threading.Condition()
+
+    def write(self, message):
+        with self.condition:
+            command = message.strip()
+            self.written.append(command)
+            if command in self.replies:
+                self.lines.append("scpi>" + command + " " + self.replies[command] + "\n")
+                self.lines.append(self.status + "\n")
+            self.condition.notify_all()
+
+    def read_until(self, match, timeout=None):
+        with self.condition:
+            if not self.lines:
+                self.condition.wait(timeout)
+            if not self.lines:
+                return ""
+            return self.lines.pop(0)
+
+    def close(self):
+        pass
+
+
+class ConnectionTest(BaseTestClass):
+
+    @patch("telnetlib.Telnet", side_effect=FakeITechTelnet)
+    def setUp(self, mock_telnet):
+        unittest.TestCase.setUp(self)
+        self.connection = itechbl12hi_common.telnet_setup("1.2.3.4", 23, 0.1)
+        self.fake = self.connection.tn
+
+    def tearDown(self):
+        while self.connection.users > 0:
+            self.connection.close()
+
+    def test_reply_is_matched_to_its_command(self):
+        self.fake.lines.append("scpi>FREQ:RF? 499,68MHz\n")  # Left over from an earlier exchange.
+        self.fake.lines.append("OK\n")
+        self.assertEqual(itechbl12hi_common.telnet_query(self.connection, 0.1, "POW:RF?"), ("-40DBM", "OK"))
+
+    def test_bad_status_raises_without_resending(self):
+        self.fake.status = "ERR"
+        self.assertRaises(ValueError, itechbl12hi_common.telnet_query, self.connection, 0.1, "POW:RF?")
+        self.assertEqual(self.fake.written.count("POW:RF?"), 1)
+
+    def test_non_string_message_raises_type_error(self):
+        self.assertRaises(TypeError, itechbl12hi_common.telnet_query, self.connection, 0.1, 42)
+
+    def test_same_address_shares_one_connection(self):
+        second = itechbl12hi_common.telnet_setup("1.2.3.4", 23, 0.1)
+        self.assertIs(second, self.connection)
+        self.assertEqual(self.connection.users, 2)
+        second.close()
+        self.assertEqual(self.connection.users, 1)
+
+    def test_queries_from_several_threads_get_their_own_replies(self):
+        results = {}
+
+        def ask(message):
+            results[message] = itechbl12hi_common.telnet_query(self.connection, 0.1, message)[0]
+
+        threads = [threading.Thread(target=ask, args=(message,)) for message in self.fake.replies]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, self.fake.replies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,4 +5,11 @@ from helper_calc_functions import round_to_2sf, change_to_freq_domain, get_stats
     calc_x_pos, calc_y_pos, quarter_round, adc_missing_bit_analysis, reconfigure_adc_data, multiply_list, \
     convert_attenuation_settings_to_abcd, add_list
 from pass_fail import adc_bit_test_pass_fail, internal_attenuator_pass_fail, power_dependence_pass_fail, \
-    raster_scan_pass_fail, centre_offset_pass_fail
+    raster_scan_pass_fail, centre_offset_pass_fail, Verdict, evaluate_adc_bit, evaluate_internal_attenuator, \
+    evaluate_power_dependence, evaluate_raster_scan, evaluate_centre_offset, evaluate_run, requalify, \
+    criterion_names, check_limits
+import array_calc_functions
+from figure_cache import data_hash, figure_is_current, render_figure
+from result_store import ResultStore, LazyResults, NumpyEncoder, open_results, load_results, results_exist, \
+    find_result_directories
+from results_index import ResultsIndex
@@ -0,0 +1,145 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# NumPy versions of the functions in helper_calc_functions.
+# These take and return ndarrays. Where a function works on a dataset, a 2-D stack of
+# captures (one row per sweep step) is processed in one call, with the result per row.
+
+
+def multiply(data, multiple):
+    return np.multiply(data, multiple)
+
+
+def add(data, additional):
+    return np.add(data, additional)
+
+
+def round_to_2sf(input_vals):
+    # Rounds to two decimal places with halves away from zero, as round does in the original list version.
+    # np.round would send halves to the even neighbour instead.
+    scaled = np.multiply(input_vals, 100.)
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / 100.
+
+
+def as_stack(dataset):
+    """Converts a set of captures to a 2-D float array, one row per capture.
+
+    Args:
+        dataset (list/ndarray): Captures of equal length, as a list of lists or arrays, or a 2-D array.
+
+    Returns:
+        ndarray: The captures as rows, or None if they are not all the same length.
+    """
+    try:
+        stack = np.asarray(dataset, dtype=float)
+    except ValueError:
+        return None  # Captures of different lengths can not be stacked.
+    if stack.ndim != 2:
+        return None
+    return stack
+
+
+def change_to_freq_domain(times, data):
+    """Takes the FFT of one capture, or of every row of a 2-D stack of captures.
+
+    Args:
+        times (ndarray): Sample times, the same shape as data.
+        data (ndarray): Samples.
+
+    Returns:
+        ndarray: Frequency of each FFT bin, the same shape as data.
+        ndarray: Magnitude of each FFT bin.
+    """
+    times = np.asarray(times, dtype=float)
+    f_data_mag = np.abs(np.fft.fft(data, axis=-1))
+    # The spacing is the mean of the gaps between the samples, leaving out the final gap as before.
+    sample_spacing = np.mean(np.diff(times, axis=-1)[..., :-1], axis=-1)
+    f_freq = np.fft.fftfreq(times.shape[-1]) / np.expand_dims(sample_spacing, -1)
+    return f_freq.reshape(f_data_mag.shape), f_data_mag
+
+
+def get_stats(data, axis=-1):
+    data = np.asarray(data)
+    return np.mean(data, axis=axis), np.std(data, axis=axis), np.max(data, axis=axis), np.min(data, axis=axis)
+
+
+def subtract_mean(data, mean_value):
+    return np.subtract(data, mean_value)
+
+
+def stat_dataset(dataset):
+    """Mean and standard deviation of each capture in a set, for example every power level of a sweep.
+
+    Args:
+        dataset (list/ndarray): 2-D stack of captures, or a list of captures of any length.
+
+    Returns:
+        ndarray: Mean of each capture.
+        ndarray: Standard deviation of each capture.
+    """
+    stack = as_stack(dataset)
+    if stack is None:
+        return np.array([np.mean(single_set) for single_set in dataset]), \
+            np.array([np.std(single_set) for single_set in dataset])
+    return np.mean(stack, axis=1), np.std(stack, axis=1)
+
+
+def reconfigure_adc_data(data):
+    """Joins repeated ADC captures into one record per ADC.
+
+    Args:
+        data (list/ndarray): Captures indexed as [repeat point][adc][sample].
+
+    Returns:
+        ndarray: Samples indexed as [adc][sample], the repeat points one after the other.
+            A list of arrays if the captures are of different lengths.
+    """
+    try:
+        stack = np.asarray(data)
+    except ValueError:
+        stack = None
+    if stack is not None and stack.ndim == 3:
+        return stack.transpose(1, 0, 2).reshape(stack.shape[1], -1)
+    # Captures of different lengths are joined one ADC at a time.
+    return [np.concatenate([repeat_point[num_adc] for repeat_point in data]) for num_adc in range(len(data[0]))]
+
+
+# Results of adc_missing_bit_analysis, keyed on a hash of the data, so that the plotting and the
+# pass/fail of a report section share one analysis. Only the most recent few datasets are kept.
+_bit_analysis_cache = OrderedDict()
+_BIT_ANALYSIS_CACHE_SIZE = 4
+
+
+def adc_missing_bit_analysis(data, n_bits):
+    """Standard deviation of each bit of the ADC samples, for every ADC in one pass.
+
+    A bit which is stuck or missing has a standard deviation of zero, while a working bit
+    driven by a large sine wave is close to 0.5.
+    The samples are treated as 16 bit words, as the EPICS layer always returns 16 bit numbers,
+    so negative values are taken as their twos complement. Position 0 of the result is the most
+    significant bit, as with the string based version this replaces.
+
+    Args:
+        data (list/ndarray): Samples of one ADC, or a 2-D stack indexed as [adc][sample].
+        n_bits (int): Number of bits to analyse, counting down from the most significant bit.
+
+    Returns:
+        ndarray: Standard deviation of each bit. Shape (n_bits,) for one ADC, or (n_adc, n_bits) for a stack.
+    """
+    samples = np.asarray(data)
+    key = (hashlib.sha1(np.ascontiguousarray(samples).view(np.uint8)).hexdigest(),
+           samples.shape, samples.dtype.str, n_bits)
+    if key in _bit_analysis_cache:
+        return _bit_analysis_cache[key].copy()
+
+    words = samples.astype(np.int64).astype(np.uint16)
+    shifts = np.arange(15, 15 - n_bits, -1).astype(np.uint16)
+    # The bits end up on a new last axis, so every ADC and bit is handled by the one expression.
+    bits = (words[..., np.newaxis] >> shifts) & np.uint16(1)
+    data_bits_std = np.std(bits, axis=-2)
+
+    _bit_analysis_cache[key] = data_bits_std
+    if len(_bit_analysis_cache) > _BIT_ANALYSIS_CACHE_SIZE:
+        _bit_analysis_cache.popitem(last=False)
+    return data_bits_std.copy()
@@ -0,0 +1,69 @@
+from framework_requires import BaseTestClass
+import unittest
+import numpy as np
+import array_calc_functions
+import helper_calc_functions
+
+
+class ArrayCalcFunctionsTest(BaseTestClass):
+
+    def test_stat_dataset_gives_one_value_per_row(self):
+        mean_array, std_array = array_calc_functions.stat_dataset(np.array([[1., 3.], [2., 2.], [0., 4.]]))
+        np.testing.assert_allclose(mean_array, [2., 2., 2.])
+        np.testing.assert_allclose(std_array, [1., 0., 2.])
+
+    def test_stat_dataset_accepts_captures_of_different_lengths(self):
+        mean_list, std_list = helper_calc_functions.stat_dataset([[1., 3.], [2.]])
+        self.assertEqual(mean_list, [2., 2.])
+        self.assertEqual(std_list, [1., 0.])
+
+    def test_change_to_freq_domain_of_a_stack_matches_each_row(self):
+        times = np.tile(np.arange(8) * 0.5, (2, 1))
+        data = np.array([np.sin(np.arange(8)), np.cos(np.arange(8))])
+        f_freq, f_data_mag = array_calc_functions.change_to_freq_domain(times, data)
+        for row in range(2):
+            row_freq, row_mag = helper_calc_functions.change_to_freq_domain(list(times[row]), list(data[row]))
+            np.testing.assert_allclose(f_freq[row], row_freq)
+            np.testing.assert_allclose(f_data_mag[row], row_mag)
+        np.testing.assert_allclose(f_freq[0], np.fft.fftfreq(8, 0.5))
+
+    def test_reconfigure_adc_data_joins_repeat_points_per_adc(self):
+        data = [[[1, 2], [3, 4]], [[5, 6], [7, 8]]]
+        np.testing.assert_array_equal(array_calc_functions.reconfigure_adc_data(data), [[1, 2, 5, 6], [3, 4, 7, 8]])
+        self.assertEqual(helper_calc_functions.reconfigure_adc_data(data), [[1, 2, 5, 6], [3, 4, 7, 8]])
+
+    def test_list_wrappers_return_lists(self):
+        self.assertEqual(helper_calc_functions.multiply_list([1, 2], 3), [3, 6])
+        self.assertEqual(helper_calc_functions.add_list([1, 2], 0.5), [1.5, 2.5])
+        self.assertEqual(helper_calc_functions.round_to_2sf(np.array([1.234, 5.678])), [1.23, 5.68])
+        self.assertEqual(helper_calc_functions.round_to_2sf(1.234), 1.23)
+
+    def test_round_to_2sf_rounds_halves_away_from_zero_like_round(self):
+        values = [0.125, -0.125, 0.5, 2.5, -2.5, 1.005, 0.]
+        expected = [round(value * 100.) / 100. for value in values]
+        self.assertEqual(helper_calc_functions.round_to_2sf(values), expected)
+        self.assertEqual(array_calc_functions.round_to_2sf(values).tolist(), expected)
+        self.assertEqual(helper_calc_functions.round_to_2sf(values[:2]), [0.13, -0.13])
+
+    def test_adc_missing_bit_analysis_matches_the_string_version(self):
+        data = np.random.RandomState(3).randint(0, 2 ** 14, size=(4, 64)) * 2
+        data_std = array_calc_functions.adc_missing_bit_analysis(data, 16)
+        for kw in range(4):
+            data_bits = [list(format(int(x), '016b')) for x in data[kw]]
+            expected = [np.std([int(word[wn]) for word in data_bits]) for wn in range(16)]
+            np.testing.assert_allclose(data_std[kw], expected)
+        # The values are all even and below 2 ** 15, so the most and least significant bits never change.
+        self.assertEqual(data_std[0][0], 0)
+        self.assertEqual(data_std[0][15], 0)
+
+    def test_adc_missing_bit_analysis_cached_result_is_not_changed_by_callers(self):
+        data = np.arange(32).reshape(2, 16)
+        first = array_calc_functions.adc_missing_bit_analysis(data, 16)
+        first[0][0] = -1
+        second = array_calc_functions.adc_missing_bit_analysis(data, 16)
+        self.assertEqual(second[0][0], 0)
+        self.assertEqual(helper_calc_functions.adc_missing_bit_analysis(list(data[1]), 16), second[1].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import hashlib
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Each figure is saved with a small file holding a hash of the data it was drawn from. When a report
+# is regenerated, a figure whose data has not changed is left as it is rather than being drawn again.
+# The hash files sit next to their figures, so report sections drawn in parallel never share a file.
+# Only the name of the drawing function is hashed, not its code. Report regeneration removes the hash
+# files when the report code has changed, so a change to how a plot is drawn is picked up there.
+HASH_EXTENSION = '.sha1'
+
+
+def data_hash(*data):
+    """Hash of the content of some plot data.
+
+    Args:
+        *data: Values to hash. Nested lists, tuples and dicts are followed, arrays are hashed by their
+            bytes, and anything else by its repr.
+
+    Returns:
+        str: Hex digest of the data.
+    """
+    digest = hashlib.sha1()
+    _update_hash(digest, data)
+    return digest.hexdigest()
+
+
+def _update_hash(digest, value):
+    """Private function adding one value, and everything it contains, to a hash."""
+    if isinstance(value, dict):
+        digest.update('{')
+        for key in sorted(value):
+            _update_hash(digest, key)
+            _update_hash(digest, value[key])
+        digest.update('}')
+    elif isinstance(value, (list, tuple)):
+        digest.update('[')
+        for item in value:
+            _update_hash(digest, item)
+        digest.update(']')
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        # Memory mapped results are read in one pass here, without becoming lists.
+        array = np.ascontiguousarray(value)
+        digest.update('%s%s' % (array.dtype.str, array.shape))
+        digest.update(array.view(np.uint8))
+    elif isinstance(value, np.ndarray):
+        _update_hash(digest, value.tolist())
+    else:
+        digest.update(repr(value))
+        digest.update(',')
+
+
+def figure_is_current(sub_directory, fig_name, digest):
+    """Checks if a figure has already been drawn from data with the given hash.
+
+    Args:
+        sub_directory (str): Directory the figure is saved in.
+        fig_name (str): File name of the figure.
+        digest (str): Hash of the data the figure would now be drawn from.
+
+    Returns:
+        bool: True if the saved figure can be used as it is.
+    """
+    fig_path = os.path.join(sub_directory, fig_name)
+    if not os.path.exists(fig_path) or not os.path.exists(fig_path + HASH_EXTENSION):
+        return False
+    with open(fig_path + HASH_EXTENSION, 'r') as hash_file:
+        return hash_file.read().strip() == digest
+
+
+def render_figure(sub_directory, fig_name, draw, *data):
+    """Draws a figure and saves it, unless it has already been drawn from the same data.
+
+    The figure is drawn on its own Figure with the Agg canvas, rather than through the global pyplot
+    state, so figures can be drawn in several processes at once.
+
+    Args:
+        sub_directory (str): Directory the figure is saved in.
+        fig_name (str): File name of the figure. The extension sets the file format.
+        draw (function): Called as draw(axes, *data) to draw the plot.
+        *data: The plot data, which also decides if the figure needs drawing again.
+
+    Returns:
+        str: fig_name
+    """
+    digest = data_hash(draw.__name__, data)
+    if figure_is_current(sub_directory, fig_name, digest):
+        return fig_name
+    fig_path = os.path.join(sub_directory, fig_name)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    draw(fig.add_subplot(111), *data)
+    fig.savefig(fig_path)
+    # The hash is only written once the figure is saved, so an interrupted save is redrawn next time.
+    with open(fig_path + HASH_EXTENSION, 'w') as hash_file:
+        hash_file.write(digest)
+    return fig_name
@@ -0,0 +1,51 @@
+from framework_requires import BaseTestClass
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from mock import Mock
+from figure_cache import data_hash, figure_is_current, render_figure, HASH_EXTENSION
+
+
+class FigureCacheTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.draw = Mock(__name__='draw_test_plot',
+                         side_effect=lambda axes, x, y: axes.plot(x, y))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_data_hash_is_the_same_for_equal_data(self):
+        self.assertEqual(data_hash({'b': [1., 2.], 'a': np.arange(3.)}),
+                         data_hash({'a': np.arange(3.), 'b': [1., 2.]}))
+        self.assertNotEqual(data_hash(np.arange(3.)), data_hash(np.arange(3)))
+        self.assertNotEqual(data_hash([1., 2.]), data_hash([1., 3.]))
+
+    def test_figure_is_saved_with_its_hash(self):
+        fig_name = render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 4])
+        self.assertEqual(fig_name, 'test.png')
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'test.png')))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'test.png' + HASH_EXTENSION)))
+        self.assertTrue(figure_is_current(self.directory, 'test.png',
+                                          data_hash('draw_test_plot', ([1, 2], [3, 4]))))
+
+    def test_figure_is_only_drawn_again_when_the_data_changes(self):
+        render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 4])
+        render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 4])
+        self.assertEqual(self.draw.call_count, 1)
+        render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 5])
+        self.assertEqual(self.draw.call_count, 2)
+
+    def test_missing_figure_is_drawn_again(self):
+        render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 4])
+        os.remove(os.path.join(self.directory, 'test.png'))
+        render_figure(self.directory, 'test.png', self.draw, [1, 2], [3, 4])
+        self.assertEqual(self.draw.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
 import numpy as np
+import array_calc_functions
+
+# List based versions of the calculations. They return lists, as the results files and
+# older code expect. The work is done by the NumPy versions in array_calc_functions.
 
 
 def calc_x_pos(a, b, c, d, kx):
@@ -16,17 +20,11 @@ def calc_y_pos(a, b, c, d, ky):
 
 
 def multiply_list(lst, multiple):
-    output = []
-    for val in lst:
-        output.append(val * multiple)
-    return output
+    return array_calc_functions.multiply(lst, multiple).tolist()
 
 
 def add_list(lst, additional):
-    output = []
-    for val in lst:
-        output.append(val + additional)
-    return output
+    return array_calc_functions.add(lst, additional).tolist()
 
 
 def quarter_round(x):
@@ -47,28 +45,14 @@ def convert_attenuation_settings_to_abcd(starting_attenuations, map_atten_bpm,
 
 
 def round_to_2sf(input_vals):
-    if type(input_vals) is list:
-        output = []
-        for num in input_vals:
-            output.append(round(num * 100.) / 100.)
-    else:
-        output = round(input_vals * 100.) / 100.
-
-    return output
+    if isinstance(input_vals, (list, np.ndarray)):
+        return array_calc_functions.round_to_2sf(input_vals).tolist()
+    return round(input_vals * 100.) / 100.
 
 
 def change_to_freq_domain(times, data):
-    f_data = np.fft.fft(data)
-    f_data_mag = []
-    for f_sample in f_data:
-        f_data_mag.append(abs(f_sample))
-
-    sample_spacing = []
-    for nd in range(len(times) - 2):
-        sample_spacing.append(times[nd + 1] - times[nd])
-    sample_spacing = np.mean(sample_spacing)
-    f_freq = list(np.fft.fftfreq(len(times), sample_spacing))
-    return f_freq, f_data_mag
+    f_freq, f_data_mag = array_calc_functions.change_to_freq_domain(times, data)
+    return f_freq.tolist(), f_data_mag.tolist()
 
 
 def get_stats(data):
@@ -80,57 +64,22 @@ def get_stats(data):
 
 
 def subtract_mean(data, mean_value):
-    if data is list:
-        output = []
-        for val in data:
-            output.append(val - mean_value)
-    else:
-        output = data - mean_value
-
-    return output
+    if type(data) is list:
+        return array_calc_functions.subtract_mean(data, mean_value).tolist()
+    return array_calc_functions.subtract_mean(data, mean_value)
 
 
 def stat_dataset(dataset):
-    mean_list = []
-    std_list = []
-    for single_set in dataset:
-        mean_tmp, std_tmp, _2, _3 = get_stats(single_set)
-        mean_list.append(mean_tmp)
-        std_list.append(std_tmp)
-    return mean_list, std_list
+    mean_array, std_array = array_calc_functions.stat_dataset(dataset)
+    return mean_array.tolist(), std_array.tolist()
 
 
 def reconfigure_adc_data(data):
-    data_out = list()
-    for num_adc in range(len(data[0])):
-        data_out.append([])
-    for repeat_point in range(len(data)):
-        for num_adc in range(len(data[repeat_point])):
-            data_out[num_adc].extend(data[repeat_point][num_adc])
-    return data_out
+    return [np.asarray(adc_data).tolist() for adc_data in array_calc_functions.reconfigure_adc_data(data)]
 
 
 def adc_missing_bit_analysis(data, n_bits):
-    # First convert the int value into a binary string.
-    # Turn that string into a list of values.
-    # This should be bpm_object.adc_n_bits in size. However if this is not 16 there is a broadcast error.
-    # This is because the epics layer always returns a 16 bit number.
-    # For now set to 16. The upper extra bits will be ignored in the later processing anyway.
-    format_string = '0%db' % 16  # bpm_object.adc_n_bits
-    data_bits = [list(format(int(x), format_string)) for x in data]
-
-    # Calculating the standard deviation of each bit location.
-    data_bits_std = []
-    # for kw in range(test_system_object.BPM.num_adcs):
-    #     data_std.append([])
-    for wn in range(n_bits):
-        temp = []
-        for en in range(len(data)):
-            temp.append(int(data_bits[en][wn]))
-
-        data_bits_std.append(np.std(temp))
-
-    return data_bits_std
+    return array_calc_functions.adc_missing_bit_analysis(data, n_bits).tolist()
 
 
 def sa_data_to_dict(sa_a_times, sa_a_data, sa_b_times, sa_b_data, sa_c_times, sa_c_data, sa_d_times, sa_d_data):
@@ -1,148 +1,279 @@
-from math import sqrt
+import traceback
+from multiprocessing import Pool
 import numpy as np
 import helper_functions
+from result_store import open_results, results_exist, find_result_directories
+
+# Limits the test reports judge the results against.
+ADC_BIT_TEST_LIMIT = 0.05
+INTERNAL_ATTENUATOR_TEST_LIMIT = 0.1
+POWER_DEPENDENCE_TEST_LEVEL = 100
+RASTER_SCAN_TEST_LIMIT = 0.05
+RASTER_SCAN_CENTRE_TEST_LIMIT = 0.03
+
+
+class Verdict(object):
+    """The outcome of one pass/fail criterion.
+
+    Each channel of the test has a margin, the limit less the worst value found on that channel.
+    A test passes when every margin is positive, so the smallest margin shows how close it came.
+
+    Attributes:
+        test (str): Name of the criterion.
+        passed (bool): True if every margin is positive.
+        limit (float): Limit the results were judged against.
+        margins (dict): Margin of each channel, in the units of the limit.
+        results (ndarray): The detail behind the margins, where the criterion has it. The pass or fail
+            of each sample for the raster scan, the standard deviation of each bit for the ADC bit check.
+    """
+
+    def __init__(self, test, limit, margins, results=None):
+        self.test = test
+        self.limit = limit
+        self.margins = dict((channel, float(margin)) for channel, margin in margins.items())
+        # NaN margins come from missing or broken data, and fail.
+        self.passed = all(margin > 0 for margin in self.margins.values())
+        self.results = results
+
+    @property
+    def label(self):
+        """'Pass' or 'Fail', as shown in the reports."""
+        return 'Pass' if self.passed else 'Fail'
+
+    def worst_margin(self):
+        """Returns the smallest margin of all the channels."""
+        return min(self.margins.values())
+
+
+def evaluate_internal_attenuator(loaded_data, lim=INTERNAL_ATTENUATOR_TEST_LIMIT):
+    """Checks the button signals stay the same as the internal attenuation compensates the external.
+
+    The mean SA signal of each button at every step is normalised to the first step, and must stay
+    within lim of 1.
+
+    Args:
+        loaded_data (dict): Internal attenuator sweep results.
+        lim (float): Largest allowed fractional change of the signal.
+
+    Returns:
+        Verdict: With a margin for each of the buttons A to D.
+    """
+    data = loaded_data['data']
+    margins = {}
+    for button in 'abcd':
+        means, stds = helper_functions.array_calc_functions.stat_dataset([step['sa_%s_data' % button]
+                                                                           for step in data])
+        margins[button.upper()] = lim - np.max(np.abs(means / means[0] - 1))
+    return Verdict('internal_attenuator', lim, margins)
+
+
+def evaluate_power_dependence(loaded_data, level=POWER_DEPENDENCE_TEST_LEVEL):
+    """Checks the mean position stays close to the centre at every power level.
+
+    Args:
+        loaded_data (dict): Beam power dependence results.
+        level (float): Largest allowed offset of the mean position in um.
+
+    Returns:
+        Verdict: With a margin in um for each of X and Y.
+    """
+    margins = {}
+    for axis in 'xy':
+        means, stds = helper_functions.array_calc_functions.stat_dataset(loaded_data[axis + '_pos_raw'])
+        margins[axis.upper()] = level - np.max(np.abs(means * 1e3))
+    return Verdict('power_dependence', level, margins)
+
+
+def evaluate_adc_bit(loaded_data, lim=ADC_BIT_TEST_LIMIT):
+    """Checks every bit of every ADC toggles, with a standard deviation within lim of 0.5.
+
+    Args:
+        loaded_data (dict): ADC bit check results.
+        lim (float): Largest allowed difference of a bit standard deviation from 0.5.
+
+    Returns:
+        Verdict: With a margin for each ADC, named 'ADC1' upwards, and the standard deviation of each bit
+            as the results, indexed as [adc][bit].
+    """
+    data_std = helper_functions.array_calc_functions.adc_missing_bit_analysis(loaded_data['data'],
+                                                                              loaded_data['n_bits'])
+    data_std = np.atleast_2d(data_std)[:loaded_data['n_adc']]
+    worst = np.max(np.abs(data_std - 0.5), axis=1)
+    return Verdict('adc_bit', lim, dict(('ADC%d' % (num_adc + 1), lim - worst[num_adc])
+                                        for num_adc in range(len(worst))), data_std)
+
+
+def evaluate_raster_scan(loaded_data, lim=RASTER_SCAN_TEST_LIMIT):
+    """Checks every measured position of the raster scan is within lim of the position the attenuations predict.
+
+    Args:
+        loaded_data (dict): Raster scan results.
+        lim (float): Largest allowed distance in mm.
+
+    Returns:
+        Verdict: With a margin in mm for the whole scan, and the result of each sample.
+    """
+    distances = _raster_distances(loaded_data)
+    return Verdict('raster_scan', lim, {'XY': lim - np.max(distances)}, (distances < lim).ravel())
+
+
+def evaluate_centre_offset(loaded_data, lim=RASTER_SCAN_CENTRE_TEST_LIMIT):
+    """Checks the positions measured at the first point of the raster scan are within lim of its prediction.
+
+    Args:
+        loaded_data (dict): Raster scan results.
+        lim (float): Largest allowed distance in mm.
+
+    Returns:
+        Verdict: With a margin in mm for the centre point, and the result of each sample.
+    """
+    distances = _raster_distances(loaded_data)[0]
+    return Verdict('centre_offset', lim, {'XY': lim - np.max(distances)}, distances < lim)
+
+
+def _raster_distances(loaded_data):
+    """Private function giving the distance of each measured raster scan position from its prediction.
+
+    Returns:
+        ndarray: Distances indexed as [scan point][sample].
+    """
+    readbacks = [np.asarray(loaded_data[button + '_atten_readback'], dtype=float) for button in 'abcd']
+    a, b, c, d = helper_functions.convert_attenuation_settings_to_abcd(loaded_data['starting_attenuations'],
+                                                                       loaded_data['map_atten_bpm'], *readbacks)
+    x_predicted = helper_functions.calc_x_pos(a, b, c, d, kx=1)
+    y_predicted = helper_functions.calc_y_pos(a, b, c, d, ky=1)
+    shape = (len(x_predicted), loaded_data['number_of_samples'])
+    measured_x = np.asarray(loaded_data['measured_x'], dtype=float)[:shape[0] * shape[1]].reshape(shape)
+    measured_y = np.asarray(loaded_data['measured_y'], dtype=float)[:shape[0] * shape[1]].reshape(shape)
+    return np.sqrt((np.abs(measured_x) - np.abs(x_predicted)[:, np.newaxis]) ** 2 +
+                   (np.abs(measured_y) - np.abs(y_predicted)[:, np.newaxis]) ** 2)
 
 
 def internal_attenuator_pass_fail(loaded_data, lim=0.1):
     # pass/fail test for internal attenuation
-    data_test = list()
     print loaded_data['test_name']
-    data = loaded_data['data']
-    data_a = [np.mean(data[0]['sa_a_data'])]
-    data_b = [np.mean(data[0]['sa_b_data'])]
-    data_c = [np.mean(data[0]['sa_c_data'])]
-    data_d = [np.mean(data[0]['sa_d_data'])]
-    ref_a = np.mean(data[0]['sa_a_data'])
-    ref_b = np.mean(data[0]['sa_b_data'])
-    ref_c = np.mean(data[0]['sa_c_data'])
-    ref_d = np.mean(data[0]['sa_d_data'])
-    data_a_norm = [1]
-    data_b_norm = [1]
-    data_c_norm = [1]
-    data_d_norm = [1]
-    for atten_steps in range(1, len(data)):
-        data_a.append(np.mean(data[atten_steps]['sa_a_data']))
-        data_b.append(np.mean(data[atten_steps]['sa_b_data']))
-        data_c.append(np.mean(data[atten_steps]['sa_c_data']))
-        data_d.append(np.mean(data[atten_steps]['sa_d_data']))
-        data_a_norm.append(data_a[atten_steps] / ref_a)
-        data_b_norm.append(data_b[atten_steps] / ref_b)
-        data_c_norm.append(data_c[atten_steps] / ref_c)
-        data_d_norm.append(data_d[atten_steps] / ref_d)
-    data_test.append(all([1 - lim < tmp < 1 + lim for tmp in data_a_norm]))
-    data_test.append(all([1 - lim < tmp < 1 + lim for tmp in data_b_norm]))
-    data_test.append(all([1 - lim < tmp < 1 + lim for tmp in data_c_norm]))
-    data_test.append(all([1 - lim < tmp < 1 + lim for tmp in data_d_norm]))
-
-    if all(data_test):
-        print 'pass'
-        return 'Pass', True
-    else:
-        print 'fail'
-        return 'Fail', False
+    verdict = evaluate_internal_attenuator(loaded_data, lim)
+    print verdict.label.lower()
+    return verdict.label, verdict.passed
 
 
 def power_dependence_pass_fail(loaded_data, level=100):
     # pass fail test for beam power dependence
     print loaded_data['test_name']
-    x_pos_mean, _1 = helper_functions.stat_dataset(loaded_data['x_pos_raw'])
-    y_pos_mean, _2 = helper_functions.stat_dataset(loaded_data['y_pos_raw'])
-    x_pos_mean_scaled = list()
-    x_pos_mean_scaled_abs = list()
-    for xpm in x_pos_mean:
-        x_pos_mean_scaled.append(xpm * 1e3)
-        x_pos_mean_scaled_abs.append(abs(x_pos_mean_scaled[-1]))
-    y_pos_mean_scaled = list()
-    y_pos_mean_scaled_abs = list()
-    for ypm in y_pos_mean:
-        y_pos_mean_scaled.append(ypm * 1e3)
-        y_pos_mean_scaled_abs.append(abs(y_pos_mean_scaled[-1]))
-    if max(x_pos_mean_scaled_abs) < level and max(y_pos_mean_scaled_abs) < level:
-        print 'pass'
-        return 'Pass', True
-    else:
-        print 'fail'
-        return 'Fail', False
+    verdict = evaluate_power_dependence(loaded_data, level)
+    print verdict.label.lower()
+    return verdict.label, verdict.passed
 
 
 def adc_bit_test_pass_fail(loaded_data, lim=0.05):
     # pass fail test for bit test
     print loaded_data['test_name']
-    data_test = list()
-    for kw in range(loaded_data['n_adc']):
-        data_std = helper_functions.adc_missing_bit_analysis(loaded_data['data'][kw], loaded_data['n_bits'])
-        data_test.append(all([0.5 - lim < tmp < 0.5 + lim for tmp in data_std]))
-
-    if all(data_test):
-        print 'pass'
-        return 'Pass', True
-    else:
-        print 'fail'
-        return 'Fail', False
+    verdict = evaluate_adc_bit(loaded_data, lim)
+    print verdict.label.lower()
+    return verdict.label, verdict.passed
 
 
 def raster_scan_pass_fail(loaded_data, lim=0.05):
     # pass/fail test raster scan
-    # Calculate predicted locations
-    x_predicted = []
-    y_predicted = []
-    for inds in range(len(loaded_data['a_atten_readback'])):
-        a, b, c, d = helper_functions.convert_attenuation_settings_to_abcd(loaded_data['starting_attenuations'],
-                                                                           loaded_data['map_atten_bpm'],
-                                                                           loaded_data['a_atten_readback'][inds],
-                                                                           loaded_data['b_atten_readback'][inds],
-                                                                           loaded_data['c_atten_readback'][inds],
-                                                                           loaded_data['d_atten_readback'][inds])
-
-        x_predicted.append(helper_functions.calc_x_pos(a, b, c, d, kx=1))
-        y_predicted.append(helper_functions.calc_y_pos(a, b, c, d, ky=1))
-
-    dists = list()
-    sample_counter = 0
-    for ne in range(len(x_predicted)):
-        for naq in range(loaded_data['number_of_samples']):
-            dists.append(sqrt((abs(loaded_data['measured_x'][sample_counter]) - abs(x_predicted[ne])) ** 2 +
-                         (abs(loaded_data['measured_y'][sample_counter]) - abs(y_predicted[ne])) ** 2))
-            sample_counter += 1
-
     print loaded_data['test_name']
-    data_test = [tmp < lim for tmp in dists]
-    if all(data_test):
-        print 'pass'
-        return 'Pass', True, data_test
-    else:
-        print 'fail'
-        return 'Fail', False, data_test
+    verdict = evaluate_raster_scan(loaded_data, lim)
+    print verdict.label.lower()
+    return verdict.label, verdict.passed, verdict.results.tolist()
 
 
 def centre_offset_pass_fail(loaded_data, lim=0.02):
     # pass/fail test offset from centre
-    # Calculate predicted locations
-    x_predicted = []
-    y_predicted = []
-    for inds in range(len(loaded_data['a_atten_readback'])):
-        a, b, c, d = helper_functions.convert_attenuation_settings_to_abcd(loaded_data['starting_attenuations'],
-                                                                           loaded_data['map_atten_bpm'],
-                                                                           loaded_data['a_atten_readback'][inds],
-                                                                           loaded_data['b_atten_readback'][inds],
-                                                                           loaded_data['c_atten_readback'][inds],
-                                                                           loaded_data['d_atten_readback'][inds])
-
-        x_predicted.append(helper_functions.calc_x_pos(a, b, c, d, kx=1))
-        y_predicted.append(helper_functions.calc_y_pos(a, b, c, d, ky=1))
-
-    dists = list()
-    sample_counter = 0
-    for naq in range(loaded_data['number_of_samples']):
-        dists.append(sqrt((abs(loaded_data['measured_x'][sample_counter]) - abs(x_predicted[0])) ** 2 +
-                     (abs(loaded_data['measured_y'][sample_counter]) - abs(y_predicted[0])) ** 2))
-        sample_counter += 1
-
     print 'Offset from centre'
-    data_test = [tmp < lim for tmp in dists]
-    if all(data_test):
-        print 'pass'
-        return 'Pass', True, data_test
-    else:
-        print 'fail'
-        return 'Fail', False, data_test
+    verdict = evaluate_centre_offset(loaded_data, lim)
+    print verdict.label.lower()
+    return verdict.label, verdict.passed, verdict.results.tolist()
+
+
+# The criteria applied to each of the stored results, with the limit argument of each.
+RESULT_CRITERIA = {'ADC_bit_check_data': [(evaluate_adc_bit, 'lim')],
+                   'ADC_int_atten_sweep_data': [(evaluate_internal_attenuator, 'lim')],
+                   'beam_power_dependence_data': [(evaluate_power_dependence, 'level')],
+                   'beam_power_dependence_data_rf_power_sweep': [(evaluate_power_dependence, 'level')],
+                   'beam_position_raster_scan_data': [(evaluate_raster_scan, 'lim'),
+                                                      (evaluate_centre_offset, 'lim')]}
+
+
+def criterion_names():
+    """Returns the names of the pass/fail criteria, which are the keys allowed in a dict of limits."""
+    return sorted(set(evaluate.__name__[len('evaluate_'):] for criteria in RESULT_CRITERIA.values()
+                      for evaluate, limit_argument in criteria))
+
+
+def check_limits(limits):
+    """Raises ValueError if any of the limits is not for a known criterion, so a mistyped name is not ignored."""
+    unknown = sorted(set(limits or {}) - set(criterion_names()))
+    if unknown:
+        raise ValueError('Unknown pass/fail criteria %s, expected some of %s' % (', '.join(unknown),
+                                                                                 ', '.join(criterion_names())))
+
+
+def evaluate_run(subdirectory, limits=None):
+    """Applies every pass/fail criterion to one set of stored results.
+
+    Args:
+        subdirectory (str): The folder the test results are stored in.
+        limits (dict): Limits to use in place of the defaults, keyed by criterion name,
+            such as {'raster_scan': 0.04}.
+
+    Returns:
+        dict: Lists of Verdicts, keyed by the name of the results they were made from.
+
+    Raises:
+        ValueError: If a limit is given for a criterion which does not exist.
+    """
+    check_limits(limits)
+    limits = limits or {}
+    verdicts = {}
+    for name, criteria in sorted(RESULT_CRITERIA.items()):
+        if not results_exist(subdirectory, name):
+            continue
+        loaded_data = open_results(subdirectory, name)
+        verdicts[name] = []
+        for evaluate, limit_argument in criteria:
+            test = evaluate.__name__[len('evaluate_'):]
+            arguments = {limit_argument: limits[test]} if test in limits else {}
+            verdicts[name].append(evaluate(loaded_data, **arguments))
+    return verdicts
+
+
+def requalify(results_root, limits=None, processes=None):
+    """Judges every set of results under a results tree against the pass/fail criteria, in parallel.
+
+    Only the stored results are read, so a fleet of units can be judged against new limits without
+    rebuilding any reports.
+
+    Args:
+        results_root (str): Root of the results tree.
+        limits (dict): Limits to use in place of the defaults, as for evaluate_run.
+        processes (int): Number of results directories judged at once. Defaults to one per CPU.
+
+    Returns:
+        dict: For each results directory, the verdicts from evaluate_run, or the traceback of the error
+            if its results could not be judged.
+
+    Raises:
+        ValueError: If a limit is given for a criterion which does not exist.
+    """
+    check_limits(limits)
+    subdirectories = find_result_directories(results_root)
+    pool = Pool(processes=processes)
+    try:
+        outcomes = pool.map(_evaluate_run, [(subdirectory, limits) for subdirectory in subdirectories])
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(subdirectories, outcomes))
+
+
+def _evaluate_run(job):
+    """Private function run in a worker process to judge one set of results."""
+    subdirectory, limits = job
+    try:
+        return evaluate_run(subdirectory, limits)
+    except Exception:
+        return traceback.format_exc()
@@ -0,0 +1,80 @@
+from framework_requires import BaseTestClass
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from result_store import ResultStore
+import pass_fail
+
+
+def power_dependence_data(x_offset):
+    return {'test_name': 'Beam Power Dependence',
+            'x_pos_raw': [[x_offset, x_offset], [0., 0.02]],
+            'y_pos_raw': [[0.01, -0.01], [0.03, 0.03]]}
+
+
+class PassFailTest(BaseTestClass):
+
+    def test_internal_attenuator_margin_of_each_button(self):
+        steps = [dict(('sa_%s_data' % button, [1., 1.]) for button in 'abcd') for step in range(3)]
+        steps[2]['sa_b_data'] = [1.04, 1.06]
+        verdict = pass_fail.evaluate_internal_attenuator({'test_name': 'Internal attenuator', 'data': steps},
+                                                         lim=0.1)
+        self.assertTrue(verdict.passed)
+        self.assertAlmostEqual(verdict.margins['A'], 0.1)
+        self.assertAlmostEqual(verdict.margins['B'], 0.05)
+        self.assertAlmostEqual(verdict.worst_margin(), 0.05)
+
+    def test_power_dependence_margins_are_in_um(self):
+        verdict = pass_fail.evaluate_power_dependence(power_dependence_data(0.12), level=100)
+        self.assertFalse(verdict.passed)
+        self.assertAlmostEqual(verdict.margins['X'], -20.)
+        self.assertAlmostEqual(verdict.margins['Y'], 70.)
+        self.assertEqual(pass_fail.power_dependence_pass_fail(power_dependence_data(0.05)), ('Pass', True))
+
+    def test_missing_data_fails(self):
+        verdict = pass_fail.evaluate_power_dependence(power_dependence_data(np.nan))
+        self.assertFalse(verdict.passed)
+
+    def test_raster_scan_gives_the_result_of_each_sample(self):
+        loaded_data = {'test_name': 'Raster scan', 'starting_attenuations': [10., 10., 10., 10.],
+                       'map_atten_bpm': {'A': 1, 'B': 2, 'C': 3, 'D': 4}, 'number_of_samples': 2,
+                       'a_atten_readback': [10., 10.], 'b_atten_readback': [10., 10.],
+                       'c_atten_readback': [10., 10.], 'd_atten_readback': [10., 10.],
+                       'measured_x': [0., 0.01, 0.02, 0.1], 'measured_y': [0., 0., 0., 0.]}
+        verdict = pass_fail.evaluate_raster_scan(loaded_data, lim=0.05)
+        self.assertEqual(verdict.results.tolist(), [True, True, True, False])
+        self.assertAlmostEqual(verdict.margins['XY'], -0.05)
+        self.assertEqual(pass_fail.centre_offset_pass_fail(loaded_data, lim=0.02),
+                         ('Pass', True, [True, True]))
+
+
+class EvaluateRunTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        store = ResultStore(self.directory, 'beam_power_dependence_data', {'test_name': 'Beam Power Dependence'})
+        for x_offset in (0.05, 0.):
+            store.add_step(x_pos_raw=np.array([x_offset, x_offset]), y_pos_raw=np.array([0., 0.]))
+        store.finish()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_limits_replace_the_defaults(self):
+        verdict, = pass_fail.evaluate_run(self.directory)['beam_power_dependence_data']
+        self.assertTrue(verdict.passed)
+        verdict, = pass_fail.evaluate_run(self.directory, {'power_dependence': 40})['beam_power_dependence_data']
+        self.assertFalse(verdict.passed)
+        self.assertAlmostEqual(verdict.margins['X'], -10.)
+
+    def test_unknown_limits_are_refused(self):
+        self.assertRaises(ValueError, pass_fail.evaluate_run, self.directory, {'raster': 0.04})
+        self.assertRaises(ValueError, pass_fail.requalify, self.directory, {'raster': 0.04})
+        self.assertIn('raster_scan', pass_fail.criterion_names())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,16 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import helper_functions.helper_calc_functions
-import os
+from helper_functions.figure_cache import render_figure
 from copy import deepcopy
 from itertools import compress
 import operator
 
 
 def line_plot_data(datasets, sub_directory):
+    return render_figure(sub_directory, datasets[0][1][2], _draw_line_plot, datasets)  # figure name
+
+
+def _draw_line_plot(ax, datasets):
     for dt in range(len(datasets)):
         index = datasets[dt]
         if len(index[1]) == 4:
@@ -15,50 +18,48 @@ def line_plot_data(datasets, sub_directory):
         else:
             lab = ''
         if len(index[0]) == 2:
-            plt.plot(index[0][0], index[0][1], label=lab)
+            ax.plot(index[0][0], index[0][1], label=lab)
         elif len(index[0]) == 3:
-            plt.errorbar(index[0][0], index[0][1], index[0][2], label=lab)
+            ax.errorbar(index[0][0], index[0][1], index[0][2], label=lab)
 
-    plt.xlabel(datasets[0][1][0])
-    plt.ylabel(datasets[0][1][1])
-    plt.legend(loc='upper right')
-    plt.grid(True)
+    ax.set_xlabel(datasets[0][1][0])
+    ax.set_ylabel(datasets[0][1][1])
+    ax.legend(loc='upper right')
+    ax.grid(True)
     if len(datasets[0]) == 3:
         # There is a specification line. Add this.
         # Spec is in um while data is in mm so scale by 1E-3.
-        plt.plot(datasets[0][2][0], datasets[0][2][1], 'r')
-    plt.savefig(os.path.join(sub_directory, datasets[0][1][2]))
-    plt.cla()  # Clear axis
-    plt.clf()  # Clear figure
-    return datasets[0][1][2] #figure name
+        ax.plot(datasets[0][2][0], datasets[0][2][1], 'r')
 
 
 def bar_plot_data(datasets, sub_directory):
+    return render_figure(sub_directory, datasets[0][1][2], _draw_bar_plot, datasets)  # figure name
+
+
+def _draw_bar_plot(ax, datasets):
     cols = ['k', 'r', 'g', 'b']
     x_shift = 0
     cols_ind = 0
     for index in datasets:
-        plt.bar(index[0][0] + x_shift, index[0][1], align='center', width=0.15, label=index[1][3], color=cols[cols_ind])
+        ax.bar(index[0][0] + x_shift, index[0][1], align='center', width=0.15, label=index[1][3], color=cols[cols_ind])
         x_shift = x_shift + 0.1
         cols_ind = cols_ind + 1
-    plt.legend(loc='upper right')
-    plt.xlabel(datasets[0][1][0])
-    plt.ylabel(datasets[0][1][1])
+    ax.legend(loc='upper right')
+    ax.set_xlabel(datasets[0][1][0])
+    ax.set_ylabel(datasets[0][1][1])
     x_step = datasets[0][0][0][1] - datasets[0][0][0][0]
-    plt.xlim(datasets[0][0][0][0] - x_step / 2., datasets[0][0][0][-1] + x_step / 2.)
-    plt.ylim(0, 1)
-    plt.savefig(os.path.join(sub_directory, datasets[0][1][2]))
-    plt.cla()  # Clear axis
-    plt.clf()  # Clear figure
-    return datasets[0][1][2] # figure name
+    ax.set_xlim(datasets[0][0][0][0] - x_step / 2., datasets[0][0][0][-1] + x_step / 2.)
+    ax.set_ylim(0, 1)
 
 
-def plot_adc_bit_check_data(sub_directory, loaded_data):
+def plot_adc_bit_check_data(sub_directory, loaded_data, data_std=None):
     format_plot = []  # x axis, y axis, x axis title, y axis title, title of file, caption
-    data = loaded_data['data']
+    # All the ADCs are analysed together, unless the pass/fail test has already done it and passed the result in.
+    if data_std is None:
+        data_std = helper_functions.array_calc_functions.adc_missing_bit_analysis(loaded_data['data'],
+                                                                                  loaded_data['n_bits'])
     for kw in range(loaded_data['n_adc']):
-        data_std = helper_functions.adc_missing_bit_analysis(data[kw], loaded_data['n_bits'])
-        format_plot.append(((np.arange(1, loaded_data['n_bits'] + 1), data_std),
+        format_plot.append(((np.arange(1, loaded_data['n_bits'] + 1), data_std[kw]),
                             ('bit number', 'Standard deviation', 'ADC_bit_check.pdf', ' '.join(('ADC', str(kw + 1))))))
     fig1_name = bar_plot_data(format_plot, sub_directory)
     return fig1_name
@@ -68,28 +69,16 @@ def plot_adc_int_atten_sweep_data(sub_directory, loaded_data):
     # Get the plot values in a format that is easy to iterate
     format_plot = []  # x axis, y axis, x axis title, y axis title, title of file, caption
 
+    # Only the SA data of each step is read from the results.
     data = loaded_data['data']
-    data_a = [np.mean(data[0]['sa_a_data'])]
-    data_b = [np.mean(data[0]['sa_b_data'])]
-    data_c = [np.mean(data[0]['sa_c_data'])]
-    data_d = [np.mean(data[0]['sa_d_data'])]
-    ref_a = np.mean(data[0]['sa_a_data'])
-    ref_b = np.mean(data[0]['sa_b_data'])
-    ref_c = np.mean(data[0]['sa_c_data'])
-    ref_d = np.mean(data[0]['sa_d_data'])
-    data_a_norm = [1]
-    data_b_norm = [1]
-    data_c_norm = [1]
-    data_d_norm = [1]
-    for atten_steps in range(1, len(data)):
-        data_a.append(np.mean(data[atten_steps]['sa_a_data']))
-        data_b.append(np.mean(data[atten_steps]['sa_b_data']))
-        data_c.append(np.mean(data[atten_steps]['sa_c_data']))
-        data_d.append(np.mean(data[atten_steps]['sa_d_data']))
-        data_a_norm.append(data_a[atten_steps] / ref_a)
-        data_b_norm.append(data_b[atten_steps] / ref_b)
-        data_c_norm.append(data_c[atten_steps] / ref_c)
-        data_d_norm.append(data_d[atten_steps] / ref_d)
+    data_a = np.array([np.mean(step['sa_a_data']) for step in data])
+    data_b = np.array([np.mean(step['sa_b_data']) for step in data])
+    data_c = np.array([np.mean(step['sa_c_data']) for step in data])
+    data_d = np.array([np.mean(step['sa_d_data']) for step in data])
+    data_a_norm = data_a / data_a[0]
+    data_b_norm = data_b / data_b[0]
+    data_c_norm = data_c / data_c[0]
+    data_d_norm = data_d / data_d[0]
 
     format_plot.append(((loaded_data['bpm_attenuation'], data_a),
                         ('bpm_attenuation', 'counts', "ADC_varying_internal_attenuation.pdf", 'A')))
@@ -118,18 +107,16 @@ def plot_beam_power_dependence_data(sub_directory, loaded_data, ref_data):
     # Get the plot values in a format that's easy to iterate
     format_plot = []  # x axis, y axis, x axis title, y axis title, title of file, caption
 
-    x_pos_mean, x_pos_std = helper_functions.helper_calc_functions.stat_dataset(loaded_data['x_pos_raw'])
-    y_pos_mean, y_pos_std = helper_functions.helper_calc_functions.stat_dataset(loaded_data['y_pos_raw'])
-    x_noise_freq, x_noise_fft = helper_functions.helper_calc_functions.change_to_freq_domain(
+    x_pos_mean, x_pos_std = helper_functions.array_calc_functions.stat_dataset(loaded_data['x_pos_raw'])
+    y_pos_mean, y_pos_std = helper_functions.array_calc_functions.stat_dataset(loaded_data['y_pos_raw'])
+    x_noise_freq, x_noise_fft = helper_functions.array_calc_functions.change_to_freq_domain(
         loaded_data['x_time_baseline'], loaded_data['x_pos_baseline'])
-    y_noise_freq, y_noise_fft = helper_functions.helper_calc_functions.change_to_freq_domain(
+    y_noise_freq, y_noise_fft = helper_functions.array_calc_functions.change_to_freq_domain(
         loaded_data['y_time_baseline'], loaded_data['y_pos_baseline'])
 
-    format_plot.append(((loaded_data['bpm_input_power'], [xp * 1e3 for xp in x_pos_mean],
-                         [xs * 1e3 for xs in x_pos_std]),
+    format_plot.append(((loaded_data['bpm_input_power'], np.multiply(x_pos_mean, 1e3), np.multiply(x_pos_std, 1e3)),
                         ('Input power (dBm)', 'Beam Position (um)', "power_vs_position.pdf", 'Horizontal')))
-    format_plot.append(((loaded_data['bpm_input_power'], [yp * 1e3 for yp in y_pos_mean],
-                         [ys * 1e3 for ys in y_pos_std]),
+    format_plot.append(((loaded_data['bpm_input_power'], np.multiply(y_pos_mean, 1e3), np.multiply(y_pos_std, 1e3)),
                         ('Input power (dBm)', 'Beam Position (um)', "power_vs_position.pdf", 'Vertical')))
     format_plot.append(((loaded_data['x_time_baseline'], loaded_data['x_pos_baseline']),
                         ('Time (s)', 'Position (um)', "baseline_noise_time.pdf", 'Horizontal')))
@@ -224,17 +211,21 @@ def plot_raster_scan(sub_directory, loaded_data, test_data, centre_test_data):
             centre_y_failed.append(loaded_data['measured_y'][result_number])
         result_number += 1
 
-    plt.plot(x_passed, y_passed, 'bo', x_failed, y_failed, 'ro',
-             x_predicted, y_predicted, 'g+',
-             centre_x_passed, centre_y_passed, 'bo', centre_x_failed, centre_y_failed, 'ro',
-             markersize=10)
-    plt.xlabel("Horizontal Beam Position (mm)")
-    plt.ylabel("Vertical Beam Position (mm)")
-    plt.legend(('Passed', 'Failed', 'Predicted'), loc='upper right')
-    plt.grid(True)
     fig_name = "Beam_position_equidistant_grid_raster_scan_test.pdf"
-    plt.savefig(os.path.join(sub_directory, fig_name))
-    return fig_name
+    return render_figure(sub_directory, fig_name, _draw_raster_scan, x_passed, y_passed, x_failed, y_failed,
+                         x_predicted, y_predicted, centre_x_passed, centre_y_passed, centre_x_failed, centre_y_failed)
+
+
+def _draw_raster_scan(ax, x_passed, y_passed, x_failed, y_failed, x_predicted, y_predicted,
+                      centre_x_passed, centre_y_passed, centre_x_failed, centre_y_failed):
+    ax.plot(x_passed, y_passed, 'bo', x_failed, y_failed, 'ro',
+            x_predicted, y_predicted, 'g+',
+            centre_x_passed, centre_y_passed, 'bo', centre_x_failed, centre_y_failed, 'ro',
+            markersize=10)
+    ax.set_xlabel("Horizontal Beam Position (mm)")
+    ax.set_ylabel("Vertical Beam Position (mm)")
+    ax.legend(('Passed', 'Failed', 'Predicted'), loc='upper right')
+    ax.grid(True)
 
 
 def plot_noise(sub_directory, loaded_data, loaded_data_complex):
@@ -260,27 +251,25 @@ def plot_noise(sub_directory, loaded_data, loaded_data_complex):
 
     fig_names = []
     for index in format_plot:
-        if type(index[0][0][0]) is list:
-            for ks in range(len(index[0][0])):
-                if len(index[1]) == 4:
-                    plt.plot(index[0][0][ks], index[0][1][ks], label=index[1][3][ks])
-                else:
-                    plt.plot(index[0][0][ks], index[0][1][ks], 's')
-        else:
-            plt.plot(index[0][0], index[0][1], 's')
-
-        plt.xlabel(index[1][0])
-        plt.ylabel(index[1][1])
-        plt.legend()
-        plt.grid(True)
-        if len(index) == 3:
-            # There is a specification line. Add this.
-            plt.plot(index[2][0], index[2][1], 'r')
-
-        fig_names.append(index[1][2])
-        plt.savefig(os.path.join(sub_directory, index[1][2]))
+        fig_names.append(render_figure(sub_directory, index[1][2], _draw_noise_plot, index))
+    return fig_names
 
-        plt.cla()  # Clear axis
-        plt.clf()  # Clear figure
 
-    return fig_names
+def _draw_noise_plot(ax, index):
+    # Several datasets if the first x axis is itself a sequence. These can be lists or arrays.
+    if np.ndim(index[0][0][0]) > 0:
+        for ks in range(len(index[0][0])):
+            if len(index[1]) == 4:
+                ax.plot(index[0][0][ks], index[0][1][ks], label=index[1][3][ks])
+            else:
+                ax.plot(index[0][0][ks], index[0][1][ks], 's')
+    else:
+        ax.plot(index[0][0], index[0][1], 's')
+
+    ax.set_xlabel(index[1][0])
+    ax.set_ylabel(index[1][1])
+    ax.legend()
+    ax.grid(True)
+    if len(index) == 3:
+        # There is a specification line. Add this.
+        ax.plot(index[2][0], index[2][1], 'r')
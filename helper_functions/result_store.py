@@ -0,0 +1,372 @@
+import os
+import json
+from collections import Mapping
+import numpy as np
+
+MANIFEST_NAME = 'manifest.json'
+# Steps and appends made since the manifest was last written, one JSON record per line.
+JOURNAL_NAME = 'journal.jsonl'
+# Every results directory holds the BPM state captured at the start of the tests.
+RESULTS_STATE_NAME = 'initial_BPM_state.json'
+STORE_FORMAT = 'npy_directory'
+STORE_VERSION = 1
+
+
+class ResultStore(object):
+    """Streams the results of a test to disk one step at a time.
+
+    The results are kept in a directory holding one .npy file per array and a small JSON manifest.
+    Rewriting the whole manifest after every step would make a long sweep take time growing with
+    the square of its length, so each step and append is instead added as one line to a journal
+    and flushed to disk. The manifest is written whole when the test finishes, or when metadata
+    changes, and the journal is then removed. If a sweep is interrupted, reading the store replays
+    the journal over the manifest, so everything up to the last completed step can still be loaded.
+
+    Three kinds of data can be stored.
+        Metadata: settings and device names, kept in the manifest.
+        Steps: the values measured at each point of a sweep. Scalars go in the manifest and
+            arrays in their own files. Dicts of values are stored recursively.
+        Concatenated fields: samples which are added to one long array as the test runs,
+            appended to a raw binary file rather than held in memory.
+
+    load_results turns the store back into the dict layout the old JSON files had, with each
+    step field becoming a list over the steps that recorded it.
+
+    Attributes:
+        path (str): Directory holding the store.
+        manifest (dict): Current contents of the manifest.
+    """
+
+    def __init__(self, sub_directory, name, metadata=None, step_fields=()):
+        """Creates an empty store in the sub directory.
+
+        Args:
+            sub_directory (str): Directory the test results are written to.
+            name (str): Name of the store. This replaces the name of the old JSON file, without the extension.
+            metadata (dict): Initial metadata for the test.
+            step_fields (list): Step fields which load as empty lists if no step recorded them.
+        """
+        self.path = os.path.join(sub_directory, name)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.manifest = {'format': STORE_FORMAT,
+                         'version': STORE_VERSION,
+                         'name': name,
+                         'complete': False,
+                         'metadata': {},
+                         'arrays': {},
+                         'concatenated': {},
+                         'step_fields': list(step_fields),
+                         'steps': []}
+        if metadata is not None:
+            self.manifest['metadata'].update(_to_json_value(metadata))
+        self._write_manifest()
+
+    def set_metadata(self, **metadata):
+        """Adds or updates metadata values.
+
+        Args:
+            **metadata: Values to record. Arrays are converted to lists.
+
+        Returns:
+
+        """
+        self.manifest['metadata'].update(_to_json_value(metadata))
+        self._write_manifest()
+
+    def save_array(self, name, array):
+        """Stores an array which is not part of a sweep, such as a baseline capture.
+
+        Args:
+            name (str): Field name of the array.
+            array (list/ndarray): Values to store.
+
+        Returns:
+
+        """
+        self.manifest['arrays'][name] = self._save_npy(name, array)
+        self._write_manifest()
+
+    def add_step(self, **fields):
+        """Stores the values measured at one step of the test.
+
+        Args:
+            **fields: Values for this step. Lists and arrays are saved to .npy files,
+                scalars and strings are kept in the manifest.
+
+        Returns:
+            int: Index of the step.
+        """
+        step = len(self.manifest['steps'])
+        entries = {}
+        for name, value in fields.items():
+            entries[name] = self._store_value('step_%04d_%s' % (step, name), value)
+        self.manifest['steps'].append(entries)
+        self._write_journal({'step': step, 'fields': entries})
+        return step
+
+    def append(self, name, values):
+        """Appends samples to a concatenated field without keeping the earlier samples in memory.
+
+        Args:
+            name (str): Field name.
+            values (list/ndarray): Samples to append. The type is fixed by the first append.
+
+        Returns:
+
+        """
+        entry = self.manifest['concatenated'].get(name)
+        values = np.asarray(values)
+        if entry is None:
+            entry = {'file': name + '.bin', 'dtype': values.dtype.str, 'length': 0}
+            self.manifest['concatenated'][name] = entry
+        with open(os.path.join(self.path, entry['file']), 'ab') as data_file:
+            data_file.write(values.astype(entry['dtype']).ravel().tostring())
+        entry['length'] += values.size
+        self._write_journal({'append': name, 'entry': entry})
+
+    def finish(self, **metadata):
+        """Marks the test as complete, adding any final metadata.
+
+        Args:
+            **metadata: Values to record.
+
+        Returns:
+
+        """
+        self.manifest['metadata'].update(_to_json_value(metadata))
+        self.manifest['complete'] = True
+        self._write_manifest()
+
+    def _store_value(self, file_stem, value):
+        """Private method which returns the manifest entry for a value, saving any arrays to file."""
+        if isinstance(value, dict):
+            return dict((key, self._store_value('.'.join((file_stem, key)), val)) for key, val in value.items())
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return self._save_npy(file_stem, value)
+        return _to_json_value(value)
+
+    def _save_npy(self, file_stem, array):
+        """Private method which saves an array to a .npy file and returns its manifest entry."""
+        array = np.asarray(array)
+        file_name = file_stem + '.npy'
+        np.save(os.path.join(self.path, file_name), array)
+        return {'npy': file_name, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    def _write_manifest(self):
+        """Private method which replaces the manifest in one step, so a reader never sees half of it.
+
+        The manifest then holds everything in the journal, so the journal is removed.
+        """
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w') as write_file:
+            json.dump(self.manifest, write_file)
+        if os.name == 'nt' and os.path.exists(manifest_path):
+            os.remove(manifest_path)  # rename will not overwrite on Windows.
+        os.rename(temp_path, manifest_path)
+        journal_path = os.path.join(self.path, JOURNAL_NAME)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def _write_journal(self, record):
+        """Private method adding one record to the journal, on disk before it returns."""
+        with open(os.path.join(self.path, JOURNAL_NAME), 'a') as journal_file:
+            journal_file.write(json.dumps(record) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+
+class NumpyEncoder(json.JSONEncoder):
+    """JSON encoder which writes numpy arrays and scalars as plain JSON lists and numbers.
+
+    Each array is converted with a single tolist call, rather than element by element,
+    so large captures such as ADC data can be passed to json.dump directly.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return json.JSONEncoder.default(self, obj)
+
+
+def _to_json_value(value):
+    """Private function converting numpy types in a value to the plain types JSON can hold."""
+    if isinstance(value, dict):
+        return dict((key, _to_json_value(val)) for key, val in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(val) for val in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def results_exist(subdirectory, name):
+    """Checks if there are results for a test, either as a store or as an old JSON file.
+
+    Args:
+        subdirectory (str): Directory the test results were written to.
+        name (str): Name of the results, without any extension.
+
+    Returns:
+        bool: True if there are results to load.
+    """
+    return os.path.exists(os.path.join(subdirectory, name, MANIFEST_NAME)) or \
+        os.path.exists(os.path.join(subdirectory, name + '.json'))
+
+
+def find_result_directories(results_root):
+    """Finds every set of test results under a results tree.
+
+    Args:
+        results_root (str): Root of the results tree, holding <mac>/<timestamp> directories.
+
+    Returns:
+        list: The results directories, sorted.
+    """
+    subdirectories = []
+    for directory, dirnames, filenames in os.walk(results_root):
+        if RESULTS_STATE_NAME in filenames:
+            subdirectories.append(directory)
+            # The directories below a set of results are its result stores.
+            dirnames[:] = []
+    return sorted(subdirectories)
+
+
+class LazyResults(Mapping):
+    """Read only view of a result store which only loads a field when it is used.
+
+    Arrays are opened as read only memory maps, so a report section which plots a few fields
+    never reads the rest of the files, and only the parts of an array it touches come off disk.
+    Each field is opened on first use and then kept.
+
+    The fields have the same names and nesting as load_results gives, but the arrays are numpy
+    arrays rather than lists. Step fields are lists over the steps which recorded them.
+
+    Attributes:
+        path (str): Directory holding the store.
+        manifest (dict): Contents of the manifest when the store was opened.
+    """
+
+    def __init__(self, store_path):
+        self.path = store_path
+        with open(os.path.join(store_path, MANIFEST_NAME), 'r') as read_manifest:
+            self.manifest = _replay_journal(store_path, json.load(read_manifest))
+        self._step_fields = list(self.manifest['step_fields'])
+        for step in self.manifest['steps']:
+            for field_name in step:
+                if field_name not in self._step_fields:
+                    self._step_fields.append(field_name)
+        self._fields = {}
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            self._fields[key] = self._open_field(key)
+        return self._fields[key]
+
+    def __contains__(self, key):
+        return key in self.manifest['metadata'] or key in self.manifest['arrays'] or \
+            key in self.manifest['concatenated'] or key in self._step_fields
+
+    def __iter__(self):
+        for group in (self.manifest['metadata'], self.manifest['arrays'], self.manifest['concatenated']):
+            for key in group:
+                yield key
+        for key in self._step_fields:
+            yield key
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def _open_field(self, key):
+        """Private method which opens one field from the store."""
+        if key in self.manifest['metadata']:
+            return self.manifest['metadata'][key]
+        if key in self.manifest['arrays']:
+            return _open_entry(self.path, self.manifest['arrays'][key])
+        if key in self.manifest['concatenated']:
+            entry = self.manifest['concatenated'][key]
+            if entry['length'] == 0:
+                return np.zeros(0, dtype=np.dtype(entry['dtype']))
+            # Only whole samples listed in the manifest are used, in case the test stopped mid write.
+            return np.memmap(os.path.join(self.path, entry['file']), dtype=np.dtype(entry['dtype']), mode='r',
+                             shape=(entry['length'],))
+        if key in self._step_fields:
+            return [_open_entry(self.path, step[key]) for step in self.manifest['steps'] if key in step]
+        raise KeyError(key)
+
+
+def open_results(subdirectory, name):
+    """Opens the results of a test for reading, loading each field only when it is used.
+
+    If there is no store the JSON file of the same name is read instead,
+    so results taken before the store was introduced can still be used.
+
+    Args:
+        subdirectory (str): Directory the test results were written to.
+        name (str): Name of the results, without any extension.
+
+    Returns:
+        LazyResults/dict: The test results. A plain dict if they came from a JSON file.
+    """
+    store_path = os.path.join(subdirectory, name)
+    if not os.path.exists(os.path.join(store_path, MANIFEST_NAME)):
+        with open(store_path + '.json', 'r') as read_data:
+            return json.load(read_data)
+    return LazyResults(store_path)
+
+
+def load_results(subdirectory, name):
+    """Loads all the results of a test into the dict layout of the old JSON files.
+
+    Arrays are returned as lists. Use open_results where only some of the fields are needed.
+
+    Args:
+        subdirectory (str): Directory the test results were written to.
+        name (str): Name of the results, without any extension.
+
+    Returns:
+        dict: The test results.
+    """
+    results = open_results(subdirectory, name)
+    if isinstance(results, dict):
+        return results
+    return dict((key, _to_json_value(results[key])) for key in results)
+
+
+def _replay_journal(store_path, manifest):
+    """Private function adding the steps and appends in the journal of a store to its manifest.
+
+    Records already in the manifest are skipped, as the journal may not have been removed after the
+    manifest was last written. A line cut short by an interrupted write ends the replay.
+    """
+    journal_path = os.path.join(store_path, JOURNAL_NAME)
+    if not os.path.exists(journal_path):
+        return manifest
+    with open(journal_path, 'r') as read_journal:
+        for line in read_journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if 'step' in record:
+                if record['step'] == len(manifest['steps']):
+                    manifest['steps'].append(record['fields'])
+            else:
+                entry = manifest['concatenated'].get(record['append'])
+                if entry is None or record['entry']['length'] > entry['length']:
+                    manifest['concatenated'][record['append']] = record['entry']
+    return manifest
+
+
+def _open_entry(store_path, entry):
+    """Private function which turns a manifest entry back into its value, memory mapping any arrays."""
+    if isinstance(entry, dict):
+        if 'npy' in entry and 'shape' in entry:
+            if 0 in entry['shape']:
+                return np.load(os.path.join(store_path, entry['npy']))  # An empty file can not be mapped.
+            return np.load(os.path.join(store_path, entry['npy']), mmap_mode='r')
+        return dict((key, _open_entry(store_path, val)) for key, val in entry.items())
+    return entry
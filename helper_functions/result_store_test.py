@@ -0,0 +1,108 @@
+from framework_requires import BaseTestClass
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from result_store import ResultStore, NumpyEncoder, open_results, load_results, results_exist, MANIFEST_NAME, \
+    JOURNAL_NAME
+
+
+class ResultStoreTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_steps_load_as_lists_in_the_old_layout(self):
+        store = ResultStore(self.directory, 'sweep', metadata={'test_name': 'sweep', 'levels': np.arange(2)},
+                            step_fields=['x_pos', 'never_recorded'])
+        store.save_array('x_pos_baseline', [0.5, 0.25])
+        store.add_step(x_pos=np.array([1., 2.]), power=-10, data={'sa_a_data': [1, 2]})
+        store.add_step(x_pos=[3., 4.], power=-20, data={'sa_a_data': [3, 4]})
+        store.finish()
+        loaded_data = load_results(self.directory, 'sweep')
+        self.assertEqual(loaded_data['test_name'], 'sweep')
+        self.assertEqual(loaded_data['levels'], [0, 1])
+        self.assertEqual(loaded_data['x_pos_baseline'], [0.5, 0.25])
+        self.assertEqual(loaded_data['x_pos'], [[1., 2.], [3., 4.]])
+        self.assertEqual(loaded_data['power'], [-10, -20])
+        self.assertEqual(loaded_data['data'], [{'sa_a_data': [1, 2]}, {'sa_a_data': [3, 4]}])
+        self.assertEqual(loaded_data['never_recorded'], [])
+
+    def test_appended_samples_are_concatenated(self):
+        store = ResultStore(self.directory, 'scan')
+        store.append('measured_x', [1.5, 2.5])
+        store.append('measured_x', [3.5])
+        self.assertEqual(load_results(self.directory, 'scan')['measured_x'], [1.5, 2.5, 3.5])
+
+    def test_completed_steps_survive_an_unfinished_test(self):
+        store = ResultStore(self.directory, 'sweep')
+        store.add_step(x_pos=[1., 2.])
+        loaded_data = load_results(self.directory, 'sweep')
+        self.assertEqual(loaded_data['x_pos'], [[1., 2.]])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'sweep', 'manifest.json.tmp')))
+
+    def test_steps_go_to_the_journal_until_the_test_finishes(self):
+        store = ResultStore(self.directory, 'sweep')
+        for level in range(3):
+            store.add_step(level=level, x_pos=[level, 1.])
+            store.append('measured_x', [level])
+        with open(os.path.join(store.path, MANIFEST_NAME), 'r') as read_manifest:
+            self.assertEqual(json.load(read_manifest)['steps'], [])
+        self.assertEqual(load_results(self.directory, 'sweep')['level'], [0, 1, 2])
+        store.finish()
+        self.assertFalse(os.path.exists(os.path.join(store.path, JOURNAL_NAME)))
+        loaded_data = load_results(self.directory, 'sweep')
+        self.assertEqual(loaded_data['level'], [0, 1, 2])
+        self.assertEqual(loaded_data['measured_x'], [0, 1, 2])
+
+    def test_journal_replay_skips_records_in_the_manifest_and_a_cut_short_line(self):
+        store = ResultStore(self.directory, 'sweep')
+        store.add_step(level=0)
+        store.append('measured_x', [0.5])
+        with open(os.path.join(store.path, JOURNAL_NAME), 'r') as read_journal:
+            journal = read_journal.read()
+        store.set_metadata(test_name='sweep')  # Writes the manifest and removes the journal.
+        store.add_step(level=1)
+        # As if the journal had not been removed, and the last write was interrupted.
+        with open(os.path.join(store.path, JOURNAL_NAME), 'a') as write_journal:
+            write_journal.write(journal + '{"step": 2, "fie')
+        loaded_data = load_results(self.directory, 'sweep')
+        self.assertEqual(loaded_data['level'], [0, 1])
+        self.assertEqual(loaded_data['measured_x'], [0.5])
+        self.assertEqual(loaded_data['test_name'], 'sweep')
+
+    def test_json_results_are_loaded_when_there_is_no_store(self):
+        with open(os.path.join(self.directory, 'old_data.json'), 'w') as write_file:
+            json.dump({'x_pos': [[1., 2.]]}, write_file)
+        self.assertTrue(results_exist(self.directory, 'old_data'))
+        self.assertFalse(results_exist(self.directory, 'missing_data'))
+        self.assertEqual(load_results(self.directory, 'old_data'), {'x_pos': [[1., 2.]]})
+
+    def test_open_results_memory_maps_only_the_fields_used(self):
+        store = ResultStore(self.directory, 'sweep', metadata={'test_name': 'sweep'})
+        store.add_step(x_pos=[1., 2.], y_pos=[3., 4.])
+        store.append('measured_x', [0.5])
+        results = open_results(self.directory, 'sweep')
+        self.assertIn('y_pos', results)
+        self.assertIsInstance(results['x_pos'][0], np.memmap)
+        self.assertEqual(results['measured_x'].tolist(), [0.5])
+        self.assertEqual(sorted(results._fields), ['measured_x', 'x_pos'])
+        self.assertEqual(sorted(results), ['measured_x', 'test_name', 'x_pos', 'y_pos'])
+
+
+class NumpyEncoderTest(BaseTestClass):
+
+    def test_arrays_and_scalars_are_written_as_plain_json(self):
+        data = {'data': np.arange(6, dtype=np.int32).reshape(2, 3), 'n_bits': np.int64(16), 'time': [0.5]}
+        self.assertEqual(json.loads(json.dumps(data, cls=NumpyEncoder)),
+                         {'data': [[0, 1, 2], [3, 4, 5]], 'n_bits': 16, 'time': [0.5]})
+
+
+if __name__ == "__main__":
+    unittest.main()
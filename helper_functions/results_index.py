@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import sqlite3
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import pass_fail
+import array_calc_functions
+from result_store import open_results, results_exist, find_result_directories, RESULTS_STATE_NAME
+
+# The index keeps the key scalars of every set of results in one SQLite file, so trends across runs and
+# units can be queried without opening the results themselves. Each value is a row of the scalars table:
+#   test: name the results are stored under, such as 'Noise_test_data'.
+#   step: sweep step the value belongs to, or NULL for a value of the whole test.
+#   level: value of the swept setting at that step, such as the RF output power.
+#   quantity: what the value is, such as 'x_std', 'pass' or 'margin_A', the pass/fail margin of button A.
+RUN_TIME_FORMAT = '%d-%m-%Y_T_%H-%M'
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, subdirectory TEXT UNIQUE, mac_address TEXT,
+                                 run_time TEXT, signature TEXT);
+CREATE TABLE IF NOT EXISTS settings (run_id INTEGER, name TEXT, value);
+CREATE TABLE IF NOT EXISTS scalars (run_id INTEGER, test TEXT, step INTEGER, level REAL, quantity TEXT,
+                                    value REAL);
+CREATE INDEX IF NOT EXISTS runs_by_unit ON runs (mac_address, run_time);
+CREATE INDEX IF NOT EXISTS settings_by_run ON settings (run_id);
+CREATE INDEX IF NOT EXISTS scalars_by_quantity ON scalars (test, quantity, level);
+CREATE INDEX IF NOT EXISTS scalars_by_run ON scalars (run_id);
+'''
+
+
+def _adc_bit_scalars(loaded_data):
+    return _verdict_scalars(pass_fail.evaluate_adc_bit(loaded_data))
+
+
+def _int_atten_scalars(loaded_data):
+    scalars = _verdict_scalars(pass_fail.evaluate_internal_attenuator(loaded_data))
+    for step, step_data in enumerate(loaded_data['data']):
+        level = loaded_data['prog_attenuation'][step]
+        scalars.append((step, level, 'bpm_input_power', loaded_data['bpm_input_power'][step]))
+        for button in 'abcd':
+            scalars.append((step, level, button + '_mean', np.mean(step_data['sa_%s_data' % button])))
+    return scalars
+
+
+def _power_dependence_scalars(loaded_data):
+    return _verdict_scalars(pass_fail.evaluate_power_dependence(loaded_data)) + \
+        _position_scalars(loaded_data, 'output_power_levels', 'x_pos_raw', 'y_pos_raw')
+
+
+def _noise_scalars(loaded_data):
+    return _position_scalars(loaded_data, 'output_power', 'x_pos', 'y_pos')
+
+
+def _raster_scan_scalars(loaded_data):
+    scan = pass_fail.evaluate_raster_scan(loaded_data)
+    return _verdict_scalars(scan) + _verdict_scalars(pass_fail.evaluate_centre_offset(loaded_data), 'centre_') + \
+        [(None, None, 'fraction_passed', np.mean(scan.results)),
+         (None, None, 'bpm_input_power', loaded_data['bpm_input_power'])]
+
+
+def _verdict_scalars(verdict, prefix=''):
+    """Private function giving the pass or fail of a verdict and the margin of each of its channels."""
+    return [(None, None, prefix + 'pass', verdict.passed)] + \
+        [(None, None, '%smargin_%s' % (prefix, channel), margin) for channel, margin in sorted(verdict.margins.items())]
+
+
+def _position_scalars(loaded_data, level_field, x_field, y_field):
+    """Private function giving the input power and the X and Y position means and stds of each step."""
+    levels = loaded_data[level_field]
+    x_mean, x_std = array_calc_functions.stat_dataset(loaded_data[x_field])
+    y_mean, y_std = array_calc_functions.stat_dataset(loaded_data[y_field])
+    scalars = []
+    for step, level in enumerate(levels):
+        scalars.extend([(step, level, 'bpm_input_power', loaded_data['bpm_input_power'][step]),
+                        (step, level, 'x_mean', x_mean[step]), (step, level, 'x_std', x_std[step]),
+                        (step, level, 'y_mean', y_mean[step]), (step, level, 'y_std', y_std[step])])
+    return scalars
+
+
+# The results which are indexed, and the function taking the scalars out of each.
+INDEXED_RESULTS = {'ADC_bit_check_data': _adc_bit_scalars,
+                   'ADC_int_atten_sweep_data': _int_atten_scalars,
+                   'beam_power_dependence_data': _power_dependence_scalars,
+                   'beam_power_dependence_data_rf_power_sweep': _power_dependence_scalars,
+                   'Noise_test_data': _noise_scalars,
+                   'beam_position_raster_scan_data': _raster_scan_scalars}
+
+
+class ResultsIndex(object):
+    """An SQLite index of the key scalars of many sets of results, for queries across runs and units.
+
+    Attributes:
+        path (str): Path of the index file.
+        connection (sqlite3.Connection): Connection to the index.
+    """
+
+    def __init__(self, path):
+        """Opens the index, creating it if it does not exist.
+
+        Args:
+            path (str): Path of the index file.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(INDEX_SCHEMA)
+
+    def close(self):
+        """Closes the connection to the index."""
+        self.connection.close()
+
+    def update(self, results_root):
+        """Indexes every set of results under a results tree which is new or has changed.
+
+        A set of results is any directory holding an initial_BPM_state.json. Results which can not be
+        read are reported and left out, so one bad run does not stop the rest being indexed.
+
+        Args:
+            results_root (str): Root of the results tree, holding <mac>/<timestamp> directories.
+
+        Returns:
+            dict: Numbers of runs 'indexed', 'unchanged' and 'failed'.
+        """
+        counts = {'indexed': 0, 'unchanged': 0, 'failed': 0}
+        for directory in find_result_directories(results_root):
+            try:
+                counts['indexed' if self.index_run(directory) else 'unchanged'] += 1
+            except Exception as error:
+                print 'Could not index ', directory, ': ', error
+                counts['failed'] += 1
+        return counts
+
+    def index_run(self, subdirectory):
+        """Indexes one set of results, replacing any earlier entry for it.
+
+        Args:
+            subdirectory (str): The folder the test results are stored in.
+
+        Returns:
+            bool: True if the results were indexed, False if the index was already up to date.
+        """
+        subdirectory = os.path.abspath(subdirectory)
+        signature = _run_signature(subdirectory)
+        row = self.connection.execute('SELECT run_id, signature FROM runs WHERE subdirectory = ?',
+                                      (subdirectory,)).fetchone()
+        if row is not None and row[1] == signature:
+            return False
+        with open(os.path.join(subdirectory, RESULTS_STATE_NAME), 'r') as read_data:
+            test_system_state = json.load(read_data)
+        scalars = []
+        for test, extract in sorted(INDEXED_RESULTS.items()):
+            if results_exist(subdirectory, test):
+                scalars.extend((test,) + scalar for scalar in extract(open_results(subdirectory, test)))
+        # One transaction, so a run is never left half indexed.
+        with self.connection:
+            if row is not None:
+                self._remove_run(row[0])
+            run_id = self.connection.execute(
+                'INSERT INTO runs (subdirectory, mac_address, run_time, signature) VALUES (?, ?, ?, ?)',
+                (subdirectory, test_system_state['mac_address'].replace(':', '-'), _run_time(subdirectory),
+                 signature)).lastrowid
+            self.connection.executemany('INSERT INTO settings VALUES (?, ?, ?)',
+                                        [(run_id, name, value) for name, value in test_system_state.items()
+                                         if isinstance(value, (int, float, basestring))])
+            self.connection.executemany('INSERT INTO scalars VALUES (?, ?, ?, ?, ?, ?)',
+                                        [(run_id, test, step, _to_float(level), quantity, _to_float(value))
+                                         for test, step, level, quantity, value in scalars])
+        return True
+
+    def _remove_run(self, run_id):
+        """Private method removing the entry of a run from the index."""
+        for table in ('runs', 'settings', 'scalars'):
+            self.connection.execute('DELETE FROM %s WHERE run_id = ?' % table, (run_id,))
+
+    def units(self):
+        """Returns the MAC addresses of all the indexed units, sorted."""
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT mac_address FROM runs ORDER BY 1')]
+
+    def trend(self, test, quantity, mac_address=None, level=None, since=None, until=None):
+        """Values of one quantity across runs, oldest first.
+
+        Args:
+            test (str): Name the results are stored under, such as 'Noise_test_data'.
+            quantity (str): Quantity to get, such as 'x_std' or 'pass'.
+            mac_address (str): Only give values for this unit, with '-' separators.
+            level (float): Only give values from the sweep step at this level, such as an RF output power.
+            since (str): Only give runs from this time on, as 'YYYY-mm-dd HH:MM' or a leading part of it.
+            until (str): Only give runs before this time, in the same form.
+
+        Returns:
+            list: Tuples of (run time, mac address, level, value).
+        """
+        query = ('SELECT runs.run_time, runs.mac_address, scalars.level, scalars.value FROM scalars '
+                 'JOIN runs ON runs.run_id = scalars.run_id WHERE scalars.test = ? AND scalars.quantity = ?')
+        arguments = [test, quantity]
+        for condition, value in (('runs.mac_address = ?', mac_address), ('scalars.level = ?', level),
+                                 ('runs.run_time >= ?', since), ('runs.run_time < ?', until)):
+            if value is not None:
+                query += ' AND ' + condition
+                arguments.append(value)
+        return self.connection.execute(query + ' ORDER BY runs.run_time, scalars.step', arguments).fetchall()
+
+    def settings(self, mac_address=None):
+        """The initial BPM settings of each run.
+
+        Args:
+            mac_address (str): Only give the runs of this unit.
+
+        Returns:
+            list: Tuples of (run time, mac address, setting name, value), oldest first.
+        """
+        query = ('SELECT runs.run_time, runs.mac_address, settings.name, settings.value FROM settings '
+                 'JOIN runs ON runs.run_id = settings.run_id')
+        arguments = []
+        if mac_address is not None:
+            query += ' WHERE runs.mac_address = ?'
+            arguments.append(mac_address)
+        return self.connection.execute(query + ' ORDER BY runs.run_time, settings.name', arguments).fetchall()
+
+    def plot_trend(self, fig_path, test, quantity, **filters):
+        """Plots the trend of one quantity, with a line for each unit.
+
+        Args:
+            fig_path (str): Path the figure is saved to.
+            test (str): Name the results are stored under.
+            quantity (str): Quantity to plot.
+            **filters: Any of the mac_address, level, since and until arguments of trend.
+
+        Returns:
+            str: fig_path
+        """
+        rows = self.trend(test, quantity, **filters)
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        for unit in sorted(set(row[1] for row in rows)):
+            unit_rows = [row for row in rows if row[1] == unit and row[0] is not None]
+            ax.plot([time.mktime(time.strptime(row[0], '%Y-%m-%d %H:%M')) / 86400. for row in unit_rows],
+                    [row[3] for row in unit_rows], '.-', label=unit)
+        ax.set_xlabel('Run date (days since 1970)')
+        ax.set_ylabel(quantity)
+        ax.set_title(test)
+        ax.grid(True)
+        if rows:
+            ax.legend(loc='best', fontsize='small')
+        fig.savefig(fig_path)
+        return fig_path
+
+
+def _run_time(subdirectory):
+    """Private function reading the run time from the name of a results directory, in a sortable form."""
+    try:
+        return time.strftime('%Y-%m-%d %H:%M', time.strptime(os.path.basename(subdirectory), RUN_TIME_FORMAT))
+    except ValueError:
+        return None
+
+
+def _run_signature(subdirectory):
+    """Private function giving the size and modification time of every result file, to detect changes."""
+    signature = []
+    for name in sorted(os.listdir(subdirectory)):
+        path = os.path.join(subdirectory, name)
+        paths = [os.path.join(path, store_file) for store_file in sorted(os.listdir(path))] \
+            if os.path.isdir(path) else [path]
+        for result_path in paths:
+            if result_path.endswith('.json') or result_path.endswith('.npy'):
+                stat = os.stat(result_path)
+                signature.append('%s:%d:%d' % (os.path.relpath(result_path, subdirectory), stat.st_size,
+                                               stat.st_mtime))
+    return ';'.join(signature)
+
+
+def _to_float(value):
+    """Private function converting a numpy or boolean value to a float for storing."""
+    return None if value is None else float(value)
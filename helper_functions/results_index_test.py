@@ -0,0 +1,68 @@
+from framework_requires import BaseTestClass
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from result_store import ResultStore
+from results_index import ResultsIndex
+
+
+class ResultsIndexTest(BaseTestClass):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.root = tempfile.mkdtemp()
+        self.index = ResultsIndex(os.path.join(self.root, 'results_index.sqlite'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.root)
+
+    def add_run(self, mac_address, run_time, noise):
+        subdirectory = os.path.join(self.root, mac_address.replace(':', '-'), run_time)
+        os.makedirs(subdirectory)
+        with open(os.path.join(subdirectory, 'initial_BPM_state.json'), 'w') as write_state:
+            json.dump({'mac_address': mac_address, 'agc': 1, 'bpm_spec': {'noise_10kHz': [[0], [1]]}},
+                      write_state)
+        store = ResultStore(subdirectory, 'Noise_test_data', {'test_name': 'Noise test'})
+        for output_power in (-20, -40):
+            store.add_step(output_power=output_power, bpm_input_power=output_power - 3.,
+                           x_pos=np.array([0., noise * 2]), y_pos=np.array([1., 1.]))
+        store.finish()
+        return subdirectory
+
+    def test_update_indexes_only_new_or_changed_runs(self):
+        self.add_run('00:d0:50:31:02:84', '20-01-2020_T_15-33', 0.1)
+        self.assertEqual(self.index.update(self.root), {'indexed': 1, 'unchanged': 0, 'failed': 0})
+        self.add_run('00:d0:50:31:02:84', '20-02-2020_T_09-10', 0.2)
+        self.assertEqual(self.index.update(self.root), {'indexed': 1, 'unchanged': 1, 'failed': 0})
+
+    def test_trend_across_runs_and_units(self):
+        self.add_run('00:d0:50:31:02:84', '20-02-2020_T_09-10', 0.2)
+        self.add_run('00:d0:50:31:02:84', '20-01-2020_T_15-33', 0.1)
+        self.add_run('00:d0:50:31:02:99', '21-01-2020_T_11-00', 0.3)
+        self.index.update(self.root)
+        self.assertEqual(self.index.units(), ['00-d0-50-31-02-84', '00-d0-50-31-02-99'])
+        trend = self.index.trend('Noise_test_data', 'x_std', mac_address='00-d0-50-31-02-84', level=-40)
+        self.assertEqual([row[0] for row in trend], ['2020-01-20 15:33', '2020-02-20 09:10'])
+        np.testing.assert_allclose([row[3] for row in trend], [0.1, 0.2])
+        self.assertEqual(len(self.index.trend('Noise_test_data', 'bpm_input_power', since='2020-01-21')), 4)
+
+    def test_settings_keep_the_scalar_values_of_the_initial_state(self):
+        self.add_run('00:d0:50:31:02:84', '20-01-2020_T_15-33', 0.1)
+        self.index.update(self.root)
+        self.assertEqual(self.index.settings(), [('2020-01-20 15:33', '00-d0-50-31-02-84', 'agc', 1),
+                                                 ('2020-01-20 15:33', '00-d0-50-31-02-84', 'mac_address',
+                                                  '00:d0:50:31:02:84')])
+
+    def test_unreadable_run_does_not_stop_the_update(self):
+        subdirectory = self.add_run('00:d0:50:31:02:84', '20-01-2020_T_15-33', 0.1)
+        os.remove(os.path.join(subdirectory, 'Noise_test_data', 'step_0000_x_pos.npy'))
+        self.add_run('00:d0:50:31:02:99', '21-01-2020_T_11-00', 0.3)
+        self.assertEqual(self.index.update(self.root), {'indexed': 1, 'unchanged': 0, 'failed': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,15 @@
+import sys
+import os
+import helper_functions
+from pkg_resources import require
+require("numpy == 1.13.1")
+
+# Adds new and changed results under a results tree to its index, for trend queries across runs and units.
+#   python index_results.py <results root>
+# The index is kept in results_index.sqlite at the root of the tree.
+if __name__ == '__main__':
+    results_root = sys.argv[1]
+    index = helper_functions.ResultsIndex(os.path.join(results_root, 'results_index.sqlite'))
+    counts = index.update(results_root)
+    index.close()
+    print '%d runs indexed, %d unchanged, %d failed' % (counts['indexed'], counts['unchanged'], counts['failed'])
@@ -5,4 +5,5 @@ require("scipy")
 import sys
 from Latex_Report.report_sections import assemble_report
 
-assemble_report(sys.argv[1])
+if __name__ == '__main__':
+    assemble_report(sys.argv[1])
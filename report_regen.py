@@ -1,14 +1,14 @@
-import sys, os
+import sys
 import Latex_Report
 from pkg_resources import require
-require("numpy == 1.16.6")
-require("scipy == 1.2.2")
-
-
-# results_location = sys.argv[1]
-# results_location = '/dls/science/groups/b01/BPM_bench_tests/00-d0-50-31-02-84/20-12-2019_T_08-59/'
-results_location = os.path.join('Z:', os.sep, 'BPM_bench_tests', '00-d0-50-31-02-84', '20-01-2020_T_15-33')
-Latex_Report.assemble_report(subdirectory=results_location)
-print 'Report written to ', results_location
-
-
+require("numpy == 1.13.1")
+require("scipy == 1.2.3")
+
+# Rebuilds the reports under a results tree whose results or report code have changed since they were built.
+#   python report_regen.py <results root> [--force]
+# e.g. results root '/dls/science/groups/b01/BPM_bench_tests/'
+# The guard stops the worker processes from running the script again on Windows.
+if __name__ == '__main__':
+    results_root = sys.argv[1]
+    outcomes = Latex_Report.regenerate_reports(results_root, force='--force' in sys.argv[2:])
+    print Latex_Report.regeneration_summary(outcomes, results_root)
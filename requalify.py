@@ -0,0 +1,21 @@
+import sys
+import helper_functions
+from pkg_resources import require
+require("numpy == 1.13.1")
+
+# Judges every set of results under a results tree against the pass/fail criteria, without rebuilding reports.
+#   python requalify.py <results root> [criterion=limit ...]
+# e.g. python requalify.py /dls/science/groups/b01/BPM_bench_tests/ raster_scan=0.04 power_dependence=80
+# The guard stops the worker processes from running the script again on Windows.
+if __name__ == '__main__':
+    results_root = sys.argv[1]
+    limits = dict((name, float(limit)) for name, limit in (argument.split('=') for argument in sys.argv[2:]))
+    outcomes = helper_functions.requalify(results_root, limits)
+    for subdirectory in sorted(outcomes):
+        if isinstance(outcomes[subdirectory], str):
+            print subdirectory, ' FAILED\n', outcomes[subdirectory]
+            continue
+        print subdirectory
+        for name, verdicts in sorted(outcomes[subdirectory].items()):
+            for verdict in verdicts:
+                print '    %-20s %s  worst margin %g' % (verdict.test, verdict.label, verdict.worst_margin())
@@ -0,0 +1,28 @@
+import sys
+import Benchmarks
+from pkg_resources import require
+require("numpy == 1.13.1")
+require("matplotlib")
+
+# Times the acquisition and analysis code on the simulated hardware and compares it with the saved baseline.
+#   python run_benchmarks.py [--save-baseline] [benchmark name ...]
+# e.g. python run_benchmarks.py adc_missing_bit_analysis assemble_report
+# Exits with 1 if any benchmark fails or has become slower than the baseline allows, so it can gate a merge.
+# The baseline only means anything on the machine it was saved on, so save one before making changes.
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    save = '--save-baseline' in arguments
+    names = [argument for argument in arguments if argument != '--save-baseline']
+    results = Benchmarks.run_benchmarks(names)
+    comparison = Benchmarks.compare_with_baseline(results, Benchmarks.load_baseline())
+    print Benchmarks.comparison_table(comparison)
+    for name, result in sorted(results.items()):
+        if 'error' in result:
+            print name, ' FAILED\n', result['error']
+    # A benchmark which fails is never in the baseline, so it has to fail the run here.
+    failing = ('error',) if save else ('error', 'regression')
+    if save:
+        Benchmarks.save_baseline(results)
+        print 'Saved as the baseline in ', Benchmarks.BASELINE_PATH
+    if any(status in failing for name, reference, seconds, ratio, status in comparison):
+        sys.exit(1)